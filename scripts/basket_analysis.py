@@ -0,0 +1,240 @@
+import os
+import math
+import shutil
+import tempfile
+from contextlib import ExitStack
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from config_loader import load_config, get_processed_file_name
+from file_reader import iter_df_chunks
+from metrics import track_stage, call_with_metrics, STAGE_METRICS
+
+def get_basket_dir():
+    """Retrieve the basket analysis output directory from config.json, creating it if needed."""
+    basket_dir = os.path.normpath(load_config().get("basket_dir", "data/baskets"))
+    os.makedirs(basket_dir, exist_ok=True)
+    return basket_dir
+
+def partition_path(work_dir, partition, name):
+    """File of one column of one partition of the line items."""
+    return os.path.join(work_dir, f"part_{partition}_{name}")
+
+def partition_line_items(work_dir, n_partitions, chunk_size=None):
+    """
+    Stream the processed sales file into per-partition files of (basket, item_code).
+
+    Rows are routed by basket id, so every basket lands whole in one partition
+    (a basket belongs to one store, so large stores are spread over partitions).
+    Columns are appended as raw int64 arrays, so memory use is one chunk.
+
+    Args:
+        work_dir (str): Directory for the partition files.
+        n_partitions (int): Number of partitions.
+        chunk_size (int, optional): Sales rows per chunk. Defaults to 'chunk_size' in config.json.
+
+    Returns:
+        tuple: (sorted item codes seen, number of line items)
+    """
+    folder = load_config().get("processed_to", "data/clean")
+    items, n_rows = np.empty(0, dtype=np.int64), 0
+    with ExitStack() as stack, track_stage("basket_partition") as metrics:
+        outputs = [(stack.enter_context(open(partition_path(work_dir, p, "basket"), "wb")),
+                    stack.enter_context(open(partition_path(work_dir, p, "item"), "wb"))) for p in range(n_partitions)]
+        for chunk in iter_df_chunks(get_processed_file_name("sales.csv"), folder, chunk_size,
+                                    columns=["basket", "item_code"]):
+            baskets = chunk["basket"].to_numpy(dtype=np.int64)
+            codes = chunk["item_code"].to_numpy(dtype=np.int64)
+            items = np.union1d(items, codes)
+            n_rows += len(chunk)
+
+            partitions = baskets % n_partitions
+            order = np.argsort(partitions, kind="stable")
+            bounds = np.searchsorted(partitions[order], np.arange(n_partitions + 1))
+            for p, (basket_file, item_file) in enumerate(outputs):
+                rows = order[bounds[p]:bounds[p + 1]]
+                baskets[rows].tofile(basket_file)
+                codes[rows].tofile(item_file)
+        metrics["rows_in"] = n_rows
+    return items, n_rows
+
+def count_partition_items(work_dir, partition, items):
+    """
+    Group one partition into baskets and count the baskets holding each item.
+
+    Line items are sorted by (basket, item) and repeated items of a basket are
+    dropped; the sorted, deduplicated arrays are saved for count_partition_pairs.
+
+    Args:
+        work_dir (str): Directory of the partition files.
+        partition (int): Partition number.
+        items (np.ndarray): Sorted item codes; an item's position is its column.
+
+    Returns:
+        tuple: (number of baskets, baskets per item as an int64 array)
+    """
+    with track_stage("basket_items") as metrics:
+        baskets = np.fromfile(partition_path(work_dir, partition, "basket"), dtype=np.int64)
+        columns = np.searchsorted(items, np.fromfile(partition_path(work_dir, partition, "item"), dtype=np.int64))
+        order = np.lexsort((columns, baskets))
+        baskets, columns = baskets[order], columns[order]
+        new = np.ones(len(baskets), dtype=bool)
+        new[1:] = (baskets[1:] != baskets[:-1]) | (columns[1:] != columns[:-1])
+        baskets, columns = baskets[new], columns[new]
+
+        np.save(partition_path(work_dir, partition, "basket_sorted.npy"), baskets)
+        np.save(partition_path(work_dir, partition, "item_sorted.npy"), columns)
+        n_baskets = int(np.count_nonzero(np.diff(baskets)) + 1) if len(baskets) else 0
+        metrics["rows_in"], metrics["rows_out"] = len(order), len(baskets)
+    return n_baskets, np.bincount(columns, minlength=len(items))
+
+def count_partition_pairs(work_dir, partition, frequent_columns):
+    """
+    Count the baskets holding each pair of frequent items in one partition.
+
+    Items that are not frequent are dropped first (no pair holding one can be
+    frequent), then the pairs are counted with the product of the basket x item
+    CSR matrix with its transpose; no table of pairs is built.
+
+    Args:
+        work_dir (str): Directory of the partition files.
+        partition (int): Partition number.
+        frequent_columns (np.ndarray): Column of each item among the frequent items, or -1.
+
+    Returns:
+        scipy.sparse.csr_matrix: Upper triangle of the frequent item x frequent item basket counts.
+    """
+    n_frequent = int(frequent_columns.max()) + 1 if len(frequent_columns) else 0
+    with track_stage("basket_pairs") as metrics:
+        baskets = np.load(partition_path(work_dir, partition, "basket_sorted.npy"), mmap_mode="r")
+        columns = frequent_columns[np.load(partition_path(work_dir, partition, "item_sorted.npy"), mmap_mode="r")]
+        keep = columns >= 0
+        baskets, columns = baskets[keep], columns[keep]
+
+        starts = np.flatnonzero(np.r_[True, baskets[1:] != baskets[:-1]]) if len(baskets) else np.empty(0, int)
+        indptr = np.r_[starts, len(baskets)]
+        basket_items = sp.csr_matrix((np.ones(len(columns), dtype=np.int32), columns, indptr),
+                                     shape=(len(starts), n_frequent))
+        pairs = sp.triu(basket_items.T.tocsr() @ basket_items, k=1).tocsr()
+        metrics["rows_in"], metrics["rows_out"] = len(columns), pairs.nnz
+    return pairs.astype(np.int64)
+
+def run_partitions(func, args_list, max_workers):
+    """Run func on every argument tuple, on a process pool if there are several workers."""
+    if max_workers == 1 or len(args_list) == 1:
+        return [func(*args) for args in args_list]
+    results = []
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for future in [executor.submit(call_with_metrics, func, *args) for args in args_list]:
+            result, records = future.result()
+            STAGE_METRICS.extend(records)
+            results.append(result)
+    return results
+
+def top_rules(pair_counts, item_counts, n_baskets, top_k):
+    """
+    Association rules between frequent item pairs, keeping the top_k by lift per antecedent.
+
+    Args:
+        pair_counts (scipy.sparse.csr_matrix): Upper-triangle basket counts of frequent item pairs.
+        item_counts (np.ndarray): Baskets per frequent item.
+        n_baskets (int): Total number of baskets.
+        top_k (int): Rules kept per antecedent item.
+
+    Returns:
+        dict: antecedent, consequent, baskets, confidence, lift and rank arrays, sorted by antecedent
+              then rank (1 = highest lift).
+    """
+    coo = pair_counts.tocoo()
+    antecedent = np.concatenate([coo.row, coo.col])
+    consequent = np.concatenate([coo.col, coo.row])
+    count = np.concatenate([coo.data, coo.data])
+    confidence = count / item_counts[antecedent]
+    lift = confidence / (item_counts[consequent] / n_baskets)
+
+    order = np.lexsort((consequent, -lift, antecedent))
+    antecedent = antecedent[order]
+    group_start = np.flatnonzero(np.r_[True, antecedent[1:] != antecedent[:-1]]) if len(order) else np.empty(0, int)
+    rank = np.arange(len(order)) - np.repeat(group_start, np.diff(np.r_[group_start, len(order)]))
+    keep = rank < top_k
+    return {"antecedent": antecedent[keep], "consequent": consequent[order][keep], "baskets": count[order][keep],
+            "confidence": confidence[order][keep], "lift": lift[order][keep], "rank": rank[keep] + 1}
+
+def analyze_baskets(min_support=None, top_k=None, n_partitions=None, max_workers=None, output_dir=None):
+    """
+    Find frequent items and item pairs in baskets and the strongest co-purchase rules per item.
+
+    Line items are split into partitions by basket, and each partition is processed on
+    a process pool: first baskets per item (merged to prune items below min_support),
+    then basket counts of frequent item pairs from a sparse matrix product. Partial
+    counts are summed, pairs below min_support are dropped and rules A -> B get
+        confidence = baskets(A, B) / baskets(A)
+        lift = confidence / (baskets(B) / all baskets)
+
+    Args:
+        min_support (float, optional): Smallest share of baskets of a frequent itemset.
+                                       Defaults to 'basket_min_support' in config.json.
+        top_k (int, optional): Rules kept per item, by lift. Defaults to 'basket_top_k'.
+        n_partitions (int, optional): Basket partitions. Defaults to 'basket_partitions'.
+        max_workers (int, optional): Pool size. Defaults to 'max_workers', or the number of CPUs.
+        output_dir (str, optional): Directory to write to. Defaults to 'basket_dir'.
+
+    Returns:
+        dict: Paths of the 'items', 'pairs' and 'rules' Parquet files.
+    """
+    config = load_config()
+    min_support = config.get("basket_min_support", 0.001) if min_support is None else min_support
+    top_k = top_k or config.get("basket_top_k", 10)
+    n_partitions = n_partitions or config.get("basket_partitions", 16)
+    max_workers = max_workers or config.get("max_workers") or os.cpu_count()
+    output_dir = output_dir or get_basket_dir()
+    os.makedirs(output_dir, exist_ok=True)
+
+    work_dir = tempfile.mkdtemp(prefix="baskets_", dir=output_dir)
+    try:
+        items, n_rows = partition_line_items(work_dir, n_partitions)
+        partitions = range(n_partitions)
+        item_results = run_partitions(count_partition_items, [(work_dir, p, items) for p in partitions], max_workers)
+        n_baskets = sum(n for n, _ in item_results)
+        item_counts = np.sum([counts for _, counts in item_results], axis=0) if item_results else np.zeros(0)
+        min_count = max(1, math.ceil(min_support * n_baskets))
+
+        frequent = np.flatnonzero(item_counts >= min_count)
+        frequent_columns = np.full(len(items), -1, dtype=np.int64)
+        frequent_columns[frequent] = np.arange(len(frequent))
+        print(f"\n{n_rows} line items in {n_baskets} baskets: {len(frequent)} of {len(items)} items "
+              f"in at least {min_count} baskets")
+
+        pair_counts = sp.csr_matrix((len(frequent), len(frequent)), dtype=np.int64)
+        for partial in run_partitions(count_partition_pairs, [(work_dir, p, frequent_columns) for p in partitions],
+                                      max_workers):
+            pair_counts = pair_counts + partial
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    pair_counts.data[pair_counts.data < min_count] = 0
+    pair_counts.eliminate_zeros()
+    frequent_codes, frequent_counts = items[frequent], item_counts[frequent]
+    pairs = pair_counts.tocoo()
+    rules = top_rules(pair_counts, frequent_counts, n_baskets, top_k)
+    print(f"{pair_counts.nnz} frequent item pairs, {len(rules['rank'])} rules kept")
+
+    outputs = {
+        "items": pd.DataFrame({"item_code": frequent_codes, "baskets": frequent_counts,
+                               "support": frequent_counts / n_baskets}),
+        "pairs": pd.DataFrame({"item_code": frequent_codes[pairs.row], "other_item_code": frequent_codes[pairs.col],
+                               "baskets": pairs.data, "support": pairs.data / n_baskets}),
+        "rules": pd.DataFrame({"item_code": frequent_codes[rules["antecedent"]],
+                               "associated_item_code": frequent_codes[rules["consequent"]],
+                               "rank": rules["rank"], "baskets": rules["baskets"],
+                               "support": rules["baskets"] / n_baskets, "confidence": rules["confidence"],
+                               "lift": rules["lift"]}),
+    }
+    paths = {}
+    for name, df in outputs.items():
+        paths[name] = os.path.join(output_dir, f"{name}.parquet")
+        df.to_parquet(paths[name], index=False)
+    print(f"Basket analysis saved to: {output_dir}")
+    return paths
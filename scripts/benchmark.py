@@ -0,0 +1,289 @@
+import os
+import sys
+import json
+import argparse
+import platform
+import statistics
+import subprocess
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+
+from config_loader import load_config, get_processed_file_name, CONFIG_PATH_ENV, CONFIG_DIR
+from metrics import track_stage, call_with_metrics, summarize_metrics
+from synthetic_data import ensure_dataset
+
+# Raw files of the dataset, in the order they are cleaned
+DATASET_FILES = ["item.csv", "promotion.csv", "sales.csv", "supermarkets.csv"]
+
+# Rows scored per call in the predict benchmark
+PREDICT_BATCH_ROWS = 100000
+
+def read_benchmark(context):
+    """Parse the raw sales file with its schema."""
+    from file_reader import load_csv_to_df
+    return (lambda: ()), (lambda: load_csv_to_df("sales.csv", context["raw_dir"])), context["n_sales"]
+
+def cleaner_benchmark(file_name):
+    """Benchmark of the cleaning function of a raw file, on a fresh copy of the parsed file every run."""
+    def setup(context):
+        from file_reader import load_csv_to_df
+        from data_processor import CLEANING_FUNCTIONS, normalize_size, parse_size
+        raw_df = load_csv_to_df(file_name, context["raw_dir"])
+
+        def prepare():
+            normalize_size.cache_clear()  # Every run parses the sizes from scratch
+            parse_size.cache_clear()
+            return (raw_df.copy(),)
+        return prepare, CLEANING_FUNCTIONS[file_name], len(raw_df)
+    return setup
+
+def merge_benchmark(context):
+    """Index the processed dimension tables and join every sales row to them, as training does."""
+    from file_reader import load_df
+    from dimension_index import build_dimension_index
+    from sales_predictor import load_dimension_tables, merge_sales_data
+    sales_df = load_df(get_processed_file_name("sales.csv"), context["processed_dir"])
+    dimension_tables = load_dimension_tables(context["processed_dir"])
+
+    def run(sales_df):
+        return merge_sales_data(sales_df, build_dimension_index(*dimension_tables))
+    return (lambda: (sales_df,)), run, len(sales_df)
+
+def train_benchmark(context):
+    """Train the sampled model from the processed files."""
+    from sales_predictor import preprocess_and_train_sales_model
+    return (lambda: ()), preprocess_and_train_sales_model, context["n_sales"]
+
+def streaming_train_benchmark(context):
+    """Train the model on every processed sales row, streamed in chunks."""
+    from streaming_trainer import preprocess_and_train_sales_model_streaming
+    return (lambda: ()), preprocess_and_train_sales_model_streaming, context["n_sales"]
+
+def sparse_train_benchmark(context):
+    """Train the ridge model on the sparse one-hot / hashed features of a sample."""
+    from sparse_features import preprocess_and_train_sales_model_sparse
+    return (lambda: ()), preprocess_and_train_sales_model_sparse, context["n_sales"]
+
+def customer_features_benchmark(context):
+    """Compute the customer table in one streaming pass over the processed sales file."""
+    from customer_features import build_customer_features
+    output_path = os.path.join(context["processed_dir"], "customer_features.parquet")
+    return (lambda: ()), (lambda: build_customer_features(output_path=output_path)), context["n_sales"]
+
+def predict_benchmark(context):
+    """Score a batch of merged sales rows with a trained model."""
+    from file_reader import load_df
+    from dimension_index import build_dimension_index
+    from sales_predictor import (preprocess_and_train_sales_model, predict_sales, load_dimension_tables,
+                                 merge_sales_data, add_time_features)
+    components = preprocess_and_train_sales_model()
+    sales_df = load_df(get_processed_file_name("sales.csv"), context["processed_dir"]).head(PREDICT_BATCH_ROWS)
+    batch = add_time_features(merge_sales_data(sales_df, build_dimension_index(*load_dimension_tables(
+        context["processed_dir"])))).drop(columns=["transaction_amount"])
+    numeric_cols = batch.select_dtypes(include=["number"]).columns
+    batch[numeric_cols] = batch[numeric_cols].fillna(batch[numeric_cols].median())  # Scored rows are complete
+    return (lambda: (batch.copy(),)), (lambda new_data: predict_sales(new_data, *components)), len(batch)
+
+# Benchmarks by name: each takes the run context and returns (prepare, run, rows);
+# prepare() builds the arguments of one timed run(*args) call outside the timing
+BENCHMARKS = {
+    "read_sales": read_benchmark,
+    "clean_items_data": cleaner_benchmark("item.csv"),
+    "clean_promotions_data": cleaner_benchmark("promotion.csv"),
+    "clean_sales_data": cleaner_benchmark("sales.csv"),
+    "clean_supermarkets_data": cleaner_benchmark("supermarkets.csv"),
+    "merge": merge_benchmark,
+    "train": train_benchmark,
+    "train_streaming": streaming_train_benchmark,
+    "train_sparse": sparse_train_benchmark,
+    "customer_features": customer_features_benchmark,
+    "predict": predict_benchmark,
+}
+
+def get_commit():
+    """Short hash of the checked-out commit, or None outside a git checkout."""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=CONFIG_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def prepare_workspace(data_dir, work_dir):
+    """
+    Write a configuration that points the pipeline at the synthetic data and clean it once.
+
+    Returns:
+        str: Path of the benchmark configuration.
+    """
+    from pipeline_runner import run_cleaning_stage
+
+    config = load_config().to_dict()
+    config.update({"extracted_to": data_dir, "extract_mode": "extract", "files_to_process": DATASET_FILES,
+                   "processed_to": os.path.join(work_dir, "clean"), "cache_enabled": False,
+                   "model_path": os.path.join(work_dir, "sales_model.joblib"), "parallel": False})
+    os.makedirs(work_dir, exist_ok=True)
+    config_path = os.path.join(work_dir, "config.json")
+    with open(config_path, "w") as f:
+        json.dump(config, f, indent=2)
+
+    os.environ[CONFIG_PATH_ENV] = config_path
+    results = run_cleaning_stage(DATASET_FILES, data_dir)
+    failed = [file_name for file_name, result in results.items() if result["status"] == "failed"]
+    if failed:
+        raise RuntimeError(f"Could not clean the benchmark data: {', '.join(failed)}")
+    return config_path
+
+def run_benchmark(name, context, repeat):
+    """
+    Time repeat runs of one benchmark.
+
+    Returns:
+        dict: rows, best and median wall time, CPU time and peak RSS of the best run,
+              rows per second and the time spent in each pipeline stage of the best run.
+    """
+    prepare, run, rows = BENCHMARKS[name](context)
+    runs = []
+    for _ in range(repeat):
+        args = prepare()
+        with track_stage("benchmark", name=name) as record:
+            _, stage_records = call_with_metrics(run, *args)
+        record["stages"] = {entry["stage"]: round(entry["wall_seconds"], 6)
+                            for entry in summarize_metrics(stage_records)}
+        runs.append(record)
+
+    best = min(runs, key=lambda record: record["wall_seconds"])
+    return {
+        "rows": rows,
+        "wall_seconds": best["wall_seconds"],
+        "wall_seconds_median": statistics.median(record["wall_seconds"] for record in runs),
+        "cpu_seconds": best["cpu_seconds"],
+        "peak_rss_bytes": max(record["peak_rss_bytes"] or 0 for record in runs) or None,
+        "rows_per_second": rows / best["wall_seconds"] if best["wall_seconds"] > 0 else None,
+        "stages": best["stages"],
+    }
+
+def run_benchmarks(n_sales, names=None, repeat=3, seed=0, data_dir=None, results_dir=None):
+    """
+    Generate (or reuse) a synthetic dataset and time the pipeline's hot paths on it.
+
+    Results are appended to '<benchmark_dir>/results.jsonl' (one JSON line per run)
+    together with the commit, library versions and host, so runs can be compared.
+
+    Args:
+        n_sales (int): Sales rows in the synthetic dataset.
+        names (list, optional): Benchmarks to run. Defaults to all of BENCHMARKS.
+        repeat (int): Timed runs per benchmark; the fastest is reported.
+        seed (int): Seed of the synthetic dataset.
+        data_dir (str, optional): Where the dataset is generated. Defaults to
+                                  '<benchmark_dir>/data/<n_sales>-<seed>'.
+        results_dir (str, optional): Where results are stored. Defaults to 'benchmark_dir'
+                                     in config.json.
+
+    Returns:
+        dict: The run's results.
+    """
+    names = names or list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        raise ValueError(f"Unknown benchmarks: {', '.join(unknown)}")
+
+    results_dir = os.path.normpath(results_dir or load_config().get("benchmark_dir", "data/benchmarks"))
+    data_dir = data_dir or os.path.join(results_dir, "data", f"{n_sales}-{seed}")
+    ensure_dataset(data_dir, n_sales, seed)
+
+    previous_config = os.environ.get(CONFIG_PATH_ENV)
+    try:
+        prepare_workspace(data_dir, os.path.join(data_dir, "work"))
+        context = {"raw_dir": data_dir, "processed_dir": load_config()["processed_to"], "n_sales": n_sales}
+        benchmarks = {}
+        for name in names:
+            print(f"\nBenchmark: {name}")
+            benchmarks[name] = run_benchmark(name, context, repeat)
+    finally:
+        if previous_config is None:
+            os.environ.pop(CONFIG_PATH_ENV, None)
+        else:
+            os.environ[CONFIG_PATH_ENV] = previous_config
+
+    result = {
+        "timestamp": datetime.now(timezone.utc).isoformat(), "commit": get_commit(), "host": platform.node(),
+        "python": platform.python_version(), "pandas": pd.__version__, "numpy": np.__version__,
+        "cpu_count": os.cpu_count(), "n_sales": n_sales, "seed": seed, "repeat": repeat, "benchmarks": benchmarks,
+    }
+    os.makedirs(results_dir, exist_ok=True)
+    with open(os.path.join(results_dir, "results.jsonl"), "a") as f:
+        f.write(json.dumps(result) + "\n")
+    return result
+
+def load_results(results_dir=None):
+    """All stored benchmark runs, oldest first."""
+    results_dir = os.path.normpath(results_dir or load_config().get("benchmark_dir", "data/benchmarks"))
+    results_path = os.path.join(results_dir, "results.jsonl")
+    if not os.path.exists(results_path):
+        return []
+    with open(results_path, "r") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def find_baseline(result, previous_results):
+    """Latest earlier run on the same host and dataset, or None."""
+    for previous in reversed(previous_results):
+        if previous is result or previous["timestamp"] >= result["timestamp"]:
+            continue
+        if (previous["host"], previous["n_sales"], previous["seed"]) == (result["host"], result["n_sales"], result["seed"]):
+            return previous
+    return None
+
+def compare_results(result, baseline, tolerance=0.15):
+    """
+    Compare the throughput of each benchmark with a baseline run.
+
+    Args:
+        result (dict): Run to check.
+        baseline (dict): Earlier run of the same dataset, or None.
+        tolerance (float): Allowed drop in rows per second, e.g. 0.15 for 15%.
+
+    Returns:
+        dict: Per benchmark, the relative change in rows per second (None without a
+              baseline) and whether it is a regression.
+    """
+    comparison = {}
+    for name, current in result["benchmarks"].items():
+        previous = (baseline or {}).get("benchmarks", {}).get(name)
+        change = None
+        if previous and previous.get("rows_per_second") and current.get("rows_per_second"):
+            change = current["rows_per_second"] / previous["rows_per_second"] - 1
+        comparison[name] = {"change": change, "regression": change is not None and change < -tolerance}
+    return comparison
+
+def print_report(result, comparison):
+    """Print a table of the run's results and their change since the baseline."""
+    print(f"\nBenchmarks on {result['n_sales']} sales rows (commit {result['commit']}, best of {result['repeat']}):")
+    print(f"  {'benchmark':<24}{'rows':>12}{'seconds':>10}{'rows/s':>14}{'peak MB':>10}{'change':>9}")
+    for name, entry in result["benchmarks"].items():
+        change = comparison[name]["change"]
+        change_text = "" if change is None else f"{change:+.0%}" + (" !" if comparison[name]["regression"] else "")
+        peak_mb = (entry["peak_rss_bytes"] or 0) / 1024 ** 2
+        print(f"  {name:<24}{entry['rows']:>12}{entry['wall_seconds']:>10.3f}"
+              f"{entry['rows_per_second'] or 0:>14,.0f}{peak_mb:>10.0f}{change_text:>9}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline on synthetic retail data (no network needed).")
+    parser.add_argument("--sales-rows", type=float, default=1e5, help="Sales rows to generate, 1e4 to 1e8")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="Benchmarks to run (default: all)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per benchmark; the fastest is reported")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic dataset")
+    parser.add_argument("--data-dir", help="Where to generate the dataset")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed throughput drop before a regression")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit with status 1 on a regression")
+    args = parser.parse_args()
+
+    result = run_benchmarks(int(args.sales_rows), args.only, args.repeat, args.seed, args.data_dir)
+    comparison = compare_results(result, find_baseline(result, load_results()), args.tolerance)
+    print_report(result, comparison)
+
+    regressions = [name for name, entry in comparison.items() if entry["regression"]]
+    if regressions:
+        print(f"\nThroughput regressions: {', '.join(regressions)}")
+        if args.fail_on_regression:
+            sys.exit(1)
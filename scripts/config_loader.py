@@ -1,33 +1,257 @@
 import json
 import os
+from types import MappingProxyType
+from collections.abc import Mapping
 
 # Define the absolute path to config.json
 CONFIG_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # Moves up one directory
 CONFIG_PATH = os.path.join(CONFIG_DIR, "config", "config.json")
 
-def load_config(config_path=CONFIG_PATH):
+# Environment variable that points the pipeline at another configuration file
+CONFIG_PATH_ENV = "PIPELINE_CONFIG"
+
+# Prefix of environment variables that override one setting, e.g. PIPELINE_CHUNK_SIZE=500000.
+# Values are parsed as JSON (numbers, true/false, null, lists), anything else is a string.
+CONFIG_ENV_PREFIX = "PIPELINE_"
+
+# Expected type of each known setting, with its allowed values or minimum where it has one.
+# Settings not listed here are passed through unchecked.
+CONFIG_SCHEMA = {
+    "zip_url": {"type": str},
+    "zip_path": {"type": str},
+    "extracted_to": {"type": str},
+    "extract_mode": {"type": str, "choices": ["extract", "zip"]},
+    "processed_to": {"type": str},
+    "files_to_process": {"type": list},
+    "file_suffix": {"type": str},
+    "download_workers": {"type": int, "min": 1, "nullable": True},
+    "download_part_size": {"type": int, "min": 1, "nullable": True},
+    "extract_workers": {"type": int, "min": 1, "nullable": True},
+    "chunk_size": {"type": int, "min": 1, "nullable": True},
+    "storage_format": {"type": str, "choices": ["csv", "parquet"]},
+    "parquet_compression": {"type": str, "nullable": True},
+    "parallel": {"type": bool},
+    "validation_enabled": {"type": bool},
+    "validation_fail_on_breach": {"type": bool},
+    "validation_max_quarantine_rate": {"type": (int, float), "min": 0},
+    "quarantine_dir": {"type": str, "nullable": True},
+    "max_workers": {"type": int, "min": 1, "nullable": True},
+    "split_min_bytes": {"type": int, "min": 0},
+    "cache_enabled": {"type": bool},
+    "cache_dir": {"type": str},
+    "cache_max_bytes": {"type": int, "min": 0},
+    "model_path": {"type": str},
+    "training_mode": {"type": str, "choices": ["sample", "streaming", "sparse", "search"]},
+    "training_sample_size": {"type": int, "min": 1},
+    "training_chunk_size": {"type": int, "min": 1, "nullable": True},
+    "sparse_hash_buckets": {"type": int, "min": 1},
+    "sparse_alpha": {"type": (int, float), "min": 0},
+    "search_candidates": {"type": list, "nullable": True},
+    "search_folds": {"type": int, "min": 1},
+    "search_time_budget": {"type": (int, float), "min": 0, "nullable": True},
+    "search_report_path": {"type": str},
+    "metrics_enabled": {"type": bool},
+    "metrics_dir": {"type": str},
+    "profile_stages": {"type": list},
+    "profile_memory": {"type": bool},
+    "profile_dir": {"type": str},
+    "benchmark_dir": {"type": str},
+    "checkpoint_path": {"type": str},
+    "cube_dir": {"type": str},
+    "forecast_path": {"type": str},
+    "forecast_horizon": {"type": int, "min": 1},
+    "forecast_method": {"type": str, "choices": ["ses", "promo_regression", "ses_promo"]},
+    "forecast_alphas": {"type": list, "nullable": True},
+    "forecast_shard_size": {"type": int, "min": 1},
+    "promotion_dir": {"type": str},
+    "promo_baseline_weeks": {"type": int, "min": 1},
+    "customer_features_path": {"type": str},
+    "use_customer_features": {"type": bool},
+    "basket_dir": {"type": str},
+    "basket_min_support": {"type": (int, float), "min": 0},
+    "basket_top_k": {"type": int, "min": 1},
+    "basket_partitions": {"type": int, "min": 1},
+    "serve_host": {"type": str},
+    "serve_port": {"type": int, "min": 0},
+    "serve_max_batch_size": {"type": int, "min": 1},
+    "serve_max_wait_ms": {"type": (int, float), "min": 0},
+}
+
+def freeze(value):
+    """Read-only copy of a JSON value: objects become read-only mappings and arrays tuples."""
+    if isinstance(value, Mapping):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+def thaw(value):
+    """Mutable copy of a frozen value, as json.load would have returned it."""
+    if isinstance(value, Mapping):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(item) for item in value]
+    return value
+
+class Config(Mapping):
+    """
+    Read-only settings loaded from a configuration file, with environment overrides applied.
+
+    It is used like the dict load_config used to return (config.get(key, default),
+    config[key], iteration), but cannot be changed, so one cached instance can be
+    shared by every caller. Lists are returned as tuples; to_dict() gives a
+    mutable copy.
+    """
+
+    def __init__(self, values, path=None):
+        self._values = freeze(values)
+        self.path = path
+
+    def __getitem__(self, key):
+        return self._values[key]
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __repr__(self):
+        return f"Config({self.to_dict()!r})"
+
+    def to_dict(self):
+        """Mutable copy of the settings, e.g. to derive and save another configuration."""
+        return thaw(self._values)
+
+def get_env_overrides(environ=None):
+    """
+    Settings overridden by PIPELINE_<SETTING> environment variables.
+
+    Returns:
+        dict: Parsed values keyed by setting name, e.g. {"chunk_size": 500000}.
     """
-    Load and return the configuration file as a dictionary.
-    
+    environ = os.environ if environ is None else environ
+    overrides = {}
+    for name, raw_value in environ.items():
+        if not name.startswith(CONFIG_ENV_PREFIX) or name == CONFIG_PATH_ENV:
+            continue
+        try:
+            value = json.loads(raw_value)
+        except json.JSONDecodeError:
+            value = raw_value  # Plain strings such as PIPELINE_STORAGE_FORMAT=parquet
+        overrides[name[len(CONFIG_ENV_PREFIX):].lower()] = value
+    return overrides
+
+def validate_config(values, config_path):
+    """
+    Check the known settings against CONFIG_SCHEMA.
+
+    Raises:
+        ValueError: Listing every invalid setting.
+    """
+    errors = []
+    for key, rule in CONFIG_SCHEMA.items():
+        if key not in values:
+            continue
+        value = values[key]
+        if value is None:
+            if not rule.get("nullable"):
+                errors.append(f"'{key}' must not be null")
+            continue
+        # bool is a subclass of int, but true/false is never a valid count or size
+        if not isinstance(value, rule["type"]) or (rule["type"] is not bool and isinstance(value, bool)):
+            types = rule["type"] if isinstance(rule["type"], tuple) else (rule["type"],)
+            errors.append(f"'{key}' must be of type {' or '.join(t.__name__ for t in types)}, got {value!r}")
+        elif "choices" in rule and value not in rule["choices"]:
+            errors.append(f"'{key}' must be one of {rule['choices']}, got {value!r}")
+        elif "min" in rule and value < rule["min"]:
+            errors.append(f"'{key}' must be at least {rule['min']}, got {value!r}")
+    if errors:
+        raise ValueError(f"Invalid configuration in {config_path}: " + "; ".join(errors))
+
+# Loaded configurations by path: (file modification time and size, Config)
+_config_cache = {}
+
+def clear_config_cache():
+    """Forget loaded configurations, so the next load_config re-reads the file and environment."""
+    _config_cache.clear()
+
+def load_config(config_path=None):
+    """
+    Load the configuration file, parsing it only when it has changed.
+
+    The file is parsed and validated once; later calls return the same cached,
+    read-only Config until the file's modification time or size changes.
+    PIPELINE_<SETTING> environment overrides are applied whenever the file is
+    parsed; call clear_config_cache() to pick up overrides set afterwards.
+
     Args:
-        config_path (str): Path to the configuration JSON file.
+        config_path (str, optional): Path to the configuration JSON file. Defaults to
+                                     $PIPELINE_CONFIG if set, else config/config.json.
 
     Returns:
-        dict: Configuration dictionary.
+        Config: Read-only mapping of the settings.
 
     Raises:
         FileNotFoundError: If the file does not exist.
-        ValueError: If JSON decoding fails.
+        ValueError: If JSON decoding fails or a setting is invalid.
     """
+    config_path = config_path or os.environ.get(CONFIG_PATH_ENV) or CONFIG_PATH
+    try:
+        stat = os.stat(config_path)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Configuration file not found: {config_path}")
+
+    signature = (stat.st_mtime_ns, stat.st_size)
+    cached = _config_cache.get(config_path)
+    if cached and cached[0] == signature:
+        return cached[1]
+
     try:
         with open(config_path, "r") as f:
-            return json.load(f)
+            values = json.load(f)
     except FileNotFoundError:
         raise FileNotFoundError(f"Configuration file not found: {config_path}")
     except json.JSONDecodeError:
         raise ValueError(f"Error decoding JSON in: {config_path}")
-    
+
+    values.update(get_env_overrides())
+    validate_config(values, config_path)
+    config = Config(values, config_path)
+    _config_cache[config_path] = (signature, config)
+    return config
+
 def get_files_to_process():
     """Retrieve the list of files to process from config.json."""
     config = load_config()
-    return config.get("files_to_process", [])  # Return an empty list if key is missing
+    return list(config.get("files_to_process", []))  # Return an empty list if key is missing
+
+# File extension used for each supported storage format
+STORAGE_EXTENSIONS = {"csv": ".csv", "parquet": ".parquet"}
+
+def get_storage_format():
+    """Retrieve the storage format for processed files from config.json."""
+    config = load_config()
+    storage_format = config.get("storage_format", "csv")
+    if storage_format not in STORAGE_EXTENSIONS:
+        raise ValueError(f"Unsupported storage format: {storage_format}")
+    return storage_format
+
+def get_processed_file_name(file_name, storage_format=None):
+    """
+    Build the name a raw file is saved under once processed, e.g. 'sales.csv' -> 'sales_processed.parquet'.
+
+    Args:
+        file_name (str): Name of the original CSV file.
+        storage_format (str, optional): 'csv' or 'parquet'. Defaults to 'storage_format' in config.json.
+
+    Returns:
+        str: File name with the configured suffix and storage format extension.
+    """
+    config = load_config()
+    suffix = config.get("file_suffix", "_clean")  # Get suffix from config, default to "_clean"
+    base_name, _ = os.path.splitext(file_name)
+    storage_format = storage_format if storage_format else get_storage_format()
+    if storage_format not in STORAGE_EXTENSIONS:
+        raise ValueError(f"Unsupported storage format: {storage_format}")
+    return f"{base_name}{suffix}{STORAGE_EXTENSIONS[storage_format]}"
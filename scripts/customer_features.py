@@ -0,0 +1,337 @@
+import os
+import numpy as np
+import pandas as pd
+
+from config_loader import load_config, get_processed_file_name
+from file_reader import load_df, iter_df_chunks
+from metrics import track_stage
+
+# Sales columns read to build the customer table
+CUSTOMER_SOURCE_COLUMNS = ["customer_id", "item_code", "supermarket_code", "week", "day", "quantity",
+                           "transaction_amount"]
+
+# Columns that join_customer_features puts in place of customer_id
+CUSTOMER_FEATURE_COLUMNS = ["customer_recency_days", "customer_tenure_days", "customer_active_weeks",
+                            "customer_transactions", "customer_avg_units", "customer_avg_amount",
+                            "customer_preferred_store", "customer_store_share", "customer_preferred_brand",
+                            "customer_brand_share"]
+
+# (customer, store) and (customer, brand) pairs are packed into one int64 key; customer_id is int32
+STORE_RADIX = 1 << 16
+BRAND_RADIX = 1 << 32
+
+# Buffered partial aggregates are merged once they hold at least this many rows
+COMPACT_ROWS = 4000000
+
+# How the partial aggregates of each column combine
+PARTIAL_UFUNCS = {"first_day": np.minimum, "last_day": np.maximum, "transactions": np.add, "units": np.add,
+                  "amount": np.add, "week_bits": np.bitwise_or}
+
+def get_customer_features_path():
+    """Retrieve the customer table path from config.json, creating its directory if needed."""
+    path = os.path.normpath(load_config().get("customer_features_path", "data/customers/customer_features.parquet"))
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    return path
+
+def reduce_by_key(keys, columns):
+    """
+    Combine the rows that share a key.
+
+    Args:
+        keys (np.ndarray): int64 key of every row.
+        columns (dict): {name: (values, ufunc)}; values have one row per key (2-D
+                        arrays are reduced row-wise) and ufunc combines two of them,
+                        e.g. np.add or np.maximum.
+
+    Returns:
+        tuple: (sorted unique keys, {name: combined values})
+    """
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else np.empty(0, dtype=np.int64)
+    reduced = {name: ufunc.reduceat(values[order], starts, axis=0) if len(keys) else values[:0]
+               for name, (values, ufunc) in columns.items()}
+    return keys[starts], reduced
+
+def reduce_partials(partials):
+    """
+    Merge partial aggregates into one.
+
+    Args:
+        partials (list): Dicts of {table: (keys, {column: values})} for the 'customers',
+                         'stores' and 'brands' tables; keys may repeat within a partial.
+
+    Returns:
+        dict: One partial of the same form, with unique sorted keys.
+    """
+    merged = {}
+    for table in ["customers", "stores", "brands"]:
+        parts = [partial[table] for partial in partials]
+        keys = np.concatenate([part_keys for part_keys, _ in parts])
+        columns = {}
+        for name in parts[0][1]:
+            values = [part_columns[name] for _, part_columns in parts]
+            if name == "week_bits":  # Partials may span different numbers of 64-week words
+                width = max(value.shape[1] for value in values)
+                values = [np.pad(value, ((0, 0), (0, width - value.shape[1]))) for value in values]
+            columns[name] = (np.concatenate(values), PARTIAL_UFUNCS[name])
+        merged[table] = reduce_by_key(keys, columns)
+    return merged
+
+class CustomerAggregator:
+    """
+    Per-customer recency, frequency, monetary and preference aggregates, built chunk by chunk.
+
+    Every chunk is reduced to partial aggregates that merge associatively: day
+    minima and maxima, sums, a bitmap of active weeks (combined with OR, so weeks
+    seen in several chunks are counted once) and transaction counts per (customer,
+    store) and (customer, brand) pair. Partials are buffered and merged once they
+    hold COMPACT_ROWS rows and twice the rows of the last merge, so memory depends
+    on the number of customers and pairs, not on the number of sales rows, and the
+    result does not depend on how the rows were split into chunks.
+    """
+
+    def __init__(self, brand_lookup):
+        """
+        Args:
+            brand_lookup (tuple): (sorted item codes, brand code of each); see load_brand_lookup.
+        """
+        self.item_codes, self.item_brands = brand_lookup
+        self.partials = []
+        self.buffered_rows = 0
+        self.compacted_rows = 0  # Rows of the partial left by the last merge
+
+    def partial_fit(self, chunk):
+        """Add a chunk of sales rows with CUSTOMER_SOURCE_COLUMNS to the aggregates."""
+        if chunk.empty:
+            return self
+        customers = chunk["customer_id"].to_numpy(np.int64)
+        weeks = chunk["week"].to_numpy(np.int64)
+        day = chunk["day"].to_numpy(np.int64)
+
+        n_words = int(weeks.max()) // 64 + 1
+        week_bits = np.zeros((len(chunk), n_words), dtype=np.uint64)
+        week_bits[np.arange(len(chunk)), weeks // 64] = np.left_shift(np.uint64(1), (weeks % 64).astype(np.uint64))
+
+        item_codes = chunk["item_code"].to_numpy(np.int64)
+        item_position = np.minimum(np.searchsorted(self.item_codes, item_codes), max(len(self.item_codes) - 1, 0))
+        brands = np.full(len(chunk), -1, dtype=np.int64)
+        if len(self.item_codes):
+            known_item = self.item_codes[item_position] == item_codes
+            brands[known_item] = self.item_brands[item_position[known_item]]
+        ones = np.ones(len(chunk), dtype=np.int64)
+
+        partial = reduce_partials([{
+            "customers": (customers, {
+                "first_day": day, "last_day": day, "transactions": ones,
+                "units": chunk["quantity"].to_numpy(np.int64),
+                "amount": chunk["transaction_amount"].to_numpy(np.float64), "week_bits": week_bits}),
+            "stores": (customers * STORE_RADIX + chunk["supermarket_code"].to_numpy(np.int64), {"transactions": ones}),
+            "brands": (customers[brands >= 0] * BRAND_RADIX + brands[brands >= 0], {"transactions": ones[brands >= 0]}),
+        }])
+        self.partials.append(partial)
+        self.buffered_rows += sum(len(keys) for keys, _ in partial.values())
+        if self.buffered_rows >= max(COMPACT_ROWS, 2 * self.compacted_rows):
+            self.compact()
+        return self
+
+    def merge(self, other):
+        """Add the aggregates of another CustomerAggregator (e.g. built on another part of the file)."""
+        self.partials.extend(other.partials)
+        self.buffered_rows += other.buffered_rows
+        self.compact()
+        return self
+
+    def compact(self):
+        """Merge the buffered partials into one."""
+        if len(self.partials) < 2:
+            return
+        self.partials = [reduce_partials(self.partials)]
+        self.buffered_rows = self.compacted_rows = sum(len(keys) for keys, _ in self.partials[0].values())
+
+    def to_table(self, brand_names):
+        """
+        Final per-customer table, one row per customer sorted by customer_id.
+
+        Recency is measured in days from the last day of the data, frequency is the
+        number of distinct weeks with a purchase, the amount and units are totals
+        (join_customer_features turns them into averages) and the preferred store
+        and brand are the ones with the most transactions (the smallest code on ties).
+
+        Args:
+            brand_names (np.ndarray): Brand name of each brand code.
+
+        Returns:
+            pd.DataFrame: The customer table.
+        """
+        self.compact()
+        if not self.partials:
+            return pd.DataFrame({"customer_id": pd.Series(dtype="int32")})
+        customer_keys, customers = self.partials[0]["customers"]
+        week_bits = customers["week_bits"]
+        active_weeks = np.unpackbits(week_bits.view(np.uint8), axis=1).sum(axis=1) if len(week_bits) else \
+            np.zeros(0, dtype=np.int64)
+
+        table = pd.DataFrame({
+            "customer_id": customer_keys.astype(np.int32),
+            "customer_recency_days": (customers["last_day"].max(initial=0) - customers["last_day"]).astype(np.int32),
+            "customer_tenure_days": (customers["last_day"] - customers["first_day"]).astype(np.int32),
+            "customer_active_weeks": active_weeks.astype(np.int32),
+            "transactions": customers["transactions"].astype(np.int32),
+            "units": customers["units"],
+            "amount": customers["amount"],
+        })
+        for name, radix in [("store", STORE_RADIX), ("brand", BRAND_RADIX)]:
+            pair_keys, pairs = self.partials[0][f"{name}s"]
+            owner, value = np.divmod(pair_keys, radix)
+            order = np.lexsort((value, -pairs["transactions"], owner))  # Most transactions first per customer
+            first = order[np.r_[True, owner[order][1:] != owner[order][:-1]]] if len(order) else order
+            position = np.searchsorted(customer_keys, owner[first])
+            preferred = np.full(len(table), -1, dtype=np.int64)
+            share = np.zeros(len(table), dtype=np.float32)
+            preferred[position] = value[first]
+            share[position] = pairs["transactions"][first] / table["transactions"].to_numpy()[position]
+            if name == "brand":
+                table["customer_preferred_brand"] = pd.Categorical.from_codes(preferred, categories=brand_names)
+            else:
+                table["customer_preferred_store"] = preferred.astype(np.int32)
+            table[f"customer_{name}_share"] = share
+        return table
+
+def load_brand_lookup(folder):
+    """
+    Brand code of every item of the processed item file.
+
+    Returns:
+        tuple: ((sorted item codes, brand code of each, -1 for no brand), brand names)
+    """
+    items = load_df(get_processed_file_name("item.csv"), folder, columns=["item_code", "item_brand"])
+    items = items.drop_duplicates("item_code").sort_values("item_code")
+    brand_codes, brand_names = pd.factorize(items["item_brand"].astype(object), sort=True)
+    return (items["item_code"].to_numpy(np.int64), brand_codes.astype(np.int64)), np.asarray(brand_names, dtype=object)
+
+def build_customer_features(chunk_size=None, output_path=None):
+    """
+    Compute the customer table in one streaming pass over the processed sales file.
+
+    Args:
+        chunk_size (int, optional): Sales rows per chunk. Defaults to 'chunk_size' in config.json.
+        output_path (str, optional): Parquet file to write. Defaults to 'customer_features_path'.
+
+    Returns:
+        str: Path of the customer table.
+    """
+    folder = load_config().get("processed_to", "data/clean")
+    output_path = output_path or get_customer_features_path()
+    brand_lookup, brand_names = load_brand_lookup(folder)
+
+    print("\nComputing customer features...")
+    with track_stage("customer_features") as metrics:
+        aggregator, n_rows = CustomerAggregator(brand_lookup), 0
+        for chunk in iter_df_chunks(get_processed_file_name("sales.csv"), folder, chunk_size,
+                                    columns=CUSTOMER_SOURCE_COLUMNS):
+            aggregator.partial_fit(chunk)
+            n_rows += len(chunk)
+        table = aggregator.to_table(brand_names)
+        metrics["rows_in"], metrics["rows_out"] = n_rows, len(table)
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    table.to_parquet(output_path, index=False)
+    print(f"Customer features saved to: {output_path} ({len(table)} customers)")
+    return output_path
+
+# Customer tables already loaded by load_customer_table, keyed by path and modification time
+_loaded_tables = {}
+
+def load_customer_table(path=None):
+    """
+    Load the customer table, reusing the loaded copy until the file changes.
+
+    Args:
+        path (str, optional): Parquet file. Defaults to 'customer_features_path' in config.json.
+
+    Returns:
+        pd.DataFrame: The customer table, sorted by customer_id.
+
+    Raises:
+        FileNotFoundError: If the table has not been built.
+    """
+    path = path or get_customer_features_path()
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Customer features not found: {path} (run the 'customers' stage first)")
+    cache_key = (os.path.abspath(path), os.stat(path).st_mtime_ns)
+    if cache_key not in _loaded_tables:
+        _loaded_tables.clear()
+        _loaded_tables[cache_key] = pd.read_parquet(path)
+    return _loaded_tables[cache_key]
+
+def lookup_customer_features(customer_ids, table, own_units=None, own_amount=None):
+    """
+    Model features of each customer, looked up by binary search in the sorted customer table.
+
+    Customers missing from the table get 0 for every numeric feature, -1 as
+    preferred store and no preferred brand. When the rows being scored are part of
+    the history the table was built from (training), pass their units and amount:
+    they are left out of the customer's transaction count and averages, so a row's
+    own amount does not leak into its features.
+
+    Args:
+        customer_ids (array-like): customer_id of every row.
+        table (pd.DataFrame): Customer table from build_customer_features.
+        own_units (array-like, optional): quantity of every row, to leave out.
+        own_amount (array-like, optional): transaction_amount of every row, to leave out.
+
+    Returns:
+        dict: {column: array} for every CUSTOMER_FEATURE_COLUMNS column.
+    """
+    keys = table["customer_id"].to_numpy(np.int64)
+    customer_ids = pd.to_numeric(pd.Series(np.asarray(customer_ids)), errors="coerce").fillna(-1).to_numpy(np.int64)
+    position = np.minimum(np.searchsorted(keys, customer_ids), max(len(keys) - 1, 0))
+    found = keys[position] == customer_ids if len(keys) else np.zeros(len(customer_ids), dtype=bool)
+    rows = np.where(found, position, -1)
+
+    def gather(col, fill):
+        return pd.api.extensions.take(table[col].to_numpy(), rows, allow_fill=True, fill_value=fill)
+
+    transactions = gather("transactions", 0).astype(np.float64)
+    units, amount = gather("units", 0).astype(np.float64), gather("amount", 0.0).astype(np.float64)
+    if own_units is not None:
+        transactions = np.where(found, transactions - 1, 0)
+        units = np.where(found, units - np.asarray(own_units, dtype=np.float64), 0.0)
+        amount = np.where(found, amount - np.asarray(own_amount, dtype=np.float64), 0.0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        avg_units = np.where(transactions > 0, units / transactions, 0.0)
+        avg_amount = np.where(transactions > 0, amount / transactions, 0.0)
+
+    return {
+        "customer_recency_days": gather("customer_recency_days", 0),
+        "customer_tenure_days": gather("customer_tenure_days", 0),
+        "customer_active_weeks": gather("customer_active_weeks", 0),
+        "customer_transactions": transactions,
+        "customer_avg_units": avg_units,
+        "customer_avg_amount": avg_amount,
+        "customer_preferred_store": gather("customer_preferred_store", -1),
+        "customer_store_share": gather("customer_store_share", 0.0),
+        "customer_preferred_brand": pd.Categorical(table["customer_preferred_brand"].array.take(rows, allow_fill=True)),
+        "customer_brand_share": gather("customer_brand_share", 0.0),
+    }
+
+def join_customer_features(df, table, exclude_own=False):
+    """
+    Replace the customer_id column of df by the customer's features from the customer table.
+
+    Args:
+        df (pd.DataFrame): Rows with a customer_id column.
+        table (pd.DataFrame): Customer table from build_customer_features.
+        exclude_own (bool): Leave each row's own quantity and transaction_amount out of its
+                            customer's totals, for rows the table was built from.
+
+    Returns:
+        pd.DataFrame: df without customer_id and with the CUSTOMER_FEATURE_COLUMNS columns.
+    """
+    with track_stage("customer_join") as metrics:
+        own = {"own_units": df["quantity"], "own_amount": df["transaction_amount"]} if exclude_own else {}
+        features = lookup_customer_features(df["customer_id"], table, **own)
+        joined = df.drop(columns=["customer_id"]).assign(**features)
+        metrics["rows_in"], metrics["rows_out"] = len(df), len(joined)
+    return joined
@@ -1,8 +1,187 @@
+import re
 import pandas as pd
 import numpy as np
 from datetime import datetime
+from functools import lru_cache
 
 
+# Compiled patterns used to clean item text and parse item sizes
+TYPE_SUFFIX_PATTERN = re.compile(r'Type [23]')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+ALPHA_START_PATTERN = re.compile(r'^[A-Za-z]')
+BEFORE_DIGIT_PATTERN = re.compile(r'^(.*?)(?=\d)')
+FROM_DIGIT_PATTERN = re.compile(r'(\d.*)')
+UOM_PATTERN = re.compile(r'([A-Za-z].*)')
+NUMBER_PATTERN = re.compile(r'(\d+\.?\d*)')
+
+# Size values that are really notes (besides anything starting with 'KH')
+NOTE_SIZES = {'CUST REQST', 'NO TAG'}
+
+# Sizes that need a manual fix, either a new size or a (size, note) pair
+SIZE_SPECIAL_CASES = {
+    "GAL": "1 GAL",
+    "13 OZ FMLY": ("13 OZ", "FMLY"),
+    "45 OZ PET": ("45 OZ", "PET"),
+    "6 LB 11 OZ": "107 OZ"
+}
+
+# Normalized unit names
+UNIT_REPLACEMENTS = {"OUNCE": "OZ", "OZ.": "OZ", "Z": "OZ", "OZ FMLY": "OZ"}
+
+def map_unique(series, func):
+    """
+    Apply func once per distinct value of a Series and broadcast the results back to every row.
+
+    Missing values are left as they are, like pandas .str methods do. Item catalogs
+    repeat brands and sizes heavily, so this is much cheaper than running a chain of
+    .str methods over every row.
+
+    Args:
+        series (pd.Series): Values to transform.
+        func (callable): Function of one non-missing value.
+
+    Returns:
+        np.ndarray: Object array with func's result for each row.
+    """
+    codes, uniques = pd.factorize(series)
+    results = np.empty(len(uniques) + 1, dtype=object)  # Code -1 (missing) picks the spare last slot
+    for i, value in enumerate(uniques):
+        results[i] = func(value)  # Element-wise so tuple results are not unpacked by numpy
+    mapped = results[codes]
+    missing = codes == -1
+    mapped[missing] = series.to_numpy(dtype=object)[missing]
+    return mapped
+
+def clean_text(value):
+    """Remove 'Type 2'/'Type 3' tags and collapse whitespace in a description or brand."""
+    if not isinstance(value, str):
+        return np.nan
+    return WHITESPACE_PATTERN.sub(' ', TYPE_SUFFIX_PATTERN.sub('', value)).strip()
+
+@lru_cache(maxsize=65536)
+def normalize_size(value):
+    """Clean a raw size string; placeholders such as '##########' become NaN."""
+    if value in ('##########', ''):
+        return np.nan
+    return WHITESPACE_PATTERN.sub(' ', value).replace('%', '').strip()
+
+@lru_cache(maxsize=65536)
+def parse_size(size):
+    """
+    Split a normalized size string into its number, unit of measure and note.
+
+    Args:
+        size (str): Normalized size, e.g. '6 1/2 OZ', 'N 1 LB' or '13 OZ FMLY'.
+
+    Returns:
+        tuple: (number, uom, note). number is the numeric text or NaN,
+               uom is the normalized unit or NaN, note is a string or None.
+    """
+    note = None
+
+    # Alphabetic prefix goes to the note, the rest from the first digit stays the size
+    if ALPHA_START_PATTERN.match(size):
+        prefix = BEFORE_DIGIT_PATTERN.match(size)
+        note = (prefix.group(1) if prefix else size).strip()
+        from_digit = FROM_DIGIT_PATTERN.search(size)
+        if not from_digit:
+            return np.nan, np.nan, note
+        size = from_digit.group(1)
+
+    # Handle special cases
+    value = SIZE_SPECIAL_CASES.get(size)
+    if isinstance(value, tuple):
+        size, note = value
+    elif value is not None:
+        size = value
+
+    # Replace fraction notation
+    size = size.replace(' 1/2', '.5')
+
+    # Extract unit of measure (UOM) and the numeric part
+    uom = UOM_PATTERN.search(size)
+    uom = UNIT_REPLACEMENTS.get(uom.group(1), uom.group(1)) if uom else np.nan
+    number = NUMBER_PATTERN.search(size)
+    number = number.group(1) if number else np.nan
+
+    return number, uom, note
+
+def parse_desc_size(desc):
+    """
+    Parse the size embedded in a description, for items whose size field holds a note.
+
+    Returns:
+        tuple: (number, uom, note, desc) where desc has the size text removed.
+    """
+    if not isinstance(desc, str):
+        return np.nan, np.nan, None, np.nan
+
+    prefix = BEFORE_DIGIT_PATTERN.match(desc)
+    short_desc = (prefix.group(1) if prefix else desc).strip()
+    from_digit = FROM_DIGIT_PATTERN.search(desc)
+    if not from_digit:
+        return np.nan, np.nan, None, short_desc
+    return parse_size(from_digit.group(1)) + (short_desc,)
+
+def parse_item_sizes(sizes, descs):
+    """
+    Parse raw item sizes into numeric size, unit of measure and note in one pass.
+
+    Each distinct raw size is parsed once and the result is gathered back to
+    every row. Sizes that are really notes ('CUST REQST', 'NO TAG', 'KH...')
+    take their size from the description instead, which is parsed once per
+    distinct description and shortened to the text before the size.
+
+    Args:
+        sizes (pd.Series): Raw 'size' values.
+        descs (pd.Series): Cleaned descriptions, aligned with sizes.
+
+    Returns:
+        pd.DataFrame: item_size (float), item_uom, item_note and item_desc, indexed like sizes.
+    """
+    size_codes, size_uniques = pd.factorize(sizes)
+    n_uniques = len(size_uniques) + 1  # Last slot holds the result for missing sizes
+
+    numbers = np.full(n_uniques, np.nan, dtype=object)
+    uoms = np.full(n_uniques, np.nan, dtype=object)
+    notes = np.full(n_uniques, None, dtype=object)
+    is_note = np.zeros(n_uniques, dtype=bool)
+
+    for i, raw_size in enumerate(size_uniques):
+        if not isinstance(raw_size, str):
+            continue
+        size = normalize_size(raw_size)
+        if not isinstance(size, str):
+            continue
+        if size in NOTE_SIZES or size.startswith('KH'):
+            notes[i], is_note[i] = size, True
+        else:
+            numbers[i], uoms[i], notes[i] = parse_size(size)
+
+    item_size = numbers[size_codes]
+    item_uom = uoms[size_codes]
+    item_note = notes[size_codes]
+    item_desc = np.asarray(descs, dtype=object).copy()
+
+    # Rows whose size was a note take their size from the description
+    note_rows = np.flatnonzero(is_note[size_codes])
+    if len(note_rows):
+        parsed = [p if isinstance(p, tuple) else (np.nan, np.nan, None, p)  # Missing descriptions stay as they are
+                  for p in map_unique(pd.Series(item_desc[note_rows]), parse_desc_size)]
+        item_size[note_rows] = [p[0] for p in parsed]
+        item_uom[note_rows] = [p[1] for p in parsed]
+        item_note[note_rows] = [p[2] if p[2] is not None else note
+                                for p, note in zip(parsed, item_note[note_rows])]
+        item_desc[note_rows] = [p[3] for p in parsed]
+
+    # Convert the numeric text in one pass
+    item_size = pd.to_numeric(pd.Series(item_size, index=sizes.index), errors='coerce')
+
+    parsed = pd.DataFrame({"item_size": item_size, "item_uom": item_uom,
+                           "item_note": item_note, "item_desc": item_desc}, index=sizes.index)
+    parsed["item_uom"] = parsed["item_uom"].infer_objects()  # All-missing units become float, as before
+    return parsed
+
 def clean_items_data(items):
     """
     Clean the items DataFrame by standardizing column names and processing text fields.
@@ -26,68 +205,12 @@ def clean_items_data(items):
 
     # Clean description & brand columns
     for col in ["item_desc", "item_brand"]:
-        items[col] = (items[col]
-                      .str.replace(r'Type [23]', '', regex=True)
-                      .str.replace(r'\s+', ' ', regex=True)
-                      .str.strip())
-
-    # Clean size column
-    items["item_size"] = (items["item_size"]
-                          .replace({'##########': np.nan, '': np.nan})
-                          .str.replace(r'\s+', ' ', regex=True)
-                          .str.replace('%', '', regex=False)
-                          .str.strip())
-
-    # Move specific 'item_size' values to 'item_note'
-    condition = items['item_size'].isin(['CUST REQST', 'NO TAG']) | items['item_size'].str.startswith('KH', na=False)
-    items.loc[condition, 'item_note'] = items.loc[condition, 'item_size']
-    items.loc[condition, 'item_size'] = np.nan
-
-    # Extract size from 'item_desc' where 'item_note' is not null
-    desc_condition = items["item_note"].notna()
-    items.loc[desc_condition, "item_size"] = items.loc[desc_condition, "item_desc"].str.extract(r'(\d.*)')[0]
-    items.loc[desc_condition, "item_desc"] = (
-        items.loc[desc_condition, "item_desc"].str.extract(r'^(.*?)(?=\d)')[0]
-        .fillna(items.loc[desc_condition, "item_desc"])
-        .str.strip()
-    )
-
-    # Extract alphabetic part to 'item_note' if 'item_size' starts with letters
-    size_alpha_condition = items["item_size"].str.match(r'^[A-Za-z]', na=False)
-    items.loc[size_alpha_condition, "item_note"] = (
-        items.loc[size_alpha_condition, "item_size"].str.extract(r'^(.*?)(?=\d)')[0]
-        .fillna(items.loc[size_alpha_condition, "item_size"])
-        .str.strip()
-    )
-    items.loc[size_alpha_condition, "item_size"] = items.loc[size_alpha_condition, "item_size"].str.extract(r'(\d.*)')[0]
+        items[col] = map_unique(items[col], clean_text)
 
-    # Handle special cases
-    special_cases = {
-        "GAL": "1 GAL",
-        "13 OZ FMLY": ("13 OZ", "FMLY"),
-        "45 OZ PET": ("45 OZ", "PET"),
-        "6 LB 11 OZ": "107 OZ"
-    }
-
-    for key, value in special_cases.items():
-        if isinstance(value, tuple):
-            items.loc[items["item_size"] == key, ["item_size", "item_note"]] = value
-        else:
-            items.loc[items["item_size"] == key, "item_size"] = value
-
-    # Replace fraction notation
-    items['item_size'] = items['item_size'].str.replace(' 1/2', '.5', regex=False)
-
-    # Extract unit of measure (UOM) from 'item_size'
-    items['item_uom'] = items['item_size'].str.extract(r'([A-Za-z].*)')
-    items['item_size'] = items['item_size'].str.extract(r'(\d+\.?\d*)')[0]
-
-    # Convert 'item_size' to float
-    items['item_size'] = pd.to_numeric(items['item_size'], errors='coerce')
-
-    # Normalize unit names
-    unit_replacements = {"OUNCE": "OZ", "OZ.": "OZ", "Z": "OZ", "OZ FMLY": "OZ"}
-    items["item_uom"] = items["item_uom"].replace(unit_replacements)
+    # Parse size, unit of measure and note (and move sizes out of descriptions)
+    parsed = parse_item_sizes(items["item_size"], items["item_desc"])
+    for col in ["item_size", "item_uom", "item_note", "item_desc"]:
+        items[col] = parsed[col]
 
     return items
 
@@ -135,3 +258,16 @@ CLEANING_FUNCTIONS = {
     "sales.csv": clean_sales_data,
     "supermarkets.csv": clean_supermarkets_data
 }
+
+# Version of each cleaning function; bump it when the function's output changes
+# so cached outputs from the previous version are not reused
+CLEANING_FUNCTION_VERSIONS = {
+    "item.csv": 2,
+    "promotion.csv": 2,
+    "sales.csv": 2,
+    "supermarkets.csv": 2
+}
+
+# Files whose cleaning function only works row by row (renaming columns), so the
+# file can be cleaned chunk by chunk with the same output as a full load
+CHUNKABLE_FILES = {"promotion.csv", "sales.csv", "supermarkets.csv"}
@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+from config_loader import get_processed_file_name, STORAGE_EXTENSIONS
+
+# Dtypes of the raw files, keyed like CLEANING_FUNCTIONS.
+# Integer columns are parsed as int64 and narrowed chunk by chunk (see apply_schema),
+# repeated strings are parsed straight into categoricals, and only the 'usecols'
+# columns are read.
+RAW_SCHEMAS = {
+    "item.csv": {
+        "dtype": {"code": "int64", "descrption": "object", "type": "category", "brand": "object", "size": "object"},
+    },
+    "promotion.csv": {
+        "dtype": {"code": "int64", "supermarkets": "int16", "week": "int16", "feature": "category",
+                  "display": "category", "province": "int8"},
+    },
+    "sales.csv": {
+        "dtype": {"code": "int64", "amount": "float64", "units": "int16", "time": "int16", "province": "int8",
+                  "week": "int16", "customerId": "int32", "supermarket": "int16", "basket": "int32",
+                  "day": "int16", "voucher": "int8"},
+    },
+    "supermarkets.csv": {
+        "dtype": {"supermarket_No": "int16", "postal-code": "int32"},
+    },
+}
+for _schema in RAW_SCHEMAS.values():
+    _schema["usecols"] = list(_schema["dtype"])  # Every raw column feeds a cleaner
+
+# Dtypes of the processed files (cleaned column names), keyed by the raw file name
+PROCESSED_SCHEMAS = {
+    "item.csv": {
+        "dtype": {"item_code": "int64", "item_desc": "object", "item_type": "category", "item_brand": "category",
+                  "item_size": "float64", "item_uom": "category", "item_note": "object"},
+    },
+    "promotion.csv": {
+        "dtype": {"item_code": "int64", "supermarket_code": "int16", "week": "int16", "feature": "category",
+                  "display": "category", "province": "int8"},
+    },
+    "sales.csv": {
+        "dtype": {"item_code": "int64", "transaction_amount": "float64", "quantity": "int16", "time": "int16",
+                  "province": "int8", "week": "int16", "customer_id": "int32", "supermarket_code": "int16",
+                  "basket": "int32", "day": "int16", "voucher": "int8"},
+    },
+    "supermarkets.csv": {
+        "dtype": {"supermarket_code": "int16", "postal_code": "int32"},
+    },
+}
+
+def get_schema(file_name):
+    """
+    Find the schema of a raw or processed file.
+
+    Args:
+        file_name (str): Raw file name (e.g. "sales.csv") or processed file name
+                         (e.g. "sales_processed.parquet").
+
+    Returns:
+        dict: {"dtype": {column: dtype}, "usecols": [...] (optional)}, or None for unknown files.
+    """
+    if file_name in RAW_SCHEMAS:
+        return RAW_SCHEMAS[file_name]
+    for raw_name, schema in PROCESSED_SCHEMAS.items():
+        if any(file_name == get_processed_file_name(raw_name, storage_format) for storage_format in STORAGE_EXTENSIONS):
+            return schema
+    return None
+
+def is_integer_dtype(dtype):
+    """True for numpy integer dtype names such as "int16"."""
+    return dtype != "category" and pd.api.types.is_integer_dtype(np.dtype(dtype))
+
+def get_parse_dtypes(schema):
+    """
+    Dtypes that pd.read_csv applies while parsing: categoricals and text.
+
+    Numeric columns are left out. pandas wraps out-of-range values silently when
+    parsing into narrow integers, so they are narrowed afterwards by apply_schema,
+    and an explicit float64 only slows the parser down without changing the result.
+    """
+    return {col: dtype for col, dtype in schema["dtype"].items()
+            if dtype == "category" or not pd.api.types.is_numeric_dtype(np.dtype(dtype))}
+
+def narrow_integers(series, dtype):
+    """Cast an integer column to a narrower integer dtype, or return it unchanged if a value would not fit."""
+    if not pd.api.types.is_integer_dtype(series.dtype):  # Parsed as float or text: missing or non-integer values
+        return series
+    info = np.iinfo(dtype)
+    if len(series) and (series.min() < info.min or series.max() > info.max):
+        return series
+    return series.astype(dtype)
+
+def apply_schema(df, schema):
+    """
+    Cast the columns of a DataFrame to the dtypes of a schema, without changing any value.
+
+    Integer columns that hold missing values, fractions or values out of range keep
+    their parsed dtype, and columns the schema does not list are left as they are.
+
+    Args:
+        df (pd.DataFrame): Parsed DataFrame (or chunk).
+        schema (dict): Entry of RAW_SCHEMAS or PROCESSED_SCHEMAS, or None.
+
+    Returns:
+        pd.DataFrame: The same DataFrame, with its columns cast in place.
+    """
+    if not schema:
+        return df
+    for col, dtype in schema["dtype"].items():
+        if col not in df.columns or df[col].dtype == dtype:
+            continue
+        if is_integer_dtype(dtype):
+            df[col] = narrow_integers(df[col], dtype)
+        elif dtype == "category":
+            df[col] = df[col].astype("category")
+    return df
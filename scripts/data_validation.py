@@ -0,0 +1,280 @@
+import os
+import json
+import time
+import numpy as np
+import pandas as pd
+
+from config_loader import load_config
+from file_reader import open_csv_source, read_csv_chunks
+from metrics import track_stage
+from data_schema import PROCESSED_SCHEMAS, is_integer_dtype, narrow_integers
+
+# Version of the rules and checks; bump it when they change which rows are quarantined
+# so cached cleaned files from the previous version are not reused
+VALIDATION_VERSION = 1
+
+# Checks on the cleaned rows of each file, keyed like CLEANING_FUNCTIONS:
+#   not_null: columns that must have a value
+#   unique: columns whose values may appear only once (the first row is kept)
+#   ranges: column -> (min, max) allowed, either bound None for no limit
+#   references: column -> (raw file, raw key column) its values must appear in
+#   max_null_rates: column -> largest share of missing values before the file fails
+# Rows failing any of the first four checks are quarantined; null rates are checked per file.
+VALIDATION_RULES = {
+    "item.csv": {
+        "not_null": ["item_code"],
+        "unique": ["item_code"],
+        "ranges": {"item_size": (0, None)},
+        "max_null_rates": {"item_brand": 0.05, "item_size": 0.5},
+    },
+    "promotion.csv": {
+        "not_null": ["item_code", "supermarket_code", "week"],
+        "ranges": {"week": (1, None)},
+    },
+    "sales.csv": {
+        "not_null": ["item_code", "supermarket_code", "week", "basket", "customer_id", "quantity",
+                     "transaction_amount"],
+        "ranges": {"quantity": (1, None), "week": (1, None), "day": (1, None), "time": (0, 2359),
+                   "voucher": (0, 1)},  # Returns have a negative amount, so it has no range
+        "references": {"item_code": ("item.csv", "code"), "supermarket_code": ("supermarkets.csv", "supermarket_No")},
+    },
+    "supermarkets.csv": {
+        "not_null": ["supermarket_code"],
+        "unique": ["supermarket_code"],
+    },
+}
+
+def get_quarantine_dir():
+    """Retrieve the quarantine directory from config.json, by default 'quarantine' next to 'processed_to'."""
+    config = load_config()
+    processed_to = os.path.normpath(config.get("processed_to", "data/clean"))
+    return os.path.normpath(config.get("quarantine_dir") or os.path.join(os.path.dirname(processed_to), "quarantine"))
+
+def get_quarantine_path(file_name, part_index=None):
+    """Quarantine CSV of a raw file, or of one part of it when it is cleaned in row ranges."""
+    path = os.path.join(get_quarantine_dir(), f"{os.path.splitext(file_name)[0]}_quarantine.csv")
+    return path if part_index is None else f"{path}.part{part_index}"
+
+def load_reference_keys(file_name, column, folder):
+    """
+    Sorted distinct values of a key column of a raw file, or None if the file is not available.
+
+    Cleaners only rename key columns, so the raw keys are the cleaned keys.
+    """
+    try:
+        with open_csv_source(file_name, folder) as source:
+            chunk_size = load_config().get("chunk_size") or 1000000
+            keys = [chunk[column].dropna().unique() for chunk in read_csv_chunks(source, file_name, chunk_size,
+                                                                                  columns=[column])]
+    except FileNotFoundError:
+        return None
+    return np.unique(np.concatenate(keys)) if keys else np.empty(0)
+
+def isin_sorted(values, sorted_keys):
+    """Whether each value is in a sorted array, by binary search."""
+    if not len(sorted_keys):
+        return np.zeros(len(values), dtype=bool)
+    position = np.minimum(np.searchsorted(sorted_keys, values), len(sorted_keys) - 1)
+    return sorted_keys[position] == values
+
+class FileValidator:
+    """
+    Applies the VALIDATION_RULES of one file to its cleaned rows, chunk by chunk.
+
+    Each check is one vectorized comparison over the chunk. Rows that fail a
+    check are taken out of the chunk and appended to the file's quarantine CSV,
+    with the names of the checks they failed in a 'failed_checks' column. Values
+    of unique columns are remembered across chunks, and counts are kept so the
+    file can be summarized by summarize_validation once every chunk is checked.
+    """
+
+    def __init__(self, file_name, folder, part_index=None, append=False):
+        """
+        Args:
+            file_name (str): Raw file name, a key of VALIDATION_RULES.
+            folder (str): Directory of the raw files, to read referenced keys from.
+            part_index (int, optional): Part number when the file is cleaned in row ranges.
+            append (bool): Add to the quarantine CSV of the file instead of starting a new one,
+                           for rows appended to an already cleaned file.
+        """
+        self.file_name = file_name
+        self.rules = VALIDATION_RULES.get(file_name, {})
+        self.schema = PROCESSED_SCHEMAS.get(file_name, {}).get("dtype", {})
+        self.quarantine_path = get_quarantine_path(file_name, part_index)
+        if os.path.exists(self.quarantine_path) and not append:
+            os.remove(self.quarantine_path)  # Rows of the previous run
+
+        self.reference_keys, skipped = {}, []
+        for col, (ref_file, ref_col) in self.rules.get("references", {}).items():
+            keys = load_reference_keys(ref_file, ref_col, folder)
+            if keys is None:
+                skipped.append(f"reference:{col}")
+            else:
+                self.reference_keys[col] = keys
+        self.seen = {col: np.empty(0) for col in self.rules.get("unique", [])}
+        self.stats = {"rows_checked": 0, "rows_quarantined": 0, "failures": {}, "null_counts": {},
+                      "skipped_checks": skipped, "quarantine_path": None, "seconds": 0.0}
+
+    def failed_rows(self, df):
+        """{check name: boolean mask of the rows failing it} for the checks some row fails."""
+        masks = {}
+        for col in self.rules.get("not_null", []):
+            masks[f"not_null:{col}"] = df[col].isna().to_numpy() if col in df else np.ones(len(df), dtype=bool)
+        for col, (low, high) in self.rules.get("ranges", {}).items():
+            if col in df:
+                values = df[col].to_numpy(dtype=np.float64, na_value=np.nan)
+                with np.errstate(invalid="ignore"):
+                    bad = (values < low) if low is not None else np.zeros(len(df), dtype=bool)
+                    if high is not None:
+                        bad |= values > high
+                masks[f"range:{col}"] = bad
+        for col, keys in self.reference_keys.items():
+            values = df[col]
+            masks[f"reference:{col}"] = values.notna().to_numpy() & ~isin_sorted(values.to_numpy(), keys)
+        for col in self.seen:
+            values = df[col]
+            masks[f"unique:{col}"] = (values.duplicated().to_numpy() |
+                                      isin_sorted(values.to_numpy(), self.seen[col])) & values.notna().to_numpy()
+        return {name: mask for name, mask in masks.items() if mask.any()}
+
+    def check(self, df):
+        """
+        Validate a chunk of cleaned rows, quarantining the rows that fail.
+
+        Args:
+            df (pd.DataFrame): Cleaned rows.
+
+        Returns:
+            pd.DataFrame: The rows that passed every check.
+        """
+        start = time.perf_counter()
+        with track_stage("validate", file=self.file_name) as metrics:
+            stats = self.stats
+            stats["rows_checked"] += len(df)
+            for col in self.rules.get("max_null_rates", {}):
+                count = int(df[col].isna().sum()) if col in df else len(df)
+                stats["null_counts"][col] = stats["null_counts"].get(col, 0) + count
+
+            masks = self.failed_rows(df)
+            failed = np.logical_or.reduce(list(masks.values())) if masks else np.zeros(len(df), dtype=bool)
+            for col in self.seen:
+                values = df[col][~failed & df[col].notna().to_numpy()].to_numpy()
+                self.seen[col] = np.union1d(self.seen[col], values)
+
+            if failed.any():
+                quarantined = df[failed].copy()
+                reasons = pd.Series("", index=quarantined.index)
+                for name, mask in masks.items():
+                    stats["failures"][name] = stats["failures"].get(name, 0) + int(mask.sum())
+                    reasons[mask[failed]] += name + ";"
+                quarantined["failed_checks"] = reasons.str.rstrip(";")
+                os.makedirs(os.path.dirname(self.quarantine_path), exist_ok=True)
+                write_header = not os.path.exists(self.quarantine_path)
+                quarantined.to_csv(self.quarantine_path, mode="a", header=write_header, index=False)
+                stats["rows_quarantined"] += len(quarantined)
+                stats["quarantine_path"] = self.quarantine_path
+                df = df[~failed]
+                for col in self.rules.get("not_null", []):
+                    # Parsed as float only because of the missing values just quarantined: restore
+                    # the schema dtype so the chunk matches the chunks that had none
+                    dtype = self.schema.get(col)
+                    if (f"not_null:{col}" in masks and dtype and is_integer_dtype(dtype)
+                            and pd.api.types.is_float_dtype(df[col]) and (df[col] % 1 == 0).all()):
+                        df = df.assign(**{col: narrow_integers(df[col].astype(np.int64), dtype)})
+            metrics["rows_in"], metrics["rows_out"] = stats["rows_checked"], len(df)
+        stats["seconds"] += time.perf_counter() - start
+        return df
+
+def merge_quarantine_parts(stats_list, file_name):
+    """
+    Combine the quarantine parts of a file cleaned in row ranges into its quarantine CSV.
+
+    Args:
+        stats_list (list): FileValidator.stats of every part, in row order.
+        file_name (str): Raw file name.
+
+    Returns:
+        dict: Stats of the whole file.
+    """
+    quarantine_path = get_quarantine_path(file_name)
+    if os.path.exists(quarantine_path):
+        os.remove(quarantine_path)
+    merged = {"rows_checked": 0, "rows_quarantined": 0, "failures": {}, "null_counts": {}, "skipped_checks": [],
+              "quarantine_path": None, "seconds": 0.0}
+    for stats in stats_list:
+        for key in ["rows_checked", "rows_quarantined", "seconds"]:
+            merged[key] += stats[key]
+        for key in ["failures", "null_counts"]:
+            for name, count in stats[key].items():
+                merged[key][name] = merged[key].get(name, 0) + count
+        merged["skipped_checks"] = sorted(set(merged["skipped_checks"]) | set(stats["skipped_checks"]))
+        if stats["quarantine_path"]:
+            part = pd.read_csv(stats["quarantine_path"])
+            part.to_csv(quarantine_path, mode="a", header=not os.path.exists(quarantine_path), index=False)
+            os.remove(stats["quarantine_path"])
+            merged["quarantine_path"] = quarantine_path
+    return merged
+
+def summarize_validation(file_name, stats):
+    """
+    Evaluate the file-level thresholds on the stats of a validated file.
+
+    A file fails when the share of missing values in a column exceeds its
+    max_null_rates entry, or when more than 'validation_max_quarantine_rate' (from
+    config.json) of its rows were quarantined.
+
+    Args:
+        file_name (str): Raw file name.
+        stats (dict): FileValidator.stats of the whole file.
+
+    Returns:
+        dict: status ("passed" or "failed"), breaches, row and failure counts, null
+              rates, skipped checks, the quarantine path and the validation time.
+    """
+    max_quarantine_rate = load_config().get("validation_max_quarantine_rate", 0.01)
+    rows = stats["rows_checked"]
+    null_rates = {col: count / rows if rows else 0.0 for col, count in stats["null_counts"].items()}
+    quarantine_rate = stats["rows_quarantined"] / rows if rows else 0.0
+
+    breaches = [f"{col} null rate {rate:.1%} > {VALIDATION_RULES[file_name]['max_null_rates'][col]:.1%}"
+                for col, rate in null_rates.items() if rate > VALIDATION_RULES[file_name]["max_null_rates"][col]]
+    if quarantine_rate > max_quarantine_rate:
+        breaches.append(f"{quarantine_rate:.1%} of rows quarantined > {max_quarantine_rate:.1%}")
+
+    return {"status": "failed" if breaches else "passed", "breaches": breaches, "rows_checked": rows,
+            "rows_quarantined": stats["rows_quarantined"], "quarantine_rate": quarantine_rate,
+            "failures": stats["failures"], "null_rates": null_rates, "skipped_checks": stats["skipped_checks"],
+            "quarantine_path": stats["quarantine_path"], "seconds": stats["seconds"]}
+
+def save_validation_summary(summaries):
+    """
+    Record the validation summaries of the files just cleaned and print them.
+
+    Entries of files not cleaned this time (e.g. reused from the cache) are kept.
+
+    Args:
+        summaries (dict): Summary per raw file name, from summarize_validation.
+
+    Returns:
+        str: Path of the summary file, 'validation_summary.json' in 'quarantine_dir'.
+    """
+    os.makedirs(get_quarantine_dir(), exist_ok=True)
+    summary_path = os.path.join(get_quarantine_dir(), "validation_summary.json")
+    recorded = {}
+    if os.path.exists(summary_path):
+        with open(summary_path, "r") as f:
+            recorded = json.load(f)
+    recorded.update(summaries)
+    with open(f"{summary_path}.tmp", "w") as f:
+        json.dump(recorded, f, indent=2)
+    os.replace(f"{summary_path}.tmp", summary_path)
+
+    print("\nData validation summary:")
+    for file_name, summary in summaries.items():
+        failures = ", ".join(f"{name}={count}" for name, count in sorted(summary["failures"].items()))
+        print(f"  {file_name}: {summary['status']}, {summary['rows_quarantined']} of {summary['rows_checked']} rows "
+              f"quarantined" + (f" ({failures})" if failures else ""))
+        for breach in summary["breaches"]:
+            print(f"    {breach}")
+    print(f"Validation summary saved to: {summary_path}")
+    return summary_path
@@ -0,0 +1,141 @@
+import numpy as np
+import pandas as pd
+
+# Join keys of each dimension table, in join order
+ITEM_KEYS = ["item_code"]
+PROMOTION_KEYS = ["item_code", "supermarket_code", "week"]
+SUPERMARKET_KEYS = ["supermarket_code"]
+
+def encode_keys(values, key_index):
+    """
+    Map key values to dense integer positions in key_index.
+
+    Args:
+        values (pd.Series): Key values to look up.
+        key_index (pd.Index): Distinct key values of a dimension table.
+
+    Returns:
+        np.ndarray: Position of each value in key_index, or -1 if it is not there.
+    """
+    return key_index.get_indexer(values)
+
+def build_composite_index(df, keys):
+    """
+    Index a table on several key columns by packing their dense codes into one int64 key.
+
+    Args:
+        df (pd.DataFrame): Dimension table.
+        keys (list): Key columns.
+
+    Returns:
+        dict: Per-key pd.Index of distinct values and a pd.Index of the packed key of
+              every row of df. None if the keys are not unique.
+    """
+    key_indexes = [pd.Index(df[key].unique()) for key in keys]
+    packed_index = pd.Index(pack_keys([encode_keys(df[key], key_index)
+                                       for key, key_index in zip(keys, key_indexes)], key_indexes))
+    if not packed_index.is_unique:
+        return None
+    return {"key_indexes": key_indexes, "packed_index": packed_index}
+
+def pack_keys(codes, key_indexes):
+    """Combine per-key dense codes into one int64 key; a row with any -1 code gets -1."""
+    if len(codes) == 1:
+        return codes[0].astype(np.int64)
+    packed = np.zeros(len(codes[0]), dtype=np.int64)
+    missing = np.zeros(len(codes[0]), dtype=bool)
+    for key_codes, key_index in zip(codes, key_indexes):
+        packed = packed * len(key_index) + key_codes
+        missing |= key_codes == -1
+    packed[missing] = -1
+    return packed
+
+def lookup_rows(df, composite_index, keys):
+    """
+    Find the dimension row matching each row of df on a composite index.
+
+    Returns:
+        np.ndarray: Dimension row position for every row of df, or -1 if there is no match.
+    """
+    key_indexes = composite_index["key_indexes"]
+    packed = pack_keys([encode_keys(df[key], key_index) for key, key_index in zip(keys, key_indexes)], key_indexes)
+    return composite_index["packed_index"].get_indexer(packed)  # -1 (unknown key value) is never in the index
+
+def column_values(series):
+    """Underlying values of a column: its ExtensionArray for extension dtypes, a numpy array otherwise."""
+    if pd.api.types.is_extension_array_dtype(series.dtype):
+        return series.array
+    return series.to_numpy()
+
+def build_dimension_index(item_df, promotion_df, supermarkets_df, customer_df=None):
+    """
+    Index the dimension tables once so sales rows (or chunks of them) can be joined by array gathers.
+
+    Args:
+        item_df (pd.DataFrame): Processed items, keyed by item_code.
+        promotion_df (pd.DataFrame): Processed promotions, keyed by (item_code, supermarket_code, week).
+        supermarkets_df (pd.DataFrame): Processed supermarkets, keyed by supermarket_code.
+        customer_df (pd.DataFrame, optional): Customer table sorted by customer_id (see
+                                              customer_features); not joined by join_dimensions.
+
+    Returns:
+        dict: For each dimension, its table, join keys and composite index (None when the
+              keys are not unique, in which case the join falls back to DataFrame.merge),
+              plus the customer table under "customers".
+    """
+    dimensions = []
+    for df, keys in [(item_df, ITEM_KEYS), (promotion_df, PROMOTION_KEYS), (supermarkets_df, SUPERMARKET_KEYS)]:
+        dimensions.append({"df": df.reset_index(drop=True), "keys": keys, "index": build_composite_index(df, keys)})
+    return {"dimensions": dimensions, "customers": customer_df}
+
+def join_dimensions(sales_df, dimension_index, drop_columns=()):
+    """
+    Left-join sales rows to every dimension, like chained DataFrame.merge(how="left") calls.
+
+    Row order, column order, '_x'/'_y' suffixes on overlapping columns (e.g. province_x and
+    province_y) and dtypes (integer columns become float when a row has no match) follow
+    pandas merge. Each dimension column is gathered straight into the output, so no
+    intermediate widened copies of the sales table are made. Columns listed in
+    drop_columns are never gathered.
+
+    Args:
+        sales_df (pd.DataFrame): Sales rows.
+        dimension_index (dict): Result of build_dimension_index.
+        drop_columns (iterable): Output columns to leave out.
+
+    Returns:
+        pd.DataFrame: Joined rows with a fresh RangeIndex.
+    """
+    dimensions = dimension_index["dimensions"]
+    if any(dimension["index"] is None for dimension in dimensions):
+        # Duplicate dimension keys multiply rows; let pandas handle that case
+        print("Dimension keys are not unique; joining with DataFrame.merge.")
+        merged_df = sales_df
+        for dimension in dimensions:
+            merged_df = merged_df.merge(dimension["df"], on=dimension["keys"], how="left")
+        return merged_df.drop(columns=list(drop_columns), errors="ignore")
+
+    sales_df = sales_df.reset_index(drop=True)
+
+    # Output columns as (name, source frame, source column, matched rows), renamed like merge does
+    columns = [(col, sales_df, col, None) for col in sales_df.columns]
+    for dimension in dimensions:
+        rows = lookup_rows(sales_df, dimension["index"], dimension["keys"])
+        right_columns = [col for col in dimension["df"].columns if col not in dimension["keys"]]
+        overlap = set(name for name, _, _, _ in columns) & set(right_columns)
+        columns = [(f"{name}_x" if name in overlap else name, df, col, matched)
+                   for name, df, col, matched in columns]
+        columns += [(f"{col}_y" if col in overlap else col, dimension["df"], col, rows)
+                    for col in right_columns]
+
+    drop_columns = set(drop_columns)
+    data = {}
+    for name, df, col, matched in columns:
+        if name in drop_columns:
+            continue
+        values = column_values(df[col])
+        if matched is None:
+            data[name] = values
+        else:
+            data[name] = pd.api.extensions.take(values, matched, allow_fill=bool((matched == -1).any()))
+    return pd.DataFrame(data, index=pd.RangeIndex(len(sales_df)))
@@ -1,53 +1,320 @@
 import os
+import json
+import shutil
+import hashlib
 import zipfile
-import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from config_loader import load_config
+from metrics import track_stage
 
-def download_zip(url: str, save_path: str):
-    """Download ZIP file from a given URL and save it locally."""
+# Bytes read from the network or the archive per write, instead of 8 KB
+DOWNLOAD_BUFFER_SIZE = 1024 * 1024
+COPY_BUFFER_SIZE = 1024 * 1024
+
+def create_session(pool_size):
+    """Create a requests session whose connection pool fits pool_size concurrent downloads, with retries."""
+    # requests is imported on first download so runs that never hit the network start faster
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    session = requests.Session()
+    retries = Retry(total=3, backoff_factor=0.5, status_forcelist=[500, 502, 503, 504])
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retries)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def probe_download(session, url):
+    """
+    Ask the server about the file without downloading it.
+
+    Returns:
+        tuple: (size in bytes or None, ETag or None, whether byte range requests are supported)
+    """
+    response = session.head(url, allow_redirects=True)
+    if not response.ok:  # Some servers refuse HEAD; download in one stream instead
+        return None, None, False
+    size = int(response.headers.get("Content-Length", 0)) or None
+    accepts_ranges = response.headers.get("Accept-Ranges", "").lower() == "bytes"
+    return size, response.headers.get("ETag"), accepts_ranges
+
+def load_download_state(state_path, url, size, etag):
+    """Return the parts already downloaded by an interrupted run, if it was downloading the same file."""
+    if not os.path.exists(state_path):
+        return set()
     try:
-        response = requests.get(url, stream=True)
+        with open(state_path, "r") as f:
+            state = json.load(f)
+    except json.JSONDecodeError:
+        return set()
+    if (state.get("url"), state.get("size"), state.get("etag")) != (url, size, etag):
+        return set()
+    return set(state.get("done", []))
+
+def save_download_state(state_path, url, size, etag, done):
+    """Record the downloaded parts so an interrupted download can resume."""
+    with open(state_path, "w") as f:
+        json.dump({"url": url, "size": size, "etag": etag, "done": sorted(done)}, f)
+
+def download_range(session, url, part_path, start, end, etag=None):
+    """
+    Download bytes start..end (inclusive) of url into the same offsets of part_path.
+
+    Raises:
+        requests.RequestException: If the server does not return exactly the requested range.
+    """
+    import requests
+
+    headers = {"Range": f"bytes={start}-{end}"}
+    if etag:
+        headers["If-Range"] = etag  # The server sends the whole (changed) file instead of a range if the ETag differs
+
+    with session.get(url, headers=headers, stream=True) as response:
         response.raise_for_status()
-        
-        with open(save_path, 'wb') as file:
-            for chunk in response.iter_content(chunk_size=8192):
+        if response.status_code != 206:
+            raise requests.RequestException(f"Server did not honour range request bytes={start}-{end}")
+
+        written = 0
+        with open(part_path, "r+b") as file:
+            file.seek(start)
+            for chunk in response.iter_content(chunk_size=DOWNLOAD_BUFFER_SIZE):
                 file.write(chunk)
+                written += len(chunk)
+
+    if written != end - start + 1:
+        raise requests.RequestException(f"Incomplete range bytes={start}-{end}: received {written} bytes")
+
+def download_zip(url: str, save_path: str, max_workers=None, part_size=None):
+    """
+    Download ZIP file from a given URL and save it locally.
+
+    When the server supports byte ranges, the file is split into parts of part_size
+    bytes that are fetched in parallel over a pooled session. Progress is kept in
+    '<save_path>.part' and '<save_path>.part.json', so an interrupted download
+    resumes with the parts it is missing. Otherwise the file is streamed over one
+    connection.
+
+    Args:
+        url (str): URL of the ZIP file.
+        save_path (str): Where to save the file.
+        max_workers (int, optional): Parallel connections. Defaults to 'download_workers' in config.json.
+        part_size (int, optional): Bytes per range request. Defaults to 'download_part_size' in config.json.
+    """
+    import requests
+
+    config = load_config()
+    max_workers = max_workers or config.get("download_workers") or 4
+    part_size = part_size or config.get("download_part_size") or 64 * 1024 * 1024
+
+    part_path = f"{save_path}.part"
+    state_path = f"{part_path}.json"
+    try:
+        with track_stage("download") as metrics, create_session(max_workers) as session:
+            size, etag, accepts_ranges = probe_download(session, url)
+
+            if size and accepts_ranges:
+                parts = [(start, min(start + part_size, size) - 1) for start in range(0, size, part_size)]
+                done = load_download_state(state_path, url, size, etag)
+                if not done or not os.path.exists(part_path):
+                    done = set()
+                    with open(part_path, "wb") as file:
+                        file.truncate(size)  # Preallocate so every part can be written at its offset
+                if done:
+                    print(f"Resuming download: {len(done)} of {len(parts)} parts already downloaded")
+
+                with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                    futures = {executor.submit(download_range, session, url, part_path, start, end, etag): index
+                               for index, (start, end) in enumerate(parts) if index not in done}
+                    try:
+                        for future in as_completed(futures):
+                            future.result()
+                            done.add(futures[future])
+                            save_download_state(state_path, url, size, etag, done)
+                    except BaseException:
+                        for future in futures:
+                            future.cancel()  # Stop queued parts; the next run resumes from the saved state
+                        raise
+            else:
+                with session.get(url, stream=True) as response:
+                    response.raise_for_status()
+                    with open(part_path, "wb") as file:
+                        for chunk in response.iter_content(chunk_size=DOWNLOAD_BUFFER_SIZE):
+                            file.write(chunk)
+            metrics["bytes_written"] = os.path.getsize(part_path)
+
+        os.replace(part_path, save_path)
+        if os.path.exists(state_path):
+            os.remove(state_path)
         print(f"Downloaded ZIP file to {save_path}")
     except requests.RequestException as e:
         print(f"Failed to download file: {e}")
         exit(1)
 
+def extract_member(zip_path, member, target_path):
+    """Copy one archive member to target_path through a bounded buffer."""
+    # Each member gets its own handle so members can be decompressed in parallel
+    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+        with zip_ref.open(member) as source, open(target_path, "wb") as target:
+            shutil.copyfileobj(source, target, COPY_BUFFER_SIZE)
+    return target_path
+
+def get_member_paths(members):
+    """
+    Pair every file in the archive with its path relative to the extraction folder.
+
+    The folder all members share is dropped, so files are extracted directly.
+
+    Args:
+        members (list): Member names from ZipFile.namelist().
+
+    Returns:
+        list: (member, relative path) tuples, in archive order.
+    """
+    # Find the longest common path prefix, cut back to whole folder names
+    # (e.g. "data/sales.csv" and "data/supermarkets.csv" share "data/", not "data/s").
+    common_prefix = os.path.commonprefix(members)
+    common_prefix = common_prefix[:common_prefix.rfind("/") + 1]
+
+    member_paths = []
+    for member in members:
+        if member.endswith("/"):  # Skip directories
+            continue
+
+        # Remove the common prefix so that files are extracted directly
+        member_path = member[len(common_prefix):]
+        member_paths.append((member, member_path))
+    return member_paths
+
 # Extract the ZIP file while skipping intermediary folders
-def extract_zip(zip_path: str, extracted_to: str):
+def extract_zip(zip_path: str, extracted_to: str, max_workers=None):
+    """
+    Extract every file of the archive into extracted_to, dropping the folder they share.
+
+    Members are streamed to disk through a bounded buffer, several at a time.
+
+    Args:
+        zip_path (str): Path of the ZIP file.
+        extracted_to (str): Directory to extract into.
+        max_workers (int, optional): Members extracted in parallel.
+                                     Defaults to 'extract_workers' in config.json, else the CPU count.
+
+    Returns:
+        list: Paths of the extracted files, in archive order.
+    """
     extracted_to = os.path.normpath(extracted_to)  # Normalize the extraction path for OS compatibility
     os.makedirs(extracted_to, exist_ok=True)  # Ensure 'raw/' exists
 
     with zipfile.ZipFile(zip_path, 'r') as zip_ref: # Open the ZIP file in read mode.
-        # Use zip_ref.namelist()  to retrieve the list of files and folders inside the ZIP.
-        # Find the longest common path prefix.
-        # Remove any trailing slashes or backslashes, ensuring correct path handling.
-        common_prefix = os.path.commonprefix(zip_ref.namelist()).strip("/").strip("\\")
-        
-        extracted_files = []  # List to track extracted files
-        for member in zip_ref.namelist():
-            if member.endswith("/"):  # Skip directories
-                continue
-
-            # Remove the common prefix so that files are extracted directly
-            member_path = member[len(common_prefix) + 1:] if member.startswith(common_prefix) else member
-            # Construct the new target file path in the extracted_to directory.
-            target_path = os.path.join(extracted_to, member_path)
-            os.makedirs(os.path.dirname(target_path), exist_ok=True)
-
-            # Read the file content from the ZIP archive and write it to the target location.
-            with zip_ref.open(member) as source, open(target_path, "wb") as target:
-                target.write(source.read())
-            
-            extracted_files.append(target_path)  # Add to the list
+        members = zip_ref.namelist()
+
+    targets = []  # (member, target path) of every file to extract
+    for member, member_path in get_member_paths(members):
+        # Construct the new target file path in the extracted_to directory.
+        target_path = os.path.join(extracted_to, member_path)
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        targets.append((member, target_path))
+
+    max_workers = max_workers or load_config().get("extract_workers") or os.cpu_count()
+    with track_stage("extract") as metrics:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(targets)))) as executor:
+            extracted_files = list(executor.map(lambda target: extract_member(zip_path, *target), targets))
+        metrics["bytes_read"] = os.path.getsize(zip_path)
+        metrics["bytes_written"] = sum(os.path.getsize(path) for path in extracted_files)
 
     print(f"Extracted files to: {extracted_to}")
     return extracted_files  # Return extracted file names
 
+def hash_zip(zip_path):
+    """SHA-256 of the archive content."""
+    digest = hashlib.sha256()
+    with open(zip_path, "rb") as f:
+        for block in iter(lambda: f.read(COPY_BUFFER_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def is_cached_zip_intact(zip_path, meta):
+    """Check the cached archive against the checksum recorded when it was downloaded."""
+    if not os.path.exists(zip_path) or not meta:
+        return False
+    stat = os.stat(zip_path)
+    if stat.st_size != meta.get("size"):
+        return False
+    if stat.st_mtime_ns == meta.get("mtime_ns"):
+        return True  # Untouched since it was hashed
+    return hash_zip(zip_path) == meta.get("sha256")
+
+def ensure_zip():
+    """
+    Make sure the archive from 'zip_url' is cached at 'zip_path', downloading it only if needed.
+
+    The cached archive is kept with a '<zip_path>.meta.json' record of its URL,
+    ETag, size and SHA-256. It is reused when it still matches its checksum and the
+    server reports the same ETag (or cannot be reached), so files can be read from
+    it again without another download.
+
+    Returns:
+        str: Path of the cached archive.
+    """
+    import requests
+
+    config = load_config()
+    zip_url = config.get("zip_url")
+    zip_path = config.get("zip_path")
+    if not zip_url or not zip_path:
+        print("Missing required configuration keys: 'zip_url' and 'zip_path'")
+        exit(1)
+
+    meta_path = f"{zip_path}.meta.json"
+    meta = None
+    if os.path.exists(meta_path):
+        with open(meta_path, "r") as f:
+            meta = json.load(f)
+    intact = is_cached_zip_intact(zip_path, meta) and meta.get("url") == zip_url
+
+    try:
+        with create_session(1) as session:
+            _, etag, _ = probe_download(session, zip_url)
+    except requests.RequestException as e:
+        if intact:
+            print(f"Could not check {zip_url} ({e}); using cached ZIP file {zip_path}")
+            return zip_path
+        raise
+
+    if intact and (etag is None or etag == meta.get("etag")):
+        print(f"Using cached ZIP file: {zip_path}")
+        return zip_path
+
+    download_zip(zip_url, zip_path)
+    stat = os.stat(zip_path)
+    with open(meta_path, "w") as f:
+        json.dump({"url": zip_url, "etag": etag, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+                   "sha256": hash_zip(zip_path)}, f, indent=2)
+    return zip_path
+
+def open_zip_member(zip_path, file_name):
+    """
+    Open a file of the archive for streaming reads, without extracting it.
+
+    Args:
+        zip_path (str): Path of the ZIP file.
+        file_name (str): Path of the file relative to the extraction folder, e.g. "sales.csv".
+
+    Returns:
+        zipfile.ZipExtFile: Binary file object; closing it releases the archive.
+
+    Raises:
+        FileNotFoundError: If the archive has no such file.
+    """
+    zip_ref = zipfile.ZipFile(zip_path, 'r')
+    try:
+        for member, member_path in get_member_paths(zip_ref.namelist()):
+            if os.path.normpath(member_path) == os.path.normpath(file_name):
+                return zip_ref.open(member)  # Keeps the archive open until the member is closed
+    finally:
+        zip_ref.close()
+    raise FileNotFoundError(f"File not found in {zip_path}: {file_name}")
+
 def extract_files():
     """
     Main function to extract files as part of the pipeline.
@@ -66,7 +333,7 @@ def extract_files():
     # Download and extract files
     download_zip(zip_url, zip_path)
     extracted_files = extract_zip(zip_path, extracted_to)
-    
+
     if extracted_files:  # Delete only if extraction was successful
         os.remove(zip_path)
         print(f"Deleted ZIP file: {zip_path}")
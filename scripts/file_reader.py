@@ -1,6 +1,90 @@
+import io
 import os
+from contextlib import contextmanager
 import pandas as pd
 from config_loader import load_config
+from file_extractor import open_zip_member
+from data_schema import get_schema, get_parse_dtypes, apply_schema
+from metrics import track_stage, track_chunks
+
+@contextmanager
+def open_csv_source(file_name, directory):
+    """
+    Yield what pd.read_csv should read for a file: its path, or a stream from the cached archive.
+
+    When the file is not on disk and 'extract_mode' in config.json is "zip", the
+    matching member of the archive at 'zip_path' is streamed instead, so the
+    file never has to be extracted.
+
+    Args:
+        file_name (str): Name of the CSV file, relative to directory.
+        directory (str): Directory the file would have been extracted to.
+
+    Raises:
+        FileNotFoundError: If the file is neither on disk nor in the cached archive.
+    """
+    file_path = os.path.join(directory, file_name)
+    if os.path.exists(file_path):
+        yield file_path
+        return
+
+    config = load_config()
+    zip_path = config.get("zip_path")
+    if config.get("extract_mode", "extract") != "zip" or not zip_path or not os.path.exists(zip_path):
+        raise FileNotFoundError(f"File not found: {file_path}")
+
+    with open_zip_member(zip_path, file_name) as source:
+        print(f"{file_path} is not extracted; reading it from ZIP file: {zip_path}")
+        yield source
+
+def get_source_size(source):
+    """Size in bytes of a source from open_csv_source, or None for a stream from the archive."""
+    return os.path.getsize(source) if isinstance(source, str) else None
+
+def get_read_csv_args(schema, columns=None):
+    """
+    pd.read_csv arguments that apply a schema while parsing.
+
+    Args:
+        schema (dict): Schema from data_schema.get_schema, or None.
+        columns (list, optional): Columns requested by the caller; otherwise the schema's 'usecols'.
+
+    Returns:
+        dict: 'dtype' and 'usecols' arguments.
+    """
+    if not schema:
+        return {"usecols": columns}
+    usecols = columns
+    if usecols is None and "usecols" in schema:
+        known_columns = set(schema["usecols"])
+        usecols = lambda column: column in known_columns  # Tolerates files that lack a column
+    return {"dtype": get_parse_dtypes(schema), "usecols": usecols}
+
+def read_csv_chunks(source, file_name, chunk_size, columns=None):
+    """
+    Parse a CSV source chunk by chunk, with the schema of file_name applied to every chunk.
+
+    Integer columns are parsed as int64 and narrowed one chunk at a time, so only
+    a single wide chunk is ever held in memory.
+
+    Args:
+        source: Path or binary file object to read.
+        file_name (str): Name of the file, used to find its schema.
+        chunk_size (int): Number of rows per chunk.
+        columns (list, optional): Columns to load.
+
+    Yields:
+        pd.DataFrame: The next typed chunk.
+    """
+    schema = get_schema(file_name)
+    with pd.read_csv(source, chunksize=chunk_size, **get_read_csv_args(schema, columns)) as reader:
+        for chunk in reader:
+            yield apply_schema(chunk, schema)
+
+def concat_chunks(chunks, file_name):
+    """Concatenate typed chunks into one DataFrame, re-applying the schema to unify categoricals."""
+    df = pd.concat(list(chunks), ignore_index=True)  # Chunks with different categories concatenate as object
+    return apply_schema(df, get_schema(file_name))
 
 def load_csv_to_df(file_name, folder_path=None):
     """
@@ -27,10 +111,236 @@ def load_csv_to_df(file_name, folder_path=None):
     # Construct the full file path
     file_path = os.path.join(directory, file_name)
 
-    # Check if the file exists
-    if os.path.exists(file_path):
+    # Read the file, or its member of the cached archive if it was never extracted,
+    # in chunks so the compact dtypes of its schema are applied as it is parsed
+    with open_csv_source(file_name, directory) as source, track_stage("read", file=file_name) as metrics:
         print(f"Loading file: {file_path}")
-        return pd.read_csv(file_path)
-    else:
+        df = concat_chunks(read_csv_chunks(source, file_name, config.get("chunk_size", 1000000)), file_name)
+        metrics["rows_out"], metrics["bytes_read"] = len(df), get_source_size(source)
+        return df
+
+def iter_csv_chunks(file_name, folder_path=None, chunk_size=None):
+    """
+    Stream a CSV file as a sequence of DataFrames with at most `chunk_size` rows each.
+
+    Args:
+        file_name (str): Name of the CSV file to read.
+        folder_path (str, optional): Custom directory path to read from.
+                                     Defaults to 'extracted_to' in config.json.
+        chunk_size (int, optional): Number of rows per chunk.
+                                    Defaults to 'chunk_size' in config.json.
+
+    Yields:
+        pd.DataFrame: The next chunk of rows from the CSV file.
+
+    Raises:
+        FileNotFoundError: If the file does not exist.
+    """
+    # Load configuration
+    config = load_config()
+    directory = folder_path if folder_path else config.get("extracted_to", "data/raw")
+    chunk_size = chunk_size if chunk_size else config.get("chunk_size", 1000000)
+
+    # Construct the full file path
+    file_path = os.path.join(directory, file_name)
+
+    with open_csv_source(file_name, directory) as source:
+        print(f"Streaming file: {file_path} ({chunk_size} rows per chunk)")
+        yield from track_chunks("read", read_csv_chunks(source, file_name, chunk_size),
+                                bytes_read=get_source_size(source), file=file_name)
+
+# Comparison operators accepted in read filters, mirroring pyarrow's filter syntax
+FILTER_OPERATORS = {
+    "==": lambda col, value: col == value,
+    "!=": lambda col, value: col != value,
+    "<": lambda col, value: col < value,
+    "<=": lambda col, value: col <= value,
+    ">": lambda col, value: col > value,
+    ">=": lambda col, value: col >= value,
+    "in": lambda col, value: col.isin(value),
+    "not in": lambda col, value: ~col.isin(value),
+}
+
+def apply_filters(df, filters):
+    """
+    Keep only the rows of a DataFrame that match every filter.
+
+    Args:
+        df (pd.DataFrame): DataFrame to filter.
+        filters (list): (column, operator, value) tuples, e.g. [("week", ">=", 50)].
+
+    Returns:
+        pd.DataFrame: The matching rows.
+    """
+    if not filters:
+        return df
+
+    mask = pd.Series(True, index=df.index)
+    for column, operator, value in filters:
+        if operator not in FILTER_OPERATORS:
+            raise ValueError(f"Unsupported filter operator: {operator}")
+        mask &= FILTER_OPERATORS[operator](df[column], value)
+    return df[mask]
+
+def load_df(file_name, folder_path=None, columns=None, filters=None):
+    """
+    Load a CSV or Parquet file, reading only the requested columns and rows.
+
+    The format is picked from the file extension. Parquet files push the column
+    selection and filters down to the reader; CSV files are streamed in chunks
+    and filtered as they are read, so rows that do not match are never held in
+    memory all at once.
+
+    Args:
+        file_name (str): Name of the file to read ('.csv' or '.parquet').
+        folder_path (str, optional): Custom directory path to read from.
+                                     Defaults to 'extracted_to' in config.json.
+        columns (list, optional): Columns to load. Defaults to all columns.
+        filters (list, optional): (column, operator, value) tuples, e.g. [("week", ">=", 50)].
+
+    Returns:
+        pd.DataFrame: The loaded file as a pandas DataFrame.
+
+    Raises:
+        FileNotFoundError: If the file does not exist.
+    """
+    config = load_config()
+    directory = folder_path if folder_path else config.get("extracted_to", "data/raw")
+    file_path = os.path.join(directory, file_name)
+
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"File not found: {file_path}")
+
+    print(f"Loading file: {file_path}")
+    with track_stage("read", file=file_name) as metrics:
+        metrics["bytes_read"] = os.path.getsize(file_path)
+        if file_path.endswith(".parquet"):
+            df = pd.read_parquet(file_path, columns=columns, filters=filters or None)
+            df = apply_schema(df, get_schema(file_name))
+        else:
+            # Filter columns must be parsed even if the caller does not want them back
+            filter_columns = [column for column, _, _ in filters or []]
+            usecols = None if columns is None else list(dict.fromkeys(list(columns) + filter_columns))
+            chunk_size = config.get("chunk_size", 1000000)
+            chunks = read_csv_chunks(file_path, file_name, chunk_size, usecols)
+            df = concat_chunks((apply_filters(chunk, filters) for chunk in chunks), file_name)
+            df = df[columns] if columns is not None else df
+        metrics["rows_out"] = len(df)
+        return df
+
+def split_csv_ranges(file_name, folder_path=None, n_parts=2):
+    """
+    Split a CSV file into byte ranges that start and end on line boundaries.
+
+    The ranges cover every data row (the header is excluded) and can be parsed
+    independently with load_csv_range. Quoted fields containing newlines are not
+    supported, which holds for the row-wise retail extracts.
+
+    Args:
+        file_name (str): Name of the CSV file to split.
+        folder_path (str, optional): Custom directory path to read from.
+                                     Defaults to 'extracted_to' in config.json.
+        n_parts (int): Maximum number of ranges to return.
+
+    Returns:
+        list: (start, end) byte offsets, in file order.
+
+    Raises:
+        FileNotFoundError: If the file does not exist.
+    """
+    config = load_config()
+    directory = folder_path if folder_path else config.get("extracted_to", "data/raw")
+    file_path = os.path.join(directory, file_name)
+
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"File not found: {file_path}")
+
+    file_size = os.path.getsize(file_path)
+    with open(file_path, "rb") as f:
+        f.readline()  # Skip the header
+        data_start = f.tell()
+        bounds = [data_start]
+        for i in range(1, n_parts):
+            f.seek(data_start + (file_size - data_start) * i // n_parts)
+            f.readline()  # Move to the start of the next line
+            position = f.tell()
+            if position >= file_size:
+                break
+            if position > bounds[-1]:
+                bounds.append(position)
+        bounds.append(file_size)
+
+    return [(start, end) for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+
+def load_csv_range(file_name, folder_path=None, start=0, end=None):
+    """
+    Load the rows of a CSV file that lie between two byte offsets from split_csv_ranges.
+
+    Args:
+        file_name (str): Name of the CSV file to read.
+        folder_path (str, optional): Custom directory path to read from.
+                                     Defaults to 'extracted_to' in config.json.
+        start (int): Byte offset of the first row to read.
+        end (int, optional): Byte offset just past the last row. Defaults to end of file.
+
+    Returns:
+        pd.DataFrame: The rows in the range, with the file's header as column names.
+    """
+    config = load_config()
+    directory = folder_path if folder_path else config.get("extracted_to", "data/raw")
+    file_path = os.path.join(directory, file_name)
+
+    with track_stage("read", file=file_name) as metrics:
+        with open(file_path, "rb") as f:
+            header = f.readline()
+            f.seek(start)
+            data = f.read() if end is None else f.read(end - start)
+
+        schema = get_schema(file_name)
+        df = apply_schema(pd.read_csv(io.BytesIO(header + data), **get_read_csv_args(schema)), schema)
+        metrics["rows_out"], metrics["bytes_read"] = len(df), len(data)
+        return df
+
+def iter_df_chunks(file_name, folder_path=None, chunk_size=None, columns=None, filters=None):
+    """
+    Stream a CSV or Parquet file as DataFrames of at most `chunk_size` rows, filtering each chunk.
+
+    Args:
+        file_name (str): Name of the file to read ('.csv' or '.parquet').
+        folder_path (str, optional): Custom directory path to read from.
+                                     Defaults to 'extracted_to' in config.json.
+        chunk_size (int, optional): Number of rows per chunk.
+                                    Defaults to 'chunk_size' in config.json.
+        columns (list, optional): Columns to load. Defaults to all columns.
+        filters (list, optional): (column, operator, value) tuples, e.g. [("week", ">=", 50)].
+
+    Yields:
+        pd.DataFrame: The next chunk of matching rows.
+
+    Raises:
+        FileNotFoundError: If the file does not exist.
+    """
+    config = load_config()
+    directory = folder_path if folder_path else config.get("extracted_to", "data/raw")
+    chunk_size = chunk_size if chunk_size else config.get("chunk_size", 1000000)
+    file_path = os.path.join(directory, file_name)
+
+    if not os.path.exists(file_path):
         raise FileNotFoundError(f"File not found: {file_path}")
-    
\ No newline at end of file
+
+    # Filter columns must be parsed even if the caller does not want them back
+    filter_columns = [column for column, _, _ in filters or []]
+    read_columns = None if columns is None else list(dict.fromkeys(list(columns) + filter_columns))
+
+    print(f"Streaming file: {file_path} ({chunk_size} rows per chunk)")
+    if file_path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        schema = get_schema(file_name)
+        chunks = (apply_schema(batch.to_pandas(), schema) for batch in
+                  pq.ParquetFile(file_path).iter_batches(batch_size=chunk_size, columns=read_columns))
+    else:
+        chunks = read_csv_chunks(file_path, file_name, chunk_size, read_columns)
+
+    for chunk in track_chunks("read", chunks, bytes_read=os.path.getsize(file_path), file=file_name):
+        chunk = apply_filters(chunk, filters)
+        yield chunk[columns] if columns is not None else chunk
@@ -1,36 +1,255 @@
 import os
+import shutil
 import pandas as pd
-from config_loader import load_config  # Import config loader
+from config_loader import load_config, get_storage_format, get_processed_file_name  # Import config loader
+from data_schema import PROCESSED_SCHEMAS
 
-def write_df_to_csv(df, file_name):
+def get_output_path(file_name, storage_format=None):
     """
-    Save a cleaned DataFrame as a CSV file in the clean directory from config.json,
+    Build the output path for a cleaned file in the clean directory from config.json,
     appending a suffix defined in the configuration.
 
     Args:
-        df (pd.DataFrame): The cleaned DataFrame to save.
         file_name (str): Name of the original CSV file.
+        storage_format (str, optional): 'csv' or 'parquet'. Defaults to 'storage_format' in config.json.
 
     Returns:
-        str: Full path of the saved file.
+        str: Full path the cleaned file should be written to.
     """
     # Load configuration
     config = load_config()
     processed_to = config.get("processed_to", "data/clean")  # Default directory
-    suffix = config.get("file_suffix", "_clean")  # Get suffix from config, default to "_clean"
 
     # Ensure the clean directory exists
     os.makedirs(processed_to, exist_ok=True)
 
-    # Split the file name and append the suffix
-    base_name, ext = os.path.splitext(file_name)
-    new_file_name = f"{base_name}{suffix}{ext}"  # Append suffix before extension
-
     # Define full file path
-    file_path = os.path.join(processed_to, new_file_name)
+    return os.path.join(processed_to, get_processed_file_name(file_name, storage_format))
+
+def write_df_to_csv(df, file_name):
+    """
+    Save a cleaned DataFrame as a CSV file in the clean directory from config.json,
+    appending a suffix defined in the configuration.
+
+    Args:
+        df (pd.DataFrame): The cleaned DataFrame to save.
+        file_name (str): Name of the original CSV file.
+
+    Returns:
+        str: Full path of the saved file.
+    """
+    file_path = get_output_path(file_name, "csv")
 
     # Save DataFrame to CSV
     df.to_csv(file_path, index=False)
     print(f"Cleaned data saved to: {file_path}")
 
     return file_path  # Return the saved file path for logging or further processing
+
+def write_df_to_parquet(df, file_name):
+    """
+    Save a cleaned DataFrame as a compressed Parquet file in the clean directory from config.json.
+
+    Args:
+        df (pd.DataFrame): The cleaned DataFrame to save.
+        file_name (str): Name of the original CSV file.
+
+    Returns:
+        str: Full path of the saved file.
+    """
+    config = load_config()
+    compression = config.get("parquet_compression", "snappy")
+    file_path = get_output_path(file_name, "parquet")
+
+    # Save DataFrame to Parquet (requires pyarrow)
+    df.to_parquet(file_path, index=False, compression=compression)
+    print(f"Cleaned data saved to: {file_path}")
+
+    return file_path
+
+def empty_processed_df(file_name):
+    """Zero-row DataFrame with the processed columns and dtypes of a file, written when no chunk has rows."""
+    schema = PROCESSED_SCHEMAS.get(file_name, {"dtype": {}})
+    return pd.DataFrame({col: pd.Series(dtype=dtype) for col, dtype in schema["dtype"].items()})
+
+def write_chunks_to_csv(chunks, file_name):
+    """
+    Save an iterable of cleaned DataFrame chunks into a single CSV file.
+
+    The header is written with the first chunk and every following chunk is
+    appended, so only one chunk is held in memory at a time. Without any chunk,
+    only the header of the processed schema is written.
+
+    Args:
+        chunks (Iterable[pd.DataFrame]): Cleaned chunks, in output order.
+        file_name (str): Name of the original CSV file.
+
+    Returns:
+        str: Full path of the saved file.
+    """
+    file_path = get_output_path(file_name, "csv")
+
+    rows_written = 0
+    with open(file_path, "w", newline="") as target:
+        for i, chunk in enumerate(chunks):
+            chunk.to_csv(target, index=False, header=(i == 0))
+            rows_written += len(chunk)
+        if target.tell() == 0:  # No chunk at all
+            empty_processed_df(file_name).to_csv(target, index=False)
+
+    print(f"Cleaned data saved to: {file_path} ({rows_written} rows)")
+
+    return file_path
+
+def write_chunks_to_parquet(chunks, file_name):
+    """
+    Save an iterable of cleaned DataFrame chunks into a single Parquet file.
+
+    Each chunk becomes one row group. The schema is taken from the first chunk
+    and later chunks are cast to it. Without any chunk, an empty table with the
+    processed schema of the file is written, so readers still find the file.
+
+    Args:
+        chunks (Iterable[pd.DataFrame]): Cleaned chunks, in output order.
+        file_name (str): Name of the original CSV file.
+
+    Returns:
+        str: Full path of the saved file.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    config = load_config()
+    compression = config.get("parquet_compression", "snappy")
+    file_path = get_output_path(file_name, "parquet")
+
+    writer = None
+    rows_written = 0
+    try:
+        for chunk in chunks:
+            if writer is None:
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                writer = pq.ParquetWriter(file_path, table.schema, compression=compression)
+            else:
+                table = pa.Table.from_pandas(chunk, schema=writer.schema, preserve_index=False)
+            writer.write_table(table)
+            rows_written += len(chunk)
+        if writer is None:
+            table = pa.Table.from_pandas(empty_processed_df(file_name), preserve_index=False)
+            writer = pq.ParquetWriter(file_path, table.schema, compression=compression)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    print(f"Cleaned data saved to: {file_path} ({rows_written} rows)")
+
+    return file_path
+
+def write_part_file(df, file_name, part_index):
+    """
+    Save one cleaned part of a file that is processed in parallel row ranges.
+
+    Parts use the 'storage_format' from config.json and are combined in order by
+    merge_part_files. Only the first CSV part carries the header.
+
+    Args:
+        df (pd.DataFrame): The cleaned rows of this part.
+        file_name (str): Name of the original CSV file.
+        part_index (int): Position of the part in the file.
+
+    Returns:
+        str: Full path of the saved part.
+    """
+    storage_format = get_storage_format()
+    part_path = f"{get_output_path(file_name, storage_format)}.part{part_index}"
+
+    if storage_format == "parquet":
+        compression = load_config().get("parquet_compression", "snappy")
+        df.to_parquet(part_path, index=False, compression=compression)
+    else:
+        df.to_csv(part_path, index=False, header=(part_index == 0))
+
+    return part_path
+
+def merge_part_files(part_paths, file_name):
+    """
+    Combine part files written by write_part_file into the final cleaned file and delete the parts.
+
+    Args:
+        part_paths (list): Part file paths, in row order.
+        file_name (str): Name of the original CSV file.
+
+    Returns:
+        str: Full path of the saved file.
+    """
+    storage_format = get_storage_format()
+
+    if storage_format == "parquet":
+        import pyarrow.parquet as pq
+        file_path = write_chunks_to_parquet((pq.read_table(path).to_pandas() for path in part_paths), file_name)
+    else:
+        file_path = get_output_path(file_name, "csv")
+        with open(file_path, "wb") as target:
+            for path in part_paths:
+                with open(path, "rb") as source:
+                    shutil.copyfileobj(source, target, 1024 * 1024)
+        print(f"Cleaned data saved to: {file_path}")
+
+    for path in part_paths:
+        os.remove(path)
+
+    return file_path
+
+# Writers for each supported storage format
+DF_WRITERS = {"csv": write_df_to_csv, "parquet": write_df_to_parquet}
+CHUNK_WRITERS = {"csv": write_chunks_to_csv, "parquet": write_chunks_to_parquet}
+
+def write_df(df, file_name):
+    """Save a cleaned DataFrame using the 'storage_format' from config.json."""
+    return DF_WRITERS[get_storage_format()](df, file_name)
+
+def write_chunks(chunks, file_name):
+    """Save cleaned DataFrame chunks using the 'storage_format' from config.json."""
+    return CHUNK_WRITERS[get_storage_format()](chunks, file_name)
+
+def append_df(df, file_name):
+    """
+    Append rows to a cleaned file in the 'storage_format' from config.json, creating it if needed.
+
+    CSV rows are appended in the file's column order. Parquet files cannot be
+    appended to, so their row groups are copied into a new file followed by the
+    new rows, without decoding the existing data into pandas.
+
+    Args:
+        df (pd.DataFrame): Cleaned rows with the file's columns.
+        file_name (str): Name of the original CSV file.
+
+    Returns:
+        str: Full path of the updated file.
+    """
+    storage_format = get_storage_format()
+    file_path = get_output_path(file_name, storage_format)
+    if not os.path.exists(file_path):
+        return write_df(df, file_name)
+
+    if storage_format == "parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        compression = load_config().get("parquet_compression", "snappy")
+        source = pq.ParquetFile(file_path)
+        schema = source.schema_arrow
+        tmp_path = f"{file_path}.tmp"
+        with pq.ParquetWriter(tmp_path, schema, compression=compression) as writer:
+            for i in range(source.num_row_groups):
+                writer.write_table(source.read_row_group(i))
+            writer.write_table(pa.Table.from_pandas(df[schema.names], schema=schema, preserve_index=False))
+        source.close()
+        os.replace(tmp_path, file_path)
+    else:
+        columns = pd.read_csv(file_path, nrows=0).columns
+        df[list(columns)].to_csv(file_path, mode="a", header=False, index=False)
+
+    print(f"Appended {len(df)} rows to: {file_path}")
+    return file_path
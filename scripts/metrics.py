@@ -0,0 +1,302 @@
+import os
+import json
+import time
+import cProfile
+import tracemalloc
+from datetime import datetime, timezone
+from contextlib import contextmanager
+from config_loader import load_config
+
+# Stage records of this process, in the order the stages finished
+STAGE_METRICS = []
+
+# Records of the stages in progress, outermost first
+_open_stages = []
+
+# cProfile profilers per stage (and labels), accumulated over every run of the stage
+_profilers = {}
+
+# Numeric fields of a stage record, exported as Prometheus gauges
+METRIC_FIELDS = {
+    "wall_seconds": "Wall-clock time spent in the stage.",
+    "cpu_seconds": "CPU time of the process spent in the stage.",
+    "peak_rss_bytes": "Peak resident set size of the process during the stage.",
+    "rows_in": "Rows the stage consumed.",
+    "rows_out": "Rows the stage produced.",
+    "bytes_read": "Bytes the stage read from disk or the network.",
+    "bytes_written": "Bytes the stage wrote.",
+    "traced_peak_bytes": "Peak Python memory allocated during the stage (tracemalloc).",
+}
+
+def read_peak_rss():
+    """
+    Peak resident set size of this process in bytes.
+
+    On Linux this is VmHWM, which reset_peak_rss restarts; elsewhere it is the
+    peak since the process started. Returns None if it cannot be read.
+    """
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import psutil
+        memory_info = psutil.Process().memory_info()
+        return getattr(memory_info, "peak_wset", memory_info.rss)  # peak_wset is the Windows peak
+    except ImportError:
+        return None
+
+def reset_peak_rss():
+    """Restart the peak RSS measurement (Linux only)."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+def fold_peak_rss(peak):
+    """Raise the peak RSS of every enclosing stage to at least peak."""
+    if peak is None:
+        return
+    for record in _open_stages:
+        record["peak_rss_bytes"] = max(record["peak_rss_bytes"] or 0, peak)
+
+def new_record(stage, labels):
+    """Empty record of a stage run."""
+    return {"stage": stage, "labels": {key: str(value) for key, value in labels.items()},
+            "wall_seconds": 0.0, "cpu_seconds": 0.0, "peak_rss_bytes": None,
+            "rows_in": None, "rows_out": None, "bytes_read": None, "bytes_written": None}
+
+def get_profile_key(stage, labels):
+    """Name of the profile output of a stage, e.g. 'clean-sales.csv'."""
+    return "-".join([stage] + [str(value) for value in labels.values()])
+
+def start_profiling(record, config):
+    """Start the opt-in cProfile/tracemalloc hooks if 'profile_stages' in config.json names this stage."""
+    stages = config.get("profile_stages") or []
+    if record["stage"] not in stages and "all" not in stages:
+        return None
+
+    hooks = {"key": get_profile_key(record["stage"], record["labels"])}
+    if not any(open_record.get("_profiling") for open_record in _open_stages[:-1]):
+        # Only one cProfile profiler can be active at a time; nested stages show up in the outer profile
+        profiler = _profilers.setdefault(hooks["key"], cProfile.Profile())
+        profiler.enable()
+        hooks["profiler"] = profiler
+        record["_profiling"] = True
+    if config.get("profile_memory", False):
+        hooks["started_tracemalloc"] = not tracemalloc.is_tracing()
+        if hooks["started_tracemalloc"]:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+    return hooks
+
+def stop_profiling(record, hooks, config):
+    """Stop the hooks started by start_profiling and write the tracemalloc report."""
+    if hooks is None:
+        return
+    if "profiler" in hooks:
+        hooks["profiler"].disable()
+        del record["_profiling"]
+    if "started_tracemalloc" in hooks:
+        record["traced_peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        top_stats = tracemalloc.take_snapshot().statistics("lineno")[:25]
+        profile_dir = get_profile_dir(config)
+        with open(os.path.join(profile_dir, f"{hooks['key']}.tracemalloc.txt"), "w") as f:
+            f.write(f"Peak traced memory: {record['traced_peak_bytes']} bytes\n")
+            f.writelines(f"{stat}\n" for stat in top_stats)
+        if hooks["started_tracemalloc"]:
+            tracemalloc.stop()
+
+def get_profile_dir(config=None):
+    """Directory for profile outputs ('profile_dir' in config.json), created if needed."""
+    config = config or load_config()
+    profile_dir = os.path.normpath(config.get("profile_dir", "data/profiles"))
+    os.makedirs(profile_dir, exist_ok=True)
+    return profile_dir
+
+@contextmanager
+def track_stage(stage, **labels):
+    """
+    Measure one run of a pipeline stage.
+
+    Wall time, CPU time and peak RSS are filled in when the block exits; the
+    block sets rows_in, rows_out, bytes_read and bytes_written on the yielded
+    record where they apply. The record is kept in STAGE_METRICS when
+    'metrics_enabled' is true in config.json (the default).
+
+    Args:
+        stage (str): Stage name, e.g. "read", "clean", "merge", "fit".
+        **labels: Values that tell runs of the stage apart, e.g. file="sales.csv".
+
+    Yields:
+        dict: The stage record.
+    """
+    config = load_config()
+    record = new_record(stage, labels)
+
+    # Credit the peak so far to the enclosing stages, then measure this stage's own peak
+    fold_peak_rss(read_peak_rss())
+    reset_peak_rss()
+    _open_stages.append(record)
+    hooks = start_profiling(record, config)
+
+    start_wall, start_cpu = time.perf_counter(), time.process_time()
+    try:
+        yield record
+    except BaseException as e:
+        record["error"] = type(e).__name__
+        raise
+    finally:
+        record["wall_seconds"] = time.perf_counter() - start_wall
+        record["cpu_seconds"] = time.process_time() - start_cpu
+        stop_profiling(record, hooks, config)
+        fold_peak_rss(read_peak_rss())
+        _open_stages.pop()
+        fold_peak_rss(record["peak_rss_bytes"])
+        if config.get("metrics_enabled", True):
+            STAGE_METRICS.append(record)
+
+def track_chunks(stage, chunks, bytes_read=None, **labels):
+    """
+    Measure a stage that produces an iterator of DataFrame chunks, such as a streaming read.
+
+    Only the time spent producing chunks is counted, not the time the consumer
+    spends on them; rows_out counts the rows yielded. The peak RSS is the peak
+    since the enclosing stage started.
+
+    Args:
+        stage (str): Stage name.
+        chunks (Iterable[pd.DataFrame]): Chunks to pass through.
+        bytes_read (int, optional): Size of the input.
+        **labels: Values that tell runs of the stage apart.
+
+    Yields:
+        pd.DataFrame: The chunks, unchanged.
+    """
+    record = new_record(stage, labels)
+    record["rows_out"], record["bytes_read"] = 0, bytes_read
+    iterator = iter(chunks)
+    try:
+        while True:
+            start_wall, start_cpu = time.perf_counter(), time.process_time()
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                break
+            finally:
+                record["wall_seconds"] += time.perf_counter() - start_wall
+                record["cpu_seconds"] += time.process_time() - start_cpu
+            record["rows_out"] += len(chunk)
+            yield chunk
+    finally:
+        record["peak_rss_bytes"] = read_peak_rss()
+        if load_config().get("metrics_enabled", True):
+            STAGE_METRICS.append(record)
+
+def call_with_metrics(func, *args):
+    """
+    Call func and return its result with the stage records it produced.
+
+    Used to bring the metrics of work done in a worker process back to the parent.
+
+    Returns:
+        tuple: (result, list of stage records)
+    """
+    start = len(STAGE_METRICS)
+    result = func(*args)
+    return result, STAGE_METRICS[start:]
+
+def summarize_metrics(records=None):
+    """
+    Aggregate stage records by stage and labels.
+
+    Times, rows and bytes are summed over runs, peaks are maximized.
+
+    Returns:
+        list: One dict per (stage, labels) with a 'runs' count.
+    """
+    summary = {}
+    for record in STAGE_METRICS if records is None else records:
+        key = (record["stage"], tuple(sorted(record["labels"].items())))
+        entry = summary.setdefault(key, {"stage": record["stage"], "labels": dict(record["labels"]), "runs": 0})
+        entry["runs"] += 1
+        for field in METRIC_FIELDS:
+            value = record.get(field)
+            if value is None:
+                continue
+            if field.startswith("peak") or field == "traced_peak_bytes":
+                entry[field] = max(entry.get(field, 0), value)
+            else:
+                entry[field] = entry.get(field, 0) + value
+    return list(summary.values())
+
+def format_label_value(value):
+    """Escape a label value for the Prometheus text format."""
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def format_prometheus(summary):
+    """
+    Render a metrics summary in the Prometheus text exposition format.
+
+    Every field becomes a gauge named pipeline_stage_<field>, with the stage and
+    its labels as Prometheus labels, plus pipeline_stage_runs.
+
+    Args:
+        summary (list): Result of summarize_metrics.
+
+    Returns:
+        str: The exposition text.
+    """
+    fields = dict(METRIC_FIELDS, runs="Number of runs of the stage.")
+    lines = []
+    for field, description in fields.items():
+        samples = [entry for entry in summary if entry.get(field) is not None]
+        if not samples:
+            continue
+        name = f"pipeline_stage_{field}"
+        lines += [f"# HELP {name} {description}", f"# TYPE {name} gauge"]
+        for entry in samples:
+            labels = {"stage": entry["stage"], **entry["labels"]}
+            label_text = ",".join(f'{key}="{format_label_value(value)}"' for key, value in labels.items())
+            lines.append(f"{name}{{{label_text}}} {float(entry[field])!r}")
+    return "\n".join(lines) + "\n"
+
+def export_metrics(metrics_dir=None):
+    """
+    Write the stage metrics to 'metrics_dir' from config.json as JSON and Prometheus text.
+
+    metrics.json holds every stage record and the per-stage summary; metrics.prom
+    holds the summary as gauges (e.g. pipeline_stage_wall_seconds{stage="clean",file="sales.csv"}).
+    cProfile statistics of profiled stages are written to 'profile_dir' as <stage>.prof.
+
+    Args:
+        metrics_dir (str, optional): Output directory. Defaults to 'metrics_dir' in config.json.
+
+    Returns:
+        tuple: (JSON path, Prometheus path)
+    """
+    config = load_config()
+    metrics_dir = os.path.normpath(metrics_dir or config.get("metrics_dir", "data/metrics"))
+    os.makedirs(metrics_dir, exist_ok=True)
+    summary = summarize_metrics()
+
+    json_path = os.path.join(metrics_dir, "metrics.json")
+    with open(json_path, "w") as f:
+        json.dump({"generated_at": datetime.now(timezone.utc).isoformat(), "pid": os.getpid(),
+                   "stages": STAGE_METRICS, "summary": summary}, f, indent=2)
+
+    prom_path = os.path.join(metrics_dir, "metrics.prom")
+    with open(prom_path, "w") as f:
+        f.write(format_prometheus(summary))
+
+    if _profilers:
+        profile_dir = get_profile_dir(config)
+        for key, profiler in _profilers.items():
+            profiler.dump_stats(os.path.join(profile_dir, f"{key}.prof"))
+
+    print(f"Stage metrics written to: {json_path}, {prom_path}")
+    return json_path, prom_path
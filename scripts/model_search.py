@@ -0,0 +1,327 @@
+import os
+import json
+import time
+import shutil
+import tempfile
+import multiprocessing
+import numpy as np
+from sklearn.preprocessing import MinMaxScaler, StandardScaler
+from sklearn.pipeline import make_pipeline
+from sklearn.linear_model import LinearRegression, Ridge, Lasso
+from sklearn.ensemble import HistGradientBoostingRegressor
+from sklearn.metrics import mean_absolute_error
+
+from config_loader import load_config, get_processed_file_name
+from file_reader import load_df
+from dimension_index import build_dimension_index
+from metrics import track_stage, call_with_metrics, STAGE_METRICS
+from sales_predictor import (load_dimension_tables, merge_sales_data, add_time_features, build_category_index,
+                             NUMERICAL_COLS, PROVINCE_Y_MISSING_THRESHOLD)
+from sparse_features import fit_label_encoders, encode_columns
+
+# Candidate models by name: (family, parameters); families are built by make_model
+SEARCH_CANDIDATES = {
+    "linear": ("linear", {}),
+    "ridge_1": ("ridge", {"alpha": 1.0}),
+    "ridge_100": ("ridge", {"alpha": 100.0}),
+    "lasso_0.01": ("lasso", {"alpha": 0.01}),
+    "gbm_100": ("gradient_boosting", {"max_iter": 100, "learning_rate": 0.1}),
+    "gbm_300": ("gradient_boosting", {"max_iter": 300, "learning_rate": 0.05, "max_leaf_nodes": 63}),
+    "segment_item_type": ("segment_linear", {"segment": "item_type"}),
+    "segment_province": ("segment_linear", {"segment": "province_x"}),
+}
+
+# Candidate kept when the search does not finish within 'search_time_budget' (the default trainer's model)
+BASELINE_CANDIDATE = "linear"
+
+class ArrayModel:
+    """
+    Estimator fitted on plain float arrays.
+
+    predict accepts the feature frame of predict_sales as well as the array of the
+    scoring server, without feature-name warnings from scikit-learn.
+    """
+
+    def __init__(self, estimator):
+        self.estimator = estimator
+
+    def fit(self, X, y):
+        self.estimator.fit(np.asarray(X, dtype=np.float64), y)
+        return self
+
+    def predict(self, X):
+        return self.estimator.predict(np.asarray(X, dtype=np.float64))
+
+class SegmentedLinearModel:
+    """
+    One LinearRegression per value of a segment column (e.g. the item_type code).
+
+    Segments with fewer than min_rows training rows, and values not seen in
+    training, are predicted by a LinearRegression fitted on every row.
+    """
+
+    def __init__(self, segment_index, min_rows=100):
+        self.segment_index = segment_index
+        self.min_rows = min_rows
+
+    def fit(self, X, y):
+        X, y = np.asarray(X, dtype=np.float64), np.asarray(y)
+        self.global_model = LinearRegression().fit(X, y)
+        segments = X[:, self.segment_index]
+        values, counts = np.unique(segments, return_counts=True)
+        self.models = {value: LinearRegression().fit(X[segments == value], y[segments == value])
+                       for value in values[counts >= self.min_rows]}
+        return self
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        predictions = self.global_model.predict(X)
+        segments = X[:, self.segment_index]
+        for value, model in self.models.items():
+            rows = segments == value
+            if rows.any():
+                predictions[rows] = model.predict(X[rows])
+        return predictions
+
+def make_model(family, params, feature_columns):
+    """
+    Build an unfitted candidate model.
+
+    Args:
+        family (str): 'linear', 'ridge', 'lasso', 'gradient_boosting' or 'segment_linear'.
+        params (dict): Parameters of the family, e.g. {"alpha": 1.0}.
+        feature_columns (list): Feature columns, in matrix order.
+
+    Returns:
+        object: Model with fit(X, y) and predict(X).
+
+    Raises:
+        ValueError: If the family is unknown.
+    """
+    if family == "segment_linear":
+        return SegmentedLinearModel(list(feature_columns).index(params["segment"]), params.get("min_rows", 100))
+    if family == "linear":
+        estimator = LinearRegression()
+    elif family == "ridge":
+        estimator = make_pipeline(StandardScaler(), Ridge(**params))  # Penalties need comparable feature scales
+    elif family == "lasso":
+        estimator = make_pipeline(StandardScaler(), Lasso(max_iter=5000, **params))
+    elif family == "gradient_boosting":
+        estimator = HistGradientBoostingRegressor(random_state=42, **params)
+    else:
+        raise ValueError(f"Unknown model family: {family}")
+    return ArrayModel(estimator)
+
+def load_search_data(sales_filters=None):
+    """
+    Merge, sample and encode the training rows as one float matrix sorted by week.
+
+    Rows are sampled as in preprocess_and_train_sales_model ('training_sample_size'),
+    categoricals are label-encoded, 'quantity' is min-max scaled and missing values
+    are filled with column medians.
+
+    Args:
+        sales_filters (list, optional): (column, operator, value) tuples applied while reading
+                                        the sales file, e.g. [("week", ">=", 50)].
+
+    Returns:
+        tuple: (X, y, weeks, encoder_dict, scaler, feature_columns, numerical_cols)
+    """
+    config = load_config()
+    folder = config.get("processed_to", "data/clean")
+
+    dimension_index = build_dimension_index(*load_dimension_tables(folder))
+    sales_df = load_df(get_processed_file_name("sales.csv"), folder, filters=sales_filters)
+    merged_df = add_time_features(merge_sales_data(sales_df, dimension_index))
+    if "province_y" in merged_df.columns:
+        if merged_df["province_y"].isna().sum() / len(merged_df) > PROVINCE_Y_MISSING_THRESHOLD:
+            merged_df.drop(columns=["province_y"], inplace=True)
+
+    sample_size = min(config.get("training_sample_size", 100000), len(merged_df))
+    sampled_df = merged_df.sample(n=sample_size, random_state=42).sort_values("week", kind="stable")
+    features = sampled_df.drop(columns=["transaction_amount"], errors="ignore")
+    feature_columns = list(features.columns)
+    numerical_cols = list(NUMERICAL_COLS)
+
+    with track_stage("encode") as metrics:
+        metrics["rows_in"] = metrics["rows_out"] = len(features)
+        scaler = MinMaxScaler().fit(features[numerical_cols])
+        encoder_dict = fit_label_encoders(features)
+        columns = encode_columns(features, feature_columns, encoder_dict, build_category_index(encoder_dict),
+                                 scaler, numerical_cols)
+        X = np.column_stack([columns[col] for col in feature_columns]).astype(np.float64)
+        for j in np.flatnonzero(np.isnan(X).any(axis=0)):
+            known = X[~np.isnan(X[:, j]), j]
+            X[np.isnan(X[:, j]), j] = np.median(known) if len(known) else 0.0
+
+    y = sampled_df["transaction_amount"].to_numpy(dtype=np.float64)
+    weeks = sampled_df["week"].to_numpy()
+    return X, y, weeks, encoder_dict, scaler, feature_columns, numerical_cols
+
+def week_folds(weeks, n_folds):
+    """
+    Expanding-window folds over week-sorted rows.
+
+    The distinct weeks are cut into n_folds + 1 consecutive groups; fold k trains
+    on the rows of groups 0..k and validates on the rows of group k + 1, so a
+    model is never scored on weeks before the ones it was fitted on.
+
+    Args:
+        weeks (np.ndarray): Week of every row, sorted ascending.
+        n_folds (int): Number of folds wanted.
+
+    Returns:
+        list: (train_end, valid_end) row positions per fold; fewer than n_folds
+              if there are not enough distinct weeks.
+    """
+    groups = [group for group in np.array_split(np.unique(weeks), n_folds + 1) if len(group)]
+    bounds = [int(np.searchsorted(weeks, group[-1], side="right")) for group in groups]
+    return [(bounds[k], bounds[k + 1]) for k in range(len(bounds) - 1)]
+
+# Training arrays of a search worker, memory-mapped once by open_shared_arrays
+_shared_arrays = {}
+
+def open_shared_arrays(data_dir):
+    """Pool initializer: map the saved training arrays read-only, so workers share one copy in the page cache."""
+    for name in ("X", "y"):
+        _shared_arrays[name] = np.load(os.path.join(data_dir, f"{name}.npy"), mmap_mode="r")
+
+def evaluate_candidate(name, feature_columns, fold, train_end, valid_end):
+    """
+    Fit one candidate on rows [0, train_end) and score it on rows [train_end, valid_end).
+
+    Rows are sorted by week, so both are slices of the shared arrays and no
+    per-task copy of the training matrix is made before fitting.
+
+    Returns:
+        dict: candidate, fold, validation MAE and fit seconds.
+    """
+    X, y = _shared_arrays["X"], _shared_arrays["y"]
+    family, params = SEARCH_CANDIDATES[name]
+    start = time.perf_counter()
+    with track_stage("search_fit", candidate=name) as metrics:
+        model = make_model(family, params, feature_columns).fit(X[:train_end], y[:train_end])
+        mae = mean_absolute_error(y[train_end:valid_end], model.predict(X[train_end:valid_end]))
+        metrics["rows_in"] = train_end
+    return {"candidate": name, "fold": fold, "mae": float(mae), "seconds": round(time.perf_counter() - start, 3)}
+
+def run_search(X, y, names, folds, feature_columns, max_workers, time_budget=None):
+    """
+    Evaluate every candidate on every fold on a process pool.
+
+    X and y are saved once as .npy files that each worker memory-maps, instead of
+    being pickled to every task. Fits are submitted candidate by candidate, so the
+    baseline (listed first) finishes first. When time_budget runs out, the pool is
+    terminated and the fits still running are dropped.
+
+    Args:
+        X (np.ndarray): Encoded features, rows sorted by week.
+        y (np.ndarray): Target per row.
+        names (list): Names of SEARCH_CANDIDATES to evaluate.
+        folds (list): (train_end, valid_end) per fold, from week_folds.
+        feature_columns (list): Feature columns, in matrix order.
+        max_workers (int): Pool size.
+        time_budget (float, optional): Seconds the search may take. No limit if None.
+
+    Returns:
+        tuple: (list of fold results, whether every fit finished within the budget)
+    """
+    data_dir = tempfile.mkdtemp(prefix="model_search_")
+    try:
+        np.save(os.path.join(data_dir, "X.npy"), np.ascontiguousarray(X))
+        np.save(os.path.join(data_dir, "y.npy"), np.ascontiguousarray(y))
+        deadline = None if time_budget is None else time.monotonic() + time_budget
+
+        results = []
+        with multiprocessing.Pool(max_workers, initializer=open_shared_arrays, initargs=(data_dir,)) as pool:
+            tasks = [(name, fold, pool.apply_async(call_with_metrics, (evaluate_candidate, name, feature_columns,
+                                                                       fold, train_end, valid_end)))
+                     for name in names for fold, (train_end, valid_end) in enumerate(folds)]
+            for name, fold, task in tasks:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    result, records = task.get(timeout)
+                except multiprocessing.TimeoutError:
+                    print(f"Model search stopped: the {time_budget}s budget ran out")
+                    return results, False  # Leaving the pool context terminates the workers
+                except Exception as e:
+                    print(f"Candidate {name} failed on fold {fold}: {e}")
+                    results.append({"candidate": name, "fold": fold, "error": f"{type(e).__name__}: {e}"})
+                    continue
+                STAGE_METRICS.extend(records)
+                results.append(result)
+        return results, True
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+def summarize_search(results, names, n_folds):
+    """Mean validation MAE and total fit seconds of every candidate that completed all folds, best first."""
+    summary = []
+    for name in names:
+        runs = [result for result in results if result["candidate"] == name and "error" not in result]
+        if len(runs) == n_folds:
+            summary.append({"candidate": name, "mae": float(np.mean([run["mae"] for run in runs])),
+                            "seconds": round(sum(run["seconds"] for run in runs), 3)})
+    return sorted(summary, key=lambda row: row["mae"])
+
+def search_and_train_sales_model(sales_filters=None):
+    """
+    Select a model family and settings by time-based cross-validation, then train it.
+
+    Every candidate in 'search_candidates' (all of SEARCH_CANDIDATES by default) is
+    fitted on 'search_folds' expanding-window folds over the week column, in parallel
+    on 'max_workers' processes. The candidate with the lowest mean validation MAE is
+    retrained on all sampled rows. A more expensive candidate is only trusted if the
+    whole search finishes within 'search_time_budget' seconds; otherwise the
+    baseline linear model is trained. The scores are written to 'search_report_path'.
+
+    Args:
+        sales_filters (list, optional): (column, operator, value) tuples applied while reading
+                                        the sales file, e.g. [("week", ">=", 50)].
+
+    Returns:
+        tuple: (model, encoder_dict, scaler, feature_columns, numerical_cols)
+
+    Raises:
+        ValueError: If a candidate name is unknown or the rows span too few weeks for a fold.
+    """
+    config = load_config()
+    names = list(config.get("search_candidates") or SEARCH_CANDIDATES)
+    unknown = [name for name in names if name not in SEARCH_CANDIDATES]
+    if unknown:
+        raise ValueError(f"Unknown search candidates: {unknown}. Choose from {list(SEARCH_CANDIDATES)}")
+    if BASELINE_CANDIDATE in names:
+        names.remove(BASELINE_CANDIDATE)
+    names.insert(0, BASELINE_CANDIDATE)
+    time_budget = config.get("search_time_budget")
+    max_workers = config.get("max_workers") or os.cpu_count()
+
+    X, y, weeks, encoder_dict, scaler, feature_columns, numerical_cols = load_search_data(sales_filters)
+    folds = week_folds(weeks, config.get("search_folds", 3))
+    if not folds:
+        raise ValueError("Model search needs sales rows from at least 2 distinct weeks")
+
+    print(f"\nSearching {len(names)} candidates on {len(folds)} week folds with {max_workers} workers...")
+    start = time.perf_counter()
+    results, finished = run_search(X, y, names, folds, feature_columns, max_workers, time_budget)
+    summary = summarize_search(results, names, len(folds))
+    selected = summary[0]["candidate"] if finished and summary else BASELINE_CANDIDATE
+
+    for row in summary:
+        print(f"  {row['candidate']:<20} MAE {row['mae']:.4f}  ({row['seconds']:.1f}s)")
+    print(f"Selected model: {selected}")
+
+    report_path = config.get("search_report_path", "models/model_search.json")
+    os.makedirs(os.path.dirname(os.path.abspath(report_path)), exist_ok=True)
+    with open(report_path, "w") as f:
+        json.dump({"selected": selected, "finished": finished, "time_budget": time_budget,
+                   "seconds": round(time.perf_counter() - start, 3), "folds": folds,
+                   "candidates": summary, "fold_results": results}, f, indent=2)
+
+    family, params = SEARCH_CANDIDATES[selected]
+    with track_stage("fit") as metrics:
+        model = make_model(family, params, feature_columns).fit(X, y)
+        metrics["rows_in"] = len(X)
+    print("Training complete.")
+
+    return model, encoder_dict, scaler, feature_columns, numerical_cols
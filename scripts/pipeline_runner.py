@@ -1,56 +1,456 @@
 import os
+import sys
+import json
+import argparse
 import pandas as pd
-from file_reader import load_csv_to_df
-from file_writer import write_df_to_csv
-from data_processor import CLEANING_FUNCTIONS
-from config_loader import get_files_to_process  # Import the function
-from file_extractor import extract_files  # Import file extractor
-from sales_predictor import preprocess_and_train_sales_model, predict_sales
+from concurrent.futures import ProcessPoolExecutor
+from file_reader import load_csv_to_df, iter_csv_chunks, split_csv_ranges, load_csv_range
+from file_writer import write_df, write_chunks, write_part_file, merge_part_files, get_output_path
+from data_processor import CLEANING_FUNCTIONS, CHUNKABLE_FILES, CLEANING_FUNCTION_VERSIONS
+from config_loader import load_config, get_files_to_process, get_processed_file_name  # Import the function
+from file_extractor import extract_files, ensure_zip  # Import file extractor
+from stage_cache import load_manifest, save_manifest, make_stage_key, fetch_artifact, store_artifact, STAGE_CONFIG_KEYS
+from data_validation import (FileValidator, merge_quarantine_parts, summarize_validation, save_validation_summary,
+                             VALIDATION_RULES, VALIDATION_VERSION)
+from metrics import track_stage, call_with_metrics, export_metrics, STAGE_METRICS
 
+# Stages of a full run, in the order they depend on each other
+PIPELINE_STAGES = ["extract", "clean", "aggregate", "forecast", "promotions", "customers", "train", "predict"]
+
+# Config keys whose change makes a stage completed by an interrupted run stale
+CHECKPOINT_CONFIG_KEYS = {
+    "extract": ["zip_url", "extract_mode", "extracted_to"],
+    "clean": STAGE_CONFIG_KEYS["clean"] + ["extracted_to", "processed_to"],
+    "aggregate": ["file_suffix", "storage_format", "processed_to", "cube_dir"],
+    "forecast": ["file_suffix", "storage_format", "processed_to", "cube_dir", "forecast_path", "forecast_horizon",
+                 "forecast_method", "forecast_alphas"],
+    "promotions": ["file_suffix", "storage_format", "processed_to", "cube_dir", "promotion_dir",
+                   "promo_baseline_weeks"],
+    "customers": ["file_suffix", "storage_format", "processed_to", "customer_features_path"],
+    "train": STAGE_CONFIG_KEYS["train"] + ["processed_to", "training_chunk_size", "model_path",
+                                           "customer_features_path"],
+}
 
 def process_file(file_name, folder):
-    """Read, clean, and save a specific file based on its type."""
+    """
+    Read, clean, validate and save a specific file based on its type.
+
+    When 'validation_enabled' is set in config.json, rows failing the file's
+    checks are quarantined instead of saved, and the outcome carries the file's
+    validation summary; a file that breaches a validation threshold fails.
+
+    Returns:
+        dict: Outcome for the file, e.g. {"status": "success", "path": ...},
+              {"status": "skipped"} or {"status": "failed", "error": ...}.
+    """
     try:
         file_path = os.path.join(folder, file_name)
 
-        # If file is missing, extract files again
+        # If file is missing, extract files again (or, in "zip" mode, read it from the cached archive)
         if not os.path.exists(file_path):
-            print(f"File {file_name} is missing. Re-extracting files...")
-            extract_files()
-         
-        # Load the CSV after extraction
-        df = load_csv_to_df(file_name, folder)
+            if load_config().get("extract_mode", "extract") == "zip":
+                print(f"File {file_name} is missing. Reading it from the cached ZIP file...")
+                ensure_zip()
+            else:
+                print(f"File {file_name} is missing. Re-extracting files...")
+                extract_files()
 
         # Get appropriate cleaning function
         cleaning_function = CLEANING_FUNCTIONS.get(file_name)
         if not cleaning_function:
             print(f"No cleaning function found for {file_name}. Skipping.")
-            return
+            return {"status": "skipped"}
 
-        # Clean the data
-        cleaned_df = cleaning_function(df)
+        validator = FileValidator(file_name, folder) if load_config().get("validation_enabled", True) else None
+        with track_stage("clean", file=file_name) as metrics:
+            # Stream row-wise files in chunks so memory depends on chunk size, not file size
+            chunk_size = load_config().get("chunk_size")
+            if chunk_size and file_name in CHUNKABLE_FILES:
+                chunks = iter_csv_chunks(file_name, folder, chunk_size)
+                saved_path = write_chunks(clean_chunks(chunks, cleaning_function, metrics, validator), file_name)
+            else:
+                # Load the CSV after extraction
+                df = load_csv_to_df(file_name, folder)
 
-        # Save cleaned data
-        write_df_to_csv(cleaned_df, file_name)
+                # Clean the data, setting aside rows that fail validation
+                cleaned_df = cleaning_function(df)
+                if validator:
+                    cleaned_df = validator.check(cleaned_df)
+                metrics["rows_in"], metrics["rows_out"] = len(df), len(cleaned_df)
+
+                # Save cleaned data
+                saved_path = write_df(cleaned_df, file_name)
+            metrics["bytes_written"] = os.path.getsize(saved_path)
+        return validation_outcome(file_name, {"status": "success", "path": saved_path},
+                                  validator.stats if validator else None)
 
     except Exception as e:
         print(f"Error processing {file_name}: {e}")
+        return {"status": "failed", "error": f"{type(e).__name__}: {e}"}
+
+def clean_chunks(chunks, cleaning_function, metrics, validator=None):
+    """Clean (and validate) a stream of chunks, counting the rows in and out on the stage record metrics."""
+    metrics["rows_in"] = metrics["rows_out"] = 0
+    for chunk in chunks:
+        metrics["rows_in"] += len(chunk)
+        cleaned_chunk = cleaning_function(chunk)
+        if validator:
+            cleaned_chunk = validator.check(cleaned_chunk)
+        metrics["rows_out"] += len(cleaned_chunk)
+        yield cleaned_chunk
+
+def clean_file_range(file_name, folder, part_index, start, end):
+    """
+    Read, clean, validate and save one byte range of a row-wise file. Runs in a worker process.
+
+    Returns:
+        tuple: (part path, validation stats of the range or None if validation is off)
+    """
+    validator = None
+    if load_config().get("validation_enabled", True):
+        validator = FileValidator(file_name, folder, part_index)
+    with track_stage("clean", file=file_name) as metrics:
+        df = load_csv_range(file_name, folder, start, end)
+        cleaned_df = CLEANING_FUNCTIONS[file_name](df)
+        if validator:
+            cleaned_df = validator.check(cleaned_df)
+        part_path = write_part_file(cleaned_df, file_name, part_index)
+        metrics["rows_in"], metrics["rows_out"] = len(df), len(cleaned_df)
+        metrics["bytes_written"] = os.path.getsize(part_path)
+    return part_path, validator.stats if validator else None
+
+def validation_outcome(file_name, result, stats):
+    """
+    Add the validation summary of a cleaned file to its outcome.
+
+    A file that breached a validation threshold only gets a warning, unless
+    'validation_fail_on_breach' is set in config.json: then its outcome becomes a
+    failure so later stages do not run on bad data.
+
+    Args:
+        file_name (str): Raw file name.
+        result (dict): Outcome of cleaning the file.
+        stats (dict): Validation stats of the whole file, or None if it was not validated.
+
+    Returns:
+        dict: The outcome.
+    """
+    if stats is None:
+        return result
+    result["validation"] = summarize_validation(file_name, stats)
+    if result["validation"]["status"] == "failed":
+        breaches = "; ".join(result["validation"]["breaches"])
+        if load_config().get("validation_fail_on_breach", False):
+            result["status"] = "failed"
+            result["error"] = f"Validation failed: {breaches}"
+        else:
+            print(f"Warning: {file_name} breached validation thresholds: {breaches}")
+    return result
+
+def collect_worker_result(future):
+    """Result of a call_with_metrics task, keeping the stage metrics the worker recorded."""
+    result, records = future.result()
+    STAGE_METRICS.extend(records)
+    return result
+
+def process_files_parallel(files_to_process, folder, max_workers=None):
+    """
+    Clean several files at once on a process pool.
+
+    Files are independent, so each one is cleaned in its own worker. Row-wise
+    files larger than 'split_min_bytes' in config.json are additionally split
+    into byte ranges that are cleaned on several workers and merged in order.
+
+    Args:
+        files_to_process (list): Names of the raw CSV files to clean.
+        folder (str): Directory the raw files are read from.
+        max_workers (int, optional): Pool size. Defaults to 'max_workers' in config.json,
+                                     or the number of CPUs.
+
+    Returns:
+        dict: Outcome per file name, as returned by process_file.
+    """
+    config = load_config()
+    max_workers = max_workers or config.get("max_workers") or os.cpu_count()
+    split_min_bytes = config.get("split_min_bytes", 256 * 1024 * 1024)
+    # Duplicates in two different ranges would not be caught, so files with unique keys are validated whole
+    whole_files = set(file_name for file_name, rules in VALIDATION_RULES.items()
+                      if rules.get("unique") and config.get("validation_enabled", True))
+
+    # Extract once up front so workers never re-download the archive concurrently
+    if any(not os.path.exists(os.path.join(folder, file_name)) for file_name in files_to_process):
+        if config.get("extract_mode", "extract") == "zip":
+            print("Some files are missing. Reading them from the cached ZIP file...")
+            ensure_zip()
+        else:
+            print("Some files are missing. Re-extracting files...")
+            extract_files()
+
+    results = {}
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        file_futures, range_futures = {}, {}
+        for file_name in files_to_process:
+            file_path = os.path.join(folder, file_name)
+            if (file_name in CHUNKABLE_FILES and file_name not in whole_files and os.path.exists(file_path)
+                    and os.path.getsize(file_path) >= split_min_bytes):
+                ranges = split_csv_ranges(file_name, folder, max_workers)
+                print(f"Cleaning {file_name} in {len(ranges)} parallel row ranges...")
+                range_futures[file_name] = [
+                    executor.submit(call_with_metrics, clean_file_range, file_name, folder, i, start, end)
+                    for i, (start, end) in enumerate(ranges)
+                ]
+            else:
+                file_futures[file_name] = executor.submit(call_with_metrics, process_file, file_name, folder)
+
+        for file_name, futures in range_futures.items():
+            try:
+                parts = [collect_worker_result(future) for future in futures]
+                result = {"status": "success", "path": merge_part_files([path for path, _ in parts], file_name)}
+                stats = [part_stats for _, part_stats in parts]
+                results[file_name] = validation_outcome(file_name, result, merge_quarantine_parts(stats, file_name)
+                                                        if all(stats) else None)
+            except Exception as e:
+                print(f"Error processing {file_name}: {e}")
+                results[file_name] = {"status": "failed", "error": f"{type(e).__name__}: {e}"}
+
+        for file_name, future in file_futures.items():
+            try:
+                results[file_name] = collect_worker_result(future)
+            except Exception as e:  # The worker process itself died
+                results[file_name] = {"status": "failed", "error": f"{type(e).__name__}: {e}"}
+
+    return {file_name: results[file_name] for file_name in files_to_process}
+
+def raw_source_path(file_name, folder):
+    """Path a raw file is read from: the file itself, the cached archive in "zip" mode, or None if neither exists."""
+    file_path = os.path.join(folder, file_name)
+    if os.path.exists(file_path):
+        return file_path
+    config = load_config()
+    zip_path = config.get("zip_path")
+    if config.get("extract_mode", "extract") == "zip" and zip_path and os.path.exists(zip_path):
+        return zip_path
+    return None
+
+def clean_stage_key(file_name, folder, manifest):
+    """
+    Cache key of the cleaning stage for a raw file, or None if the raw file is missing.
+
+    Validation quarantines rows whose keys are not in other raw files (the 'references'
+    of VALIDATION_RULES), so those files are inputs of the key too.
+    """
+    input_path = raw_source_path(file_name, folder)
+    if input_path is None:
+        return None
+    version = [CLEANING_FUNCTION_VERSIONS.get(file_name), VALIDATION_VERSION]  # Validation drops rows too
+    if input_path != os.path.join(folder, file_name):
+        version = [file_name] + version  # The archive is the input; keys differ per archive member
+
+    input_paths = [input_path]
+    if load_config().get("validation_enabled", True):
+        for ref_file, _ in VALIDATION_RULES.get(file_name, {}).get("references", {}).values():
+            ref_path = raw_source_path(ref_file, folder)
+            if ref_path is None:
+                version.append(f"no {ref_file}")  # The check is skipped until the file exists
+            elif ref_path not in input_paths:
+                input_paths.append(ref_path)
+    return make_stage_key("clean", input_paths, version, manifest)
 
-def main():
-    """Main script to extract and process multiple CSV files."""
-    folder = "data/raw"
-    files_to_process = get_files_to_process() # Load from config.json
+def run_cleaning_stage(files_to_process, folder, parallel=False):
+    """
+    Clean every file, reusing cached outputs for files whose input, cleaner version and config are unchanged.
 
+    Cleaned rows are validated as they are written (see data_validation): failing rows
+    go to 'quarantine_dir' and the summary of the files cleaned is saved there.
+
+    Args:
+        files_to_process (list): Names of the raw CSV files to clean.
+        folder (str): Directory the raw files are read from.
+        parallel (bool): Clean the remaining files on a process pool.
+
+    Returns:
+        dict: Outcome per file name; cache hits have status "cached".
+    """
+    cache_enabled = load_config().get("cache_enabled", False)
+    manifest = load_manifest() if cache_enabled else None
+
+    results, pending = {}, []
     for file_name in files_to_process:
-        process_file(file_name, folder)
+        key = clean_stage_key(file_name, folder, manifest) if cache_enabled else None
+        if key and fetch_artifact(key, get_output_path(file_name), manifest):
+            results[file_name] = {"status": "cached", "path": get_output_path(file_name)}
+        else:
+            pending.append(file_name)
+
+    if parallel:
+        results.update(process_files_parallel(pending, folder))
+    else:
+        results.update({file_name: process_file(file_name, folder) for file_name in pending})
+
+    summaries = {file_name: results[file_name]["validation"] for file_name in pending
+                 if "validation" in results[file_name]}
+    if summaries:
+        save_validation_summary(summaries)
+
+    if cache_enabled:
+        for file_name in pending:
+            key = clean_stage_key(file_name, folder, manifest)  # Raw file or archive may only exist after this run
+            if key and results[file_name]["status"] == "success":
+                store_artifact(key, "clean", results[file_name]["path"], manifest)
+        save_manifest(manifest)
+
+    return {file_name: results[file_name] for file_name in files_to_process}
+
+def run_training_stage():
+    """
+    Train the sales model and save its components as a bundle at 'model_path' from config.json.
+
+    'training_mode' selects training on a random sample ("sample", the default),
+    on every row with bounded memory ("streaming"), on a sparse one-hot / hashed
+    encoding of a random sample ("sparse") or with the model family selected by a
+    time-based cross-validated search ("search").
+
+    When caching is enabled and the processed files are unchanged since a previous
+    run, the cached model is loaded instead of retraining.
+
+    Returns:
+        tuple: (model, encoder_dict, scaler, feature_columns, numerical_cols)
+    """
+    # The trainers pull in scikit-learn, so they are imported only when a model is needed
+    from sales_predictor import preprocess_and_train_sales_model, TRAINER_VERSION
+    from sales_predictor import save_model_bundle, load_model_bundle
+    from streaming_trainer import preprocess_and_train_sales_model_streaming
+    from sparse_features import preprocess_and_train_sales_model_sparse
+    from model_search import search_and_train_sales_model
+
+    config = load_config()
+    model_path = config.get("model_path", "models/sales_model.joblib")
+    cache_enabled = config.get("cache_enabled", False)
+
+    key = None
+    if cache_enabled:
+        manifest = load_manifest()
+        processed_to = config.get("processed_to", "data/clean")
+        input_paths = [os.path.join(processed_to, get_processed_file_name(file_name))
+                       for file_name in ["item.csv", "promotion.csv", "sales.csv", "supermarkets.csv"]]
+        if config.get("use_customer_features", False):
+            input_paths.append(config.get("customer_features_path", "data/customers/customer_features.parquet"))
+        if all(os.path.exists(path) for path in input_paths):
+            key = make_stage_key("train", input_paths, TRAINER_VERSION, manifest)
+            if fetch_artifact(key, model_path, manifest):
+                save_manifest(manifest)
+                return load_model_bundle(model_path)
+
+    training_mode = config.get("training_mode", "sample")
+    with track_stage("train", mode=training_mode):
+        if training_mode == "streaming":
+            components = preprocess_and_train_sales_model_streaming()
+        elif training_mode == "sparse":
+            components = preprocess_and_train_sales_model_sparse()
+        elif training_mode == "search":
+            components = search_and_train_sales_model()
+        else:
+            components = preprocess_and_train_sales_model()
+    save_model_bundle(model_path, *components)
+
+    if key:
+        store_artifact(key, "train", model_path, manifest)
+        save_manifest(manifest)
+
+    return components
+
+def run_aggregate_stage(delta=None, rebuild=False):
+    """
+    Build or refresh the sales cube from the processed sales file.
+
+    Args:
+        delta (str, optional): File of new sales rows to append and aggregate.
+        rebuild (bool): Rebuild the whole cube instead of refreshing the changed weeks.
+
+    Returns:
+        list: Paths of the cube files.
+    """
+    from sales_cube import refresh_sales_cube, get_cube_dir, CUBE_LEVELS
+
+    refresh_sales_cube(delta, rebuild)
+    cube_dir = get_cube_dir()
+    return [os.path.join(cube_dir, f"{level}.parquet") for level in CUBE_LEVELS] + [os.path.join(cube_dir, "index.json")]
+
+def run_forecast_stage(horizon=None, method=None, output_path=None):
+    """
+    Forecast weekly units per item and store from the sales cube and the promotion file.
+
+    Args:
+        horizon (int, optional): Weeks to forecast. Defaults to 'forecast_horizon'.
+        method (str, optional): Forecasting method. Defaults to 'forecast_method'.
+        output_path (str, optional): Parquet file to write. Defaults to 'forecast_path'.
+
+    Returns:
+        list: Path of the forecast file.
+    """
+    from sales_forecast import forecast_sales
+
+    return [forecast_sales(horizon, method, output_path)]
+
+def run_promotion_stage(rebuild=False):
+    """
+    Measure the sales uplift of promotions, recomputing only the weeks whose inputs changed.
+
+    Args:
+        rebuild (bool): Recompute every promotion.
+
+    Returns:
+        list: Paths of the uplift and summary files.
+    """
+    from promotion_analysis import refresh_promotion_uplift, get_promotion_dir
 
-    # Train model & get trained components
-    print("\nRunning Sales Predictor...")
-    model, encoder_dict, scaler, feature_columns, numerical_cols = preprocess_and_train_sales_model()
+    refresh_promotion_uplift(rebuild)
+    promotion_dir = get_promotion_dir()
+    return [os.path.join(promotion_dir, "uplift.parquet"), os.path.join(promotion_dir, "summary.parquet")]
 
-    # Now, make predictions on new data
-    # Create a sample data instance
-    new_sales_data = pd.DataFrame({
+def run_customer_stage():
+    """
+    Compute the per-customer features in one streaming pass over the processed sales file.
+
+    Returns:
+        list: Path of the customer table.
+    """
+    from customer_features import build_customer_features
+
+    return [build_customer_features()]
+
+def run_extract_stage(files_to_process, force=False):
+    """
+    Make the raw files available, downloading the archive only if some are missing.
+
+    Args:
+        files_to_process (list): Names of the raw CSV files the later stages need.
+        force (bool): Download and extract again even if every file is present.
+
+    Returns:
+        list: Paths of the raw files, or of the cached archive in "zip" mode.
+    """
+    config = load_config()
+    folder = config.get("extracted_to", "data/raw")
+    paths = [os.path.join(folder, file_name) for file_name in files_to_process]
+    if not force and all(os.path.exists(path) for path in paths):
+        print(f"Raw files already present in {folder}. Skipping extraction.")
+        return paths
+
+    if config.get("extract_mode", "extract") == "zip":
+        return [ensure_zip()]  # Files are read from the archive when they are cleaned
+    extract_files()
+    return paths
+
+def print_cleaning_summary(results):
+    """Print the outcome of each cleaned file."""
+    print("\nFile processing summary:")
+    for file_name, result in results.items():
+        print(f"  {file_name}: {result['status']}" + (f" ({result['error']})" if "error" in result else ""))
+
+def sample_sales_data():
+    """A single example sales row, scored when no input file is given."""
+    return pd.DataFrame({
         "item_code": [3000005040],
         "quantity": [2],
         "time": [1200],
@@ -71,9 +471,293 @@ def main():
         "season": [1]
     })
 
-     # Run prediction with feature_columns
-    predicted_sales = predict_sales(new_sales_data, model, encoder_dict, scaler, feature_columns, numerical_cols)
-    print(f"\nPredicted Sales Amount: {predicted_sales[0]:.2f}")
+def run_prediction_stage(input_path=None, output_path=None, model_path=None):
+    """
+    Score sales rows with the saved model bundle.
+
+    Args:
+        input_path (str, optional): CSV of sales rows. Defaults to sample_sales_data().
+        output_path (str, optional): CSV to write the predictions to, instead of printing them.
+        model_path (str, optional): Bundle file. Defaults to 'model_path' in config.json.
+
+    Returns:
+        list: [output_path] if the predictions were saved, else [].
+    """
+    from sales_predictor import score_sales  # Loads scikit-learn
+
+    new_sales_data = pd.read_csv(input_path) if input_path else sample_sales_data()
+    predictions = score_sales(new_sales_data, model_path)
+
+    if not output_path:
+        for prediction in predictions:
+            print(f"\nPredicted Sales Amount: {prediction:.2f}")
+        return []
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    pd.DataFrame({"predicted_sales": predictions}).to_csv(output_path, index=False)
+    print(f"Saved {len(predictions)} predictions to: {output_path}")
+    return [output_path]
+
+def get_file_signature(path):
+    """[size, modification time] of a file, or None if it is missing."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+def record_outputs(paths):
+    """Signatures of the files a stage produced, to tell later whether they are still intact."""
+    return {path: get_file_signature(path) for path in paths}
+
+def outputs_unchanged(outputs):
+    """Whether every recorded output still exists unmodified."""
+    return bool(outputs) and all(get_file_signature(path) == signature for path, signature in outputs.items())
+
+def load_checkpoint(checkpoint_path):
+    """Load the checkpoint of an interrupted run, or None if there is none."""
+    if not os.path.exists(checkpoint_path):
+        return None
+    try:
+        with open(checkpoint_path, "r") as f:
+            return json.load(f)
+    except json.JSONDecodeError:
+        print(f"Checkpoint is corrupt, starting a new run: {checkpoint_path}")
+        return None
+
+def save_checkpoint(checkpoint_path, checkpoint):
+    """Write the run checkpoint atomically."""
+    os.makedirs(os.path.dirname(os.path.abspath(checkpoint_path)), exist_ok=True)
+    tmp_path = f"{checkpoint_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(tmp_path, checkpoint_path)
+
+def run_pipeline(stages=None, files_to_process=None, parallel=None, predict_input=None, predict_output=None,
+                 resume=True):
+    """
+    Run the selected stages in order, resuming an interrupted run where it stopped.
+
+    Progress is saved to 'checkpoint_path' in config.json after every stage and,
+    when cleaning sequentially, after every file. If the same stages and files are
+    run again after a failure, completed stages whose outputs and settings are
+    unchanged are skipped, and so are files the cleaning stage had finished. Once
+    a stage runs again, every later stage runs too. The checkpoint is removed when
+    the run completes.
+
+    Args:
+        stages (list, optional): Stages to run, from PIPELINE_STAGES. Defaults to all.
+        files_to_process (list, optional): Raw files to extract and clean. Defaults to config.json.
+        parallel (bool, optional): Clean on a process pool. Defaults to 'parallel' in config.json.
+        predict_input (str, optional): CSV to score in the predict stage.
+        predict_output (str, optional): CSV to write the predictions to.
+        resume (bool): Continue from the checkpoint; if False, start over.
+
+    Returns:
+        dict: Output file signatures per stage run or reused.
+
+    Raises:
+        RuntimeError: If some files fail to clean. The files that succeeded stay checkpointed.
+    """
+    config = load_config()
+    stages = [stage for stage in PIPELINE_STAGES if stage in (stages or PIPELINE_STAGES)]
+    files_to_process = list(files_to_process or get_files_to_process())
+    parallel = config.get("parallel", False) if parallel is None else parallel
+    folder = config.get("extracted_to", "data/raw")
+    checkpoint_path = config.get("checkpoint_path", "data/checkpoints/run.json")
+
+    plan = {"stages": stages, "files": files_to_process, "predict_input": predict_input}
+    checkpoint = load_checkpoint(checkpoint_path) if resume else None
+    if checkpoint and checkpoint.get("plan") == plan:
+        print(f"Resuming interrupted run from checkpoint: {checkpoint_path}")
+    else:
+        checkpoint = {"plan": plan, "stages": {}, "cleaned_files": {}}
+
+    reusing = True  # Completed work is reused only until a stage has to run again
+    for stage in stages:
+        settings = {key: config.get(key) for key in CHECKPOINT_CONFIG_KEYS.get(stage, [])}
+        completed = checkpoint["stages"].get(stage)
+        if reusing and completed and completed["settings"] == settings and outputs_unchanged(completed["outputs"]):
+            print(f"\nSkipping stage '{stage}': completed by the interrupted run.")
+            continue
+
+        print(f"\nRunning stage '{stage}'...")
+        try:
+            if stage == "extract":
+                paths = run_extract_stage(files_to_process)
+            elif stage == "clean":
+                paths = run_checkpointed_cleaning(files_to_process, folder, parallel, settings, checkpoint,
+                                                  checkpoint_path, reusing)
+            elif stage == "aggregate":
+                paths = run_aggregate_stage()
+            elif stage == "forecast":
+                paths = run_forecast_stage()
+            elif stage == "promotions":
+                paths = run_promotion_stage()
+            elif stage == "customers":
+                paths = run_customer_stage()
+            elif stage == "train":
+                run_training_stage()
+                paths = [config.get("model_path", "models/sales_model.joblib")]
+            else:
+                paths = run_prediction_stage(predict_input, predict_output)
+        except Exception:
+            print(f"\nStage '{stage}' failed. Finished work is saved in {checkpoint_path}; run again to resume.")
+            raise
+        reusing = False
+
+        checkpoint["stages"][stage] = {"settings": settings, "outputs": record_outputs(paths)}
+        save_checkpoint(checkpoint_path, checkpoint)
+
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    print("\nRun complete.")
+    return {stage: checkpoint["stages"][stage]["outputs"] for stage in stages}
+
+def run_checkpointed_cleaning(files_to_process, folder, parallel, settings, checkpoint, checkpoint_path, reusing):
+    """
+    Cleaning stage of run_pipeline, skipping files the interrupted run already cleaned.
+
+    Returns:
+        list: Paths of the cleaned files.
+
+    Raises:
+        RuntimeError: If some files fail to clean.
+    """
+    cleaned_files = checkpoint["cleaned_files"]
+    if not reusing:
+        cleaned_files.clear()  # Earlier stages ran again, so their inputs may have changed
+
+    pending = [file_name for file_name in files_to_process
+               if not (file_name in cleaned_files and cleaned_files[file_name]["settings"] == settings
+                       and outputs_unchanged(cleaned_files[file_name]["outputs"]))]
+    if len(pending) < len(files_to_process):
+        print(f"Reusing {len(files_to_process) - len(pending)} files cleaned by the interrupted run.")
+
+    # Sequential runs checkpoint after every file; a process pool cleans them all at once
+    batches = [pending] if parallel else [[file_name] for file_name in pending]
+    results = {}
+    for batch in batches:
+        results.update(run_cleaning_stage(batch, folder, parallel))
+        for file_name in batch:
+            if results[file_name]["status"] in ("success", "cached"):
+                cleaned_files[file_name] = {"settings": settings, "outputs": record_outputs([results[file_name]["path"]])}
+        save_checkpoint(checkpoint_path, checkpoint)
+    print_cleaning_summary(results)
+
+    failed_files = [file_name for file_name, result in results.items() if result["status"] == "failed"]
+    if failed_files:
+        raise RuntimeError(f"Failed to process: {', '.join(failed_files)}")
+    return [path for file_name in files_to_process if file_name in cleaned_files
+            for path in cleaned_files[file_name]["outputs"]]
+
+def build_parser():
+    """Command-line interface of the pipeline."""
+    parser = argparse.ArgumentParser(description="Extract, clean and model the retail sales data.")
+    subparsers = parser.add_subparsers(dest="command", metavar="command")
+
+    extract_parser = subparsers.add_parser("extract", help="Download and extract the raw files")
+    extract_parser.add_argument("--files", nargs="+", help="Raw files needed (default: 'files_to_process')")
+    extract_parser.add_argument("--force", action="store_true", help="Download again even if the files exist")
+
+    clean_parser = subparsers.add_parser("clean", help="Clean raw files into 'processed_to'")
+    clean_parser.add_argument("--files", nargs="+", help="Raw files to clean (default: 'files_to_process')")
+    clean_parser.add_argument("--parallel", action=argparse.BooleanOptionalAction, default=None,
+                              help="Clean on a process pool (default: 'parallel')")
+
+    aggregate_parser = subparsers.add_parser("aggregate", help="Build or refresh the sales cube in 'cube_dir'")
+    aggregate_parser.add_argument("--delta", help="CSV or Parquet file of new sales rows to append and aggregate")
+    aggregate_parser.add_argument("--rebuild", action="store_true", help="Rebuild every week of the cube")
+
+    forecast_parser = subparsers.add_parser("forecast", help="Forecast weekly units per item and store")
+    forecast_parser.add_argument("--horizon", type=int, help="Weeks to forecast (default: 'forecast_horizon')")
+    forecast_parser.add_argument("--method", choices=["ses", "promo_regression", "ses_promo"],
+                                 help="Forecasting method (default: 'forecast_method')")
+    forecast_parser.add_argument("--output", help="Parquet file to write (default: 'forecast_path')")
+
+    promotions_parser = subparsers.add_parser("promotions", help="Measure promotion uplift by feature and display")
+    promotions_parser.add_argument("--rebuild", action="store_true", help="Recompute every promotion")
+
+    subparsers.add_parser("customers", help="Compute recency, frequency, monetary and preference features per customer")
+
+    baskets_parser = subparsers.add_parser("baskets", help="Find frequent item pairs and co-purchase rules")
+    baskets_parser.add_argument("--min-support", type=float,
+                                help="Smallest share of baskets of a frequent itemset (default: 'basket_min_support')")
+    baskets_parser.add_argument("--top-k", type=int, help="Rules kept per item (default: 'basket_top_k')")
+
+    subparsers.add_parser("train", help="Train the sales model and save it to 'model_path'")
+
+    predict_parser = subparsers.add_parser("predict", help="Score sales rows with the saved model")
+    predict_parser.add_argument("--input", help="CSV of sales rows (default: one sample row)")
+    predict_parser.add_argument("--output", help="CSV to write the predictions to (default: print them)")
+    predict_parser.add_argument("--model", help="Model bundle (default: 'model_path')")
+
+    serve_parser = subparsers.add_parser("serve", help="Serve predictions over HTTP with the saved model")
+    serve_parser.add_argument("--host", help="Interface to listen on (default: 'serve_host')")
+    serve_parser.add_argument("--port", type=int, help="Port to listen on (default: 'serve_port')")
+    serve_parser.add_argument("--model", help="Model bundle (default: 'model_path')")
+    serve_parser.add_argument("--max-batch-size", type=int, help="Rows scored together (default: 'serve_max_batch_size')")
+    serve_parser.add_argument("--max-wait-ms", type=float,
+                              help="Longest wait for a batch to fill (default: 'serve_max_wait_ms')")
+
+    run_parser = subparsers.add_parser("run", help="Run several stages, resuming an interrupted run")
+    run_parser.add_argument("--stages", nargs="+", choices=PIPELINE_STAGES, help="Stages to run (default: all)")
+    run_parser.add_argument("--files", nargs="+", help="Raw files to extract and clean (default: 'files_to_process')")
+    run_parser.add_argument("--parallel", action=argparse.BooleanOptionalAction, default=None,
+                            help="Clean on a process pool (default: 'parallel')")
+    run_parser.add_argument("--input", help="CSV of sales rows to score (default: one sample row)")
+    run_parser.add_argument("--output", help="CSV to write the predictions to (default: print them)")
+    run_parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint of an interrupted run")
+    return parser
+
+def main(argv=None):
+    """
+    Run a pipeline command; without one, run every stage.
+
+    Settings come from config.json and can be overridden per run with
+    PIPELINE_<SETTING> environment variables, e.g. PIPELINE_TRAINING_MODE=streaming.
+
+    Args:
+        argv (list, optional): Command-line arguments. Defaults to sys.argv[1:].
+
+    Returns:
+        int: Exit status.
+    """
+    args = build_parser().parse_args((sys.argv[1:] if argv is None else argv) or ["run"])
+    try:
+        if args.command == "extract":
+            run_extract_stage(args.files or get_files_to_process(), force=args.force)
+        elif args.command == "clean":
+            parallel = load_config().get("parallel", False) if args.parallel is None else args.parallel
+            results = run_cleaning_stage(args.files or get_files_to_process(),
+                                         load_config().get("extracted_to", "data/raw"), parallel)
+            print_cleaning_summary(results)
+            if any(result["status"] == "failed" for result in results.values()):
+                return 1
+        elif args.command == "aggregate":
+            run_aggregate_stage(args.delta, args.rebuild)
+        elif args.command == "forecast":
+            run_forecast_stage(args.horizon, args.method, args.output)
+        elif args.command == "promotions":
+            run_promotion_stage(args.rebuild)
+        elif args.command == "customers":
+            run_customer_stage()
+        elif args.command == "baskets":
+            from basket_analysis import analyze_baskets  # Loads SciPy
+            analyze_baskets(args.min_support, args.top_k)
+        elif args.command == "train":
+            run_training_stage()
+        elif args.command == "predict":
+            run_prediction_stage(args.input, args.output, args.model)
+        elif args.command == "serve":
+            from scoring_server import serve  # Loads scikit-learn
+            serve(args.host, args.port, args.model, args.max_batch_size, args.max_wait_ms)
+        else:
+            run_pipeline(args.stages, args.files, args.parallel, args.input, args.output, resume=not args.restart)
+    finally:
+        # Per-stage timings, memory and row counts of this run
+        export_metrics()
+    return 0
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
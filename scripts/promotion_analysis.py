@@ -0,0 +1,224 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+
+from config_loader import load_config, get_processed_file_name
+from file_reader import load_df
+from metrics import track_stage
+from sales_cube import refresh_sales_cube, query_sales_cube
+from sales_forecast import series_ids
+
+# Layout version of the uplift files; bump it when their columns or the baseline change
+UPLIFT_VERSION = 1
+
+# Promotion columns read for the analysis
+PROMOTION_COLUMNS = ["item_code", "supermarket_code", "week", "feature", "display"]
+
+# Weeks are packed into the low bits of a (series, week) key; processed weeks are int16
+WEEK_RADIX = 1 << 16
+
+def get_promotion_dir():
+    """Retrieve the promotion analysis output directory from config.json, creating it if needed."""
+    promotion_dir = os.path.normpath(load_config().get("promotion_dir", "data/promotions"))
+    os.makedirs(promotion_dir, exist_ok=True)
+    return promotion_dir
+
+def load_promotions():
+    """Processed promotions, one row per promoted (item, supermarket, week)."""
+    folder = load_config().get("processed_to", "data/clean")
+    promotions = load_df(get_processed_file_name("promotion.csv"), folder, columns=PROMOTION_COLUMNS)
+    return promotions.drop_duplicates(["item_code", "supermarket_code", "week"]).reset_index(drop=True)
+
+def promotion_fingerprints(promotions):
+    """
+    Order-independent checksum of the promotions of each week, to tell which weeks changed.
+
+    Returns:
+        dict: {week: [rows, wrapping sum of the row hashes]}
+    """
+    if promotions.empty:
+        return {}
+    hashes = pd.util.hash_pandas_object(promotions[PROMOTION_COLUMNS], index=False).to_numpy()
+    weeks = promotions["week"].to_numpy()
+    order = np.argsort(weeks, kind="stable")
+    unique_weeks, starts, counts = np.unique(weeks[order], return_index=True, return_counts=True)
+    sums = np.add.reduceat(hashes[order], starts)  # uint64 sums wrap, which keeps them order-independent
+    return {int(week): [int(count), int(total)] for week, count, total in zip(unique_weeks, counts, sums)}
+
+def week_keys(item_codes, supermarket_codes, weeks, radix):
+    """One int64 key per (item, supermarket, week), ordered by series and then week."""
+    return series_ids(item_codes, supermarket_codes, radix) * WEEK_RADIX + np.asarray(weeks, dtype=np.int64)
+
+def compute_uplift(promotions, all_promotions, sales, baseline_weeks, first_week):
+    """
+    Compare units and amount in promoted weeks with the same item and store in the weeks before.
+
+    The baseline of a promotion in week w is the mean weekly units (and amount) of
+    its item and supermarket over the non-promoted weeks in [w - baseline_weeks, w),
+    counting weeks without sales as 0 and ignoring weeks before first_week. It is
+    looked up for all promotions at once in a sorted index of the non-promoted
+    (item, supermarket, week) keys with cumulative sums, so each promotion costs two
+    binary searches instead of a scan of the sales.
+
+    Args:
+        promotions (pd.DataFrame): Promotions to evaluate, with PROMOTION_COLUMNS.
+        all_promotions (pd.DataFrame): Every promotion, to leave promoted weeks out of baselines.
+        sales (pd.DataFrame): item_store_week cube rows covering the baseline and promoted weeks.
+        baseline_weeks (int): Weeks before a promotion that its baseline is taken from.
+        first_week (int): First week with sales data.
+
+    Returns:
+        pd.DataFrame: The promotions with units, amount, baseline_units, baseline_amount,
+                      baseline_weeks, uplift_units and lift_units (units / baseline_units)
+                      columns; baselines are NaN when no week of the window was unpromoted.
+    """
+    with track_stage("promotion_uplift") as metrics:
+        radix = int(max(sales["supermarket_code"].max() if len(sales) else 0,
+                        all_promotions["supermarket_code"].max() if len(all_promotions) else 0)) + 1
+        promoted = np.sort(week_keys(all_promotions["item_code"], all_promotions["supermarket_code"],
+                                     all_promotions["week"], radix))
+        sales_keys = week_keys(sales["item_code"], sales["supermarket_code"], sales["week"], radix)
+        order = np.argsort(sales_keys, kind="stable")
+        sales_keys = sales_keys[order]
+        units = sales["units"].to_numpy(np.float64)[order]
+        amount = sales["amount"].to_numpy(np.float64)[order]
+
+        # Sorted index of the non-promoted weeks with running totals
+        unpromoted = ~np.isin(sales_keys, promoted, assume_unique=False)
+        base_keys = sales_keys[unpromoted]
+        cum_units = np.r_[0.0, np.cumsum(units[unpromoted])]
+        cum_amount = np.r_[0.0, np.cumsum(amount[unpromoted])]
+
+        weeks = promotions["week"].to_numpy(np.int64)
+        series = series_ids(promotions["item_code"], promotions["supermarket_code"], radix) * WEEK_RADIX
+        window_start = series + np.maximum(weeks - baseline_weeks, first_week)
+        window_end = series + weeks
+        lo, hi = np.searchsorted(base_keys, window_start), np.searchsorted(base_keys, window_end)
+        promoted_in_window = np.searchsorted(promoted, window_end) - np.searchsorted(promoted, window_start)
+        n_weeks = np.maximum(window_end - window_start - promoted_in_window, 0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            baseline_units = np.where(n_weeks > 0, (cum_units[hi] - cum_units[lo]) / n_weeks, np.nan)
+            baseline_amount = np.where(n_weeks > 0, (cum_amount[hi] - cum_amount[lo]) / n_weeks, np.nan)
+
+        # Actual sales of the promoted weeks (0 if nothing sold)
+        position = np.searchsorted(sales_keys, window_end)
+        found = position < len(sales_keys)
+        found[found] = sales_keys[position[found]] == window_end[found]
+        promoted_units = np.where(found, np.r_[units, 0.0][position], 0.0)
+        promoted_amount = np.where(found, np.r_[amount, 0.0][position], 0.0)
+
+        result = promotions.reset_index(drop=True).assign(
+            units=promoted_units, amount=promoted_amount, baseline_units=baseline_units,
+            baseline_amount=baseline_amount, baseline_weeks=n_weeks, uplift_units=promoted_units - baseline_units)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            result["lift_units"] = np.where(baseline_units > 0, promoted_units / baseline_units, np.nan)
+        metrics["rows_in"], metrics["rows_out"] = len(sales), len(result)
+    return result
+
+def summarize_uplift(uplift):
+    """
+    Lift of every feature / display combination over the promotions that have a baseline.
+
+    Returns:
+        pd.DataFrame: promotions, units, baseline_units, amount, baseline_amount and
+                      lift_units / lift_amount (total over total baseline) per feature and display.
+    """
+    valid = uplift[uplift["baseline_units"].notna()]
+    summary = valid.groupby(["feature", "display"], dropna=False, observed=True).agg(
+        promotions=("week", "size"), units=("units", "sum"), baseline_units=("baseline_units", "sum"),
+        amount=("amount", "sum"), baseline_amount=("baseline_amount", "sum")).reset_index()
+    with np.errstate(invalid="ignore", divide="ignore"):
+        summary["lift_units"] = summary["units"] / summary["baseline_units"]
+        summary["lift_amount"] = summary["amount"] / summary["baseline_amount"]
+    return summary.sort_values("lift_units", ascending=False).reset_index(drop=True)
+
+def load_uplift_index(promotion_dir):
+    """Index of the last uplift run, or None if there is none of the current version."""
+    index_path = os.path.join(promotion_dir, "index.json")
+    if not os.path.exists(index_path):
+        return None
+    with open(index_path, "r") as f:
+        index = json.load(f)
+    return index if index.get("version") == UPLIFT_VERSION else None
+
+def weeks_to_recompute(promotion_weeks, changed_weeks, baseline_weeks):
+    """Promotion weeks whose baseline window or own week includes a changed week."""
+    changed = np.sort(np.asarray(list(changed_weeks), dtype=np.int64))
+    weeks = np.asarray(promotion_weeks, dtype=np.int64)
+    touched = np.searchsorted(changed, weeks - baseline_weeks) < np.searchsorted(changed, weeks, side="right")
+    return set(weeks[touched].tolist())
+
+def refresh_promotion_uplift(rebuild=False):
+    """
+    Bring the promotion uplift tables up to date, recomputing only the affected weeks.
+
+    The sales cube is refreshed first. Per-week checksums of the promotions and the
+    cube's per-week sales checksums are compared with the last run: a promotion
+    week is recomputed if any week of its baseline window, or the week itself,
+    changed (for example when new promotion weeks arrive). Promotions after the last
+    week of sales are not evaluated yet. The other rows are kept as they are.
+
+    Writes, in 'promotion_dir':
+        uplift.parquet: one row per evaluated promotion (see compute_uplift);
+        summary.parquet: lift per feature and display (see summarize_uplift);
+        index.json: checksums of the inputs of the last run.
+
+    Args:
+        rebuild (bool): Recompute every promotion.
+
+    Returns:
+        pd.DataFrame: The summary.
+    """
+    baseline_weeks = load_config().get("promo_baseline_weeks", 8)
+    promotion_dir = get_promotion_dir()
+    uplift_path = os.path.join(promotion_dir, "uplift.parquet")
+
+    cube_index = refresh_sales_cube()
+    sales_fingerprints = {int(week): values for week, values in cube_index["fingerprints"].items()}
+    first_week, last_week = min(cube_index["weeks"]), max(cube_index["weeks"])
+    promotions = load_promotions()
+    promotions = promotions[promotions["week"] >= first_week]
+    promo_fingerprints = promotion_fingerprints(promotions)
+
+    index = None if rebuild else load_uplift_index(promotion_dir)
+    if index is None or index["baseline_weeks"] != baseline_weeks or not os.path.exists(uplift_path):
+        previous, changed = None, set(promo_fingerprints) | set(sales_fingerprints)
+    else:
+        previous = pd.read_parquet(uplift_path)
+        old_promos = {int(week): values for week, values in index["promotion_fingerprints"].items()}
+        old_sales = {int(week): values for week, values in index["sales_fingerprints"].items()}
+        changed = {week for week in set(promo_fingerprints) | set(old_promos)
+                   if promo_fingerprints.get(week) != old_promos.get(week)}
+        changed |= {week for week in set(sales_fingerprints) | set(old_sales)
+                    if sales_fingerprints.get(week) != old_sales.get(week)}
+
+    evaluated = promotions[promotions["week"] <= last_week]
+    weeks = weeks_to_recompute(np.unique(evaluated["week"]), changed, baseline_weeks)
+    if previous is not None and not weeks:
+        print("Promotion uplift is up to date.")
+        return pd.read_parquet(os.path.join(promotion_dir, "summary.parquet"))
+
+    print(f"\nComputing promotion uplift for {len(weeks)} weeks...")
+    sales_weeks = sorted({week - offset for week in weeks for offset in range(baseline_weeks + 1)})
+    sales = query_sales_cube("item_store_week", weeks=sales_weeks)
+    uplift = compute_uplift(evaluated[evaluated["week"].isin(weeks)], promotions, sales, baseline_weeks, first_week)
+    if previous is not None:
+        kept = previous[~previous["week"].isin(weeks | changed) & (previous["week"] <= last_week)]
+        uplift = pd.concat([kept, uplift], ignore_index=True)
+    uplift = uplift.sort_values(["week", "item_code", "supermarket_code"], kind="stable").reset_index(drop=True)
+    summary = summarize_uplift(uplift)
+
+    uplift.to_parquet(uplift_path, index=False)
+    summary.to_parquet(os.path.join(promotion_dir, "summary.parquet"), index=False)
+    index = {"version": UPLIFT_VERSION, "baseline_weeks": baseline_weeks,
+             "promotion_fingerprints": {str(week): values for week, values in promo_fingerprints.items()},
+             "sales_fingerprints": {str(week): values for week, values in sales_fingerprints.items()}}
+    index_path = os.path.join(promotion_dir, "index.json")
+    with open(f"{index_path}.tmp", "w") as f:
+        json.dump(index, f, indent=2)
+    os.replace(f"{index_path}.tmp", index_path)
+
+    print(f"Promotion uplift saved to: {promotion_dir} ({len(uplift)} promotions)")
+    print(summary[["feature", "display", "promotions", "lift_units"]].to_string(index=False))
+    return summary
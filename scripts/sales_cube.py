@@ -0,0 +1,367 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+
+from config_loader import load_config, get_processed_file_name
+from file_reader import load_df, iter_df_chunks, apply_filters
+from file_writer import append_df
+from data_processor import clean_sales_data
+from data_schema import apply_schema, PROCESSED_SCHEMAS
+from metrics import track_stage
+from data_validation import FileValidator, summarize_validation, save_validation_summary
+
+# Layout version of the cube files; bump it when the levels or measures change
+# so existing cubes are rebuilt instead of refreshed
+CUBE_VERSION = 1
+
+# Group keys of each level, finest first. Every level is aggregated from the sales
+# rows, because distinct basket and customer counts cannot be summed from a finer level.
+CUBE_LEVELS = {
+    "item_store_week": ["item_code", "supermarket_code", "week"],
+    "item_week": ["item_code", "week"],
+    "store_week": ["supermarket_code", "week"],
+    "week": ["week"],
+}
+
+# Sales columns read to build the cube
+CUBE_SOURCE_COLUMNS = ["item_code", "supermarket_code", "week", "quantity", "transaction_amount", "basket",
+                       "customer_id"]
+
+# Dtypes of the measures stored for every group
+CUBE_MEASURES = {"units": "int64", "amount": "float64", "transactions": "int64", "baskets": "int64",
+                 "customers": "int64"}
+
+def get_cube_dir():
+    """Retrieve the cube directory from config.json, creating it if needed."""
+    cube_dir = os.path.normpath(load_config().get("cube_dir", "data/cube"))
+    os.makedirs(cube_dir, exist_ok=True)
+    return cube_dir
+
+def get_sales_path():
+    """Path of the processed sales file the cube is built from."""
+    processed_to = load_config().get("processed_to", "data/clean")
+    return os.path.join(processed_to, get_processed_file_name("sales.csv"))
+
+def get_file_signature(path):
+    """[size, modification time] of a file, or None if it is missing."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+def week_fingerprints(sales_df):
+    """
+    Integer checksums of the sales rows of each week, to tell which weeks changed.
+
+    Only exact integer sums are used (amounts in cents), so the result does not
+    depend on how the rows were split into chunks.
+
+    Returns:
+        pd.DataFrame: One row per week, indexed by week.
+    """
+    fingerprint = pd.DataFrame({
+        "week": sales_df["week"].to_numpy(),
+        "rows": 1,
+        "units": sales_df["quantity"].to_numpy(np.int64),
+        "cents": np.rint(sales_df["transaction_amount"].to_numpy(np.float64) * 100).astype(np.int64),
+        "items": sales_df["item_code"].to_numpy(np.int64),
+        "stores": sales_df["supermarket_code"].to_numpy(np.int64),
+        "baskets": sales_df["basket"].to_numpy(np.int64),
+        "customers": sales_df["customer_id"].to_numpy(np.int64),
+    })
+    return fingerprint.groupby("week").sum()
+
+def scan_week_fingerprints(chunk_size=None):
+    """Fingerprints of every week of the processed sales file, streamed chunk by chunk."""
+    sales_path = get_sales_path()
+    totals = None
+    for chunk in iter_df_chunks(os.path.basename(sales_path), os.path.dirname(sales_path), chunk_size,
+                                columns=CUBE_SOURCE_COLUMNS):
+        fingerprints = week_fingerprints(chunk)
+        totals = fingerprints if totals is None else totals.add(fingerprints, fill_value=0).astype(np.int64)
+    return totals
+
+def aggregate_sales(sales_df):
+    """
+    Aggregate sales rows to every cube level.
+
+    Args:
+        sales_df (pd.DataFrame): Processed sales rows with CUBE_SOURCE_COLUMNS.
+
+    Returns:
+        dict: DataFrame per level, sorted by week and then the other keys, with the
+              units, amount, transactions, baskets and customers of each group.
+    """
+    aggregates = {}
+    for level, keys in CUBE_LEVELS.items():
+        sort_keys = ["week"] + [key for key in keys if key != "week"]
+        grouped = sales_df.groupby(sort_keys, sort=True, observed=True)
+        aggregate = grouped.agg(units=("quantity", "sum"), amount=("transaction_amount", "sum"),
+                                transactions=("quantity", "size"), baskets=("basket", "nunique"),
+                                customers=("customer_id", "nunique")).reset_index()
+        aggregates[level] = aggregate.astype(CUBE_MEASURES)
+    return aggregates
+
+def empty_level(level):
+    """Empty DataFrame with the columns and dtypes of a level."""
+    keys = ["week"] + [key for key in CUBE_LEVELS[level] if key != "week"]
+    columns = {key: PROCESSED_SCHEMAS["sales.csv"]["dtype"][key] for key in keys}
+    return pd.DataFrame({column: pd.Series(dtype=dtype) for column, dtype in {**columns, **CUBE_MEASURES}.items()})
+
+def load_week_rows(weeks):
+    """Processed sales rows of the given weeks."""
+    sales_path = get_sales_path()
+    return load_df(os.path.basename(sales_path), os.path.dirname(sales_path), columns=CUBE_SOURCE_COLUMNS,
+                   filters=[("week", "in", sorted(int(week) for week in weeks))])
+
+def load_cube_index(cube_dir=None):
+    """
+    Load the cube's lookup index, or None if there is no cube of the current version.
+
+    Returns:
+        dict: {"version", "source", "weeks", "fingerprints", "levels"}. Row group i of
+              every level file holds the groups of weeks[i].
+    """
+    index_path = os.path.join(cube_dir or get_cube_dir(), "index.json")
+    if not os.path.exists(index_path):
+        return None
+    with open(index_path, "r") as f:
+        index = json.load(f)
+    return index if index.get("version") == CUBE_VERSION else None
+
+def split_by_week(aggregate):
+    """{week: rows} slices of a level aggregate sorted by week."""
+    weeks = aggregate["week"].to_numpy()
+    unique_weeks, starts = np.unique(weeks, return_index=True)
+    ends = np.append(starts[1:], len(weeks))
+    return {int(week): aggregate.iloc[start:end] for week, start, end in zip(unique_weeks, starts, ends)}
+
+def write_cube(recomputed, fingerprints, cube_dir, previous_index=None):
+    """
+    Write the level files (one row group per week) and the index, replacing the old cube.
+
+    Args:
+        recomputed (dict): {level: {week: rows}} of the recomputed weeks.
+        fingerprints (dict): {week: fingerprint list} of every week in the new cube.
+        cube_dir (str): Cube directory.
+        previous_index (dict, optional): Index of the cube whose other weeks are copied as they are.
+
+    Returns:
+        dict: The new index.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    compression = load_config().get("parquet_compression", "snappy")
+    weeks = sorted(fingerprints)
+    previous_groups = {week: i for i, week in enumerate(previous_index["weeks"])} if previous_index else {}
+
+    levels = {}
+    for level in CUBE_LEVELS:
+        level_path = os.path.join(cube_dir, f"{level}.parquet")
+        previous = pq.ParquetFile(level_path) if previous_groups else None
+        tmp_path = f"{level_path}.tmp"
+        writer = None
+        rows = 0
+        for week in weeks:
+            if week in recomputed[level]:
+                table = pa.Table.from_pandas(recomputed[level][week], preserve_index=False)
+            else:
+                table = previous.read_row_group(previous_groups[week])  # Unchanged week, copied without re-aggregating
+            if writer is None:
+                writer = pq.ParquetWriter(tmp_path, table.schema, compression=compression)
+            writer.write_table(table.cast(writer.schema), row_group_size=max(len(table), 1))
+            rows += len(table)
+        if writer is None:  # No sales at all; keep an empty file so queries still work
+            pq.write_table(pa.Table.from_pandas(empty_level(level), preserve_index=False), tmp_path)
+        else:
+            writer.close()
+        os.replace(tmp_path, level_path)
+        if previous is not None:
+            previous.close()
+        levels[level] = {"keys": CUBE_LEVELS[level], "rows": rows}
+
+    index = {"version": CUBE_VERSION, "source": get_file_signature(get_sales_path()), "weeks": weeks,
+             "fingerprints": {str(week): fingerprints[week] for week in weeks}, "levels": levels}
+    save_cube_index(index, cube_dir)
+    return index
+
+def save_cube_index(index, cube_dir=None):
+    """Write the cube's lookup index atomically."""
+    index_path = os.path.join(cube_dir or get_cube_dir(), "index.json")
+    with open(f"{index_path}.tmp", "w") as f:
+        json.dump(index, f, indent=2)
+    os.replace(f"{index_path}.tmp", index_path)
+
+def recompute_weeks(weeks, fingerprints, previous_index=None):
+    """
+    Aggregate the sales rows of some weeks and write them into the cube.
+
+    Args:
+        weeks (iterable): Weeks to recompute.
+        fingerprints (dict): {week: fingerprint} of every week the cube should hold.
+        previous_index (dict, optional): Index of the cube the other weeks are copied from.
+
+    Returns:
+        dict: The new index.
+    """
+    weeks = sorted(weeks)
+    with track_stage("aggregate") as metrics:
+        sales_df = load_week_rows(weeks) if weeks else pd.DataFrame(columns=CUBE_SOURCE_COLUMNS)
+        metrics["rows_in"] = len(sales_df)
+
+        # One groupby over all the weeks; each level comes out sorted by week and is sliced per week
+        recomputed = {level: split_by_week(aggregate) for level, aggregate in aggregate_sales(sales_df).items()}
+        index = write_cube(recomputed, fingerprints, get_cube_dir(), previous_index)
+        metrics["rows_out"] = sum(level["rows"] for level in index["levels"].values())
+    return index
+
+def build_sales_cube(chunk_size=None):
+    """
+    Build the sales cube from the whole processed sales file.
+
+    Returns:
+        dict: The cube index.
+    """
+    fingerprints = scan_week_fingerprints(chunk_size)
+    weeks = [] if fingerprints is None else [int(week) for week in fingerprints.index]
+    print(f"Building sales cube for {len(weeks)} weeks...")
+    return recompute_weeks(weeks, fingerprint_lists(fingerprints))
+
+def fingerprint_lists(fingerprints):
+    """{week: [checksums]} from a week_fingerprints DataFrame, as stored in the index."""
+    if fingerprints is None:
+        return {}
+    return {int(week): [int(value) for value in row] for week, row in zip(fingerprints.index, fingerprints.to_numpy())}
+
+def read_sales_delta(delta):
+    """Cleaned sales rows from a DataFrame or CSV/Parquet path holding raw or cleaned rows."""
+    if isinstance(delta, str):
+        delta = load_df(os.path.basename(delta), os.path.dirname(delta) or ".")
+    if "code" in delta.columns:  # Raw extract rows
+        delta = clean_sales_data(delta.copy())
+    return apply_schema(delta, PROCESSED_SCHEMAS["sales.csv"])
+
+def validate_sales_delta(delta_df):
+    """
+    Apply the sales.csv validation rules to delta rows before they join the processed sales file.
+
+    Failing rows are added to the sales quarantine CSV and the delta's summary is saved
+    under "sales.csv delta". Nothing is checked when 'validation_enabled' is off in config.json.
+
+    Args:
+        delta_df (pd.DataFrame): Cleaned delta rows.
+
+    Returns:
+        pd.DataFrame: The rows that passed every check.
+
+    Raises:
+        ValueError: If the delta breaches a validation threshold and 'validation_fail_on_breach' is set.
+    """
+    config = load_config()
+    if not config.get("validation_enabled", True):
+        return delta_df
+    validator = FileValidator("sales.csv", config.get("extracted_to", "data/raw"), append=True)
+    delta_df = validator.check(delta_df)
+    summary = summarize_validation("sales.csv", validator.stats)
+    save_validation_summary({"sales.csv delta": summary})
+    if summary["status"] == "failed":
+        if config.get("validation_fail_on_breach", False):
+            raise ValueError(f"Validation of the sales delta failed: {'; '.join(summary['breaches'])}")
+        print(f"Warning: the sales delta breached validation thresholds: {'; '.join(summary['breaches'])}")
+    return apply_schema(delta_df, PROCESSED_SCHEMAS["sales.csv"])  # Integer columns without the missing values
+
+def refresh_sales_cube(delta=None, rebuild=False):
+    """
+    Bring the sales cube up to date, recomputing only the weeks that changed.
+
+    With a delta, its rows that pass validation (see validate_sales_delta) are appended
+    to the processed sales file and only the weeks it touches are re-aggregated from
+    the sales rows of those weeks. Without one, the cube is left alone if the sales file is unchanged since it was built;
+    otherwise per-week checksums of the file are compared with the cube's to find
+    the weeks to recompute. Unchanged weeks are copied into the new cube as they are.
+
+    Args:
+        delta (pd.DataFrame or str, optional): New sales rows, raw or cleaned, or the file holding them.
+        rebuild (bool): Rebuild the whole cube.
+
+    Returns:
+        dict: The cube index.
+
+    Raises:
+        ValueError: If the delta fails validation.
+    """
+    index = None if rebuild else load_cube_index()
+
+    if delta is not None:
+        delta_df = validate_sales_delta(read_sales_delta(delta))
+        append_df(delta_df, "sales.csv")
+        if index is None:
+            return build_sales_cube()
+
+        fingerprints = {int(week): values for week, values in index["fingerprints"].items()}
+        for week, values in fingerprint_lists(week_fingerprints(delta_df)).items():
+            fingerprints[week] = [a + b for a, b in zip(fingerprints.get(week, [0] * len(values)), values)]
+        weeks = sorted({int(week) for week in delta_df["week"].unique()})
+        print(f"Refreshing sales cube for {len(weeks)} weeks with {len(delta_df)} new sales rows...")
+        return recompute_weeks(weeks, fingerprints, index)
+
+    if index is None:
+        return build_sales_cube()
+    if index["source"] == get_file_signature(get_sales_path()):
+        print("Sales cube is up to date.")
+        return index
+
+    fingerprints = fingerprint_lists(scan_week_fingerprints())
+    previous = {int(week): values for week, values in index["fingerprints"].items()}
+    changed = [week for week in fingerprints if previous.get(week) != fingerprints[week]]
+    removed = [week for week in previous if week not in fingerprints]
+    if not changed and not removed:  # Rewritten with the same rows, e.g. by another clean
+        index["source"] = get_file_signature(get_sales_path())
+        save_cube_index(index)
+        print("Sales cube is up to date.")
+        return index
+    print(f"Refreshing sales cube: {len(changed)} changed and {len(removed)} removed weeks...")
+    return recompute_weeks(changed, fingerprints, index)
+
+def query_sales_cube(level="item_store_week", weeks=None, item_codes=None, supermarket_codes=None):
+    """
+    Read aggregates from the cube, decoding only the row groups of the requested weeks.
+
+    Args:
+        level (str): One of CUBE_LEVELS.
+        weeks (list, optional): Weeks to return. Defaults to all.
+        item_codes (list, optional): Items to return, for levels keyed by item.
+        supermarket_codes (list, optional): Supermarkets to return, for levels keyed by supermarket.
+
+    Returns:
+        pd.DataFrame: The level's keys and measures, sorted by week.
+
+    Raises:
+        FileNotFoundError: If the cube has not been built.
+        ValueError: If the level is unknown or not keyed by a requested column.
+    """
+    import pyarrow.parquet as pq
+
+    if level not in CUBE_LEVELS:
+        raise ValueError(f"Unknown cube level: {level}. Choose one of {list(CUBE_LEVELS)}")
+    cube_dir = get_cube_dir()
+    index = load_cube_index(cube_dir)
+    if index is None:
+        raise FileNotFoundError(f"Sales cube not found in: {cube_dir}")
+
+    filters = []
+    for column, values in (("item_code", item_codes), ("supermarket_code", supermarket_codes)):
+        if values is not None:
+            if column not in CUBE_LEVELS[level]:
+                raise ValueError(f"Cube level {level} is not keyed by {column}")
+            filters.append((column, "in", list(values)))
+
+    wanted = set(index["weeks"]) if weeks is None else {int(week) for week in weeks}
+    row_groups = [i for i, week in enumerate(index["weeks"]) if week in wanted]
+    with pq.ParquetFile(os.path.join(cube_dir, f"{level}.parquet")) as cube_file:
+        df = cube_file.read_row_groups(row_groups).to_pandas() if row_groups else \
+            cube_file.schema_arrow.empty_table().to_pandas()
+    return apply_filters(df, filters).reset_index(drop=True)
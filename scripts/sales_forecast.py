@@ -0,0 +1,261 @@
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+from config_loader import load_config, get_processed_file_name
+from file_reader import load_df
+from metrics import track_stage, call_with_metrics, STAGE_METRICS
+from sales_cube import refresh_sales_cube, query_sales_cube
+
+# Forecasting methods, each fitted per series by forecast_shard
+FORECAST_METHODS = ["ses", "promo_regression", "ses_promo"]
+
+# Smoothing factors tried for every series; the one with the lowest one-step-ahead error is kept
+DEFAULT_ALPHAS = [0.05, 0.1, 0.2, 0.3, 0.5, 0.7, 0.9]
+
+def get_forecast_path():
+    """Forecast file from config.json, creating its directory if needed."""
+    forecast_path = load_config().get("forecast_path", "data/forecast/sales_forecast.parquet")
+    os.makedirs(os.path.dirname(os.path.abspath(forecast_path)), exist_ok=True)
+    return forecast_path
+
+def series_ids(item_codes, supermarket_codes, radix):
+    """One int64 id per (item_code, supermarket_code) pair; radix exceeds every supermarket code."""
+    return np.asarray(item_codes, dtype=np.int64) * radix + np.asarray(supermarket_codes, dtype=np.int64)
+
+def build_series(measure="units"):
+    """
+    Lay out the weekly sales of every (item, store) pair as a dense 2-D array.
+
+    The cube's item_store_week level is brought up to date and read once; weeks
+    without sales for a pair are 0, including the weeks before its first sale
+    (see first_sale_weeks).
+
+    Args:
+        measure (str): Cube measure to forecast, e.g. 'units' or 'amount'.
+
+    Returns:
+        tuple: (keys, first_week, values) where keys is a DataFrame of item_code and
+               supermarket_code per series (sorted), first_week the week of column 0
+               and values a float64 array of shape (series, weeks).
+    """
+    refresh_sales_cube()
+    cube = query_sales_cube("item_store_week")
+    if cube.empty:
+        raise ValueError("No sales in the cube to forecast from")
+
+    with track_stage("build_series") as metrics:
+        radix = int(cube["supermarket_code"].max()) + 1
+        codes, uniques = pd.factorize(series_ids(cube["item_code"], cube["supermarket_code"], radix), sort=True)
+        first_week = int(cube["week"].min())
+        n_weeks = int(cube["week"].max()) - first_week + 1
+
+        values = np.zeros((len(uniques), n_weeks))
+        values[codes, cube["week"].to_numpy() - first_week] = cube[measure].to_numpy()
+        keys = pd.DataFrame({"item_code": uniques // radix, "supermarket_code": uniques % radix})
+        metrics["rows_in"], metrics["rows_out"] = len(cube), len(keys)
+    return keys, first_week, values
+
+def build_promo_flags(keys, first_week, n_weeks):
+    """
+    Promotion flags aligned with the series array, for history and forecast weeks.
+
+    Args:
+        keys (pd.DataFrame): item_code and supermarket_code per series, from build_series.
+        first_week (int): Week of column 0.
+        n_weeks (int): Number of columns (history plus horizon).
+
+    Returns:
+        np.ndarray: float64 array of shape (series, n_weeks), 1 where the item was promoted in the store.
+    """
+    folder = load_config().get("processed_to", "data/clean")
+    promotions = load_df(get_processed_file_name("promotion.csv"), folder,
+                         columns=["item_code", "supermarket_code", "week"])
+    promotions = promotions[(promotions["week"] >= first_week) & (promotions["week"] < first_week + n_weeks)]
+
+    promo_stores = promotions["supermarket_code"].max() if len(promotions) else 0
+    radix = int(max(keys["supermarket_code"].max(), promo_stores)) + 1
+    index = pd.Index(series_ids(keys["item_code"], keys["supermarket_code"], radix))
+    rows = index.get_indexer(series_ids(promotions["item_code"], promotions["supermarket_code"], radix))
+    known = rows >= 0  # Promotions of pairs without sales history are not forecast
+
+    flags = np.zeros((len(keys), n_weeks))
+    flags[rows[known], promotions["week"].to_numpy()[known] - first_week] = 1.0
+    return flags
+
+def first_sale_weeks(values):
+    """
+    Column of the first week with sales of every series (0 for a series without any).
+
+    Series share the columns of the whole cube, so a pair first sold late in the
+    history has leading zeros that are not observed sales and must not be fitted.
+
+    Args:
+        values (np.ndarray): Sales, shape (series, weeks).
+
+    Returns:
+        np.ndarray: int64 array, one column index per series.
+    """
+    return (values != 0).argmax(axis=1)
+
+def fit_promo_lift(values, promo, start=None):
+    """
+    Per-series least squares fit of sales = intercept + lift * promo flag, for all series at once.
+
+    Args:
+        values (np.ndarray): Sales, shape (series, weeks).
+        promo (np.ndarray): Promotion flags of the same weeks.
+        start (np.ndarray, optional): First week (column) fitted per series. Defaults to
+                                      first_sale_weeks(values).
+
+    Returns:
+        tuple: (intercept, lift) arrays, one value per series; lift is 0 for series
+               that were always or never promoted from their first sale on.
+    """
+    start = first_sale_weeks(values) if start is None else start
+    active = np.arange(values.shape[1]) >= start[:, None]
+    n_active = active.sum(axis=1)
+    promo_mean = (promo * active).sum(axis=1) / n_active
+    values_mean = (values * active).sum(axis=1) / n_active
+    promo_centered = (promo - promo_mean[:, None]) * active
+    covariance = (promo_centered * (values - values_mean[:, None])).sum(axis=1) / n_active
+    variance = (promo_centered * promo_centered).sum(axis=1) / n_active
+    lift = np.divide(covariance, variance, out=np.zeros_like(covariance), where=variance > 0)
+    return values_mean - lift * promo_mean, lift
+
+def exponential_smoothing(values, alphas, start=None):
+    """
+    Simple exponential smoothing of every series, choosing the smoothing factor per series.
+
+    Each alpha is run on all series at once; the loop is over weeks only. A series'
+    level starts at its value in its start week and the weeks before are left out of
+    the updates and errors. The factor with the lowest sum of squared one-step-ahead
+    errors is kept for each series.
+
+    Args:
+        values (np.ndarray): Sales, shape (series, weeks).
+        alphas (list): Smoothing factors to try, each in (0, 1].
+        start (np.ndarray, optional): First week (column) of each series. Defaults to
+                                      first_sale_weeks(values).
+
+    Returns:
+        tuple: (level, alpha) arrays, one value per series; the level is the forecast for later weeks.
+    """
+    start = first_sale_weeks(values) if start is None else start
+    alphas = np.asarray(alphas, dtype=np.float64)[:, None]
+    weeks = np.ascontiguousarray(values.T)  # One contiguous row per week
+    level = np.repeat(values[None, np.arange(len(values)), start], len(alphas), axis=0)
+    sse = np.zeros_like(level)
+    for t in range(1, len(weeks)):
+        error = np.where(t > start, weeks[t] - level, 0.0)
+        sse += error * error
+        level += alphas * error
+    best = sse.argmin(axis=0)
+    return np.take_along_axis(level, best[None, :], axis=0)[0], alphas[best, 0]
+
+def forecast_shard(values, promo, horizon, method="ses_promo", alphas=None):
+    """
+    Forecast a block of series.
+
+    - "ses": the smoothed level of each series, flat over the horizon;
+    - "promo_regression": intercept + lift * promotion flag of each forecast week;
+    - "ses_promo": the smoothed level of the sales with the promotion lift removed,
+      plus the lift in promoted forecast weeks.
+
+    Every series is fitted from its first week with sales. Forecasts are clipped at 0.
+
+    Args:
+        values (np.ndarray): Sales history, shape (series, weeks).
+        promo (np.ndarray): Promotion flags, shape (series, weeks + horizon).
+        horizon (int): Weeks to forecast.
+        method (str): One of FORECAST_METHODS.
+        alphas (list, optional): Smoothing factors to try. Defaults to DEFAULT_ALPHAS.
+
+    Returns:
+        np.ndarray: Forecasts, shape (series, horizon).
+
+    Raises:
+        ValueError: If the method is unknown.
+    """
+    if method not in FORECAST_METHODS:
+        raise ValueError(f"Unknown forecast method: {method}. Choose one of {FORECAST_METHODS}")
+    n_weeks = values.shape[1]
+    history_promo, future_promo = promo[:, :n_weeks], promo[:, n_weeks:n_weeks + horizon]
+
+    with track_stage("forecast_shard", method=method) as metrics:
+        start = first_sale_weeks(values)
+        if method == "ses":
+            level, _ = exponential_smoothing(values, alphas or DEFAULT_ALPHAS, start)
+            forecast = np.repeat(level[:, None], horizon, axis=1)
+        elif method == "promo_regression":
+            intercept, lift = fit_promo_lift(values, history_promo, start)
+            forecast = intercept[:, None] + lift[:, None] * future_promo
+        else:
+            _, lift = fit_promo_lift(values, history_promo, start)
+            level, _ = exponential_smoothing(values - lift[:, None] * history_promo, alphas or DEFAULT_ALPHAS,
+                                             start)
+            forecast = level[:, None] + lift[:, None] * future_promo
+        metrics["rows_in"] = metrics["rows_out"] = len(values)
+    return np.maximum(forecast, 0.0)
+
+def forecast_sales(horizon=None, method=None, output_path=None, max_workers=None):
+    """
+    Forecast the weekly units of every (item, store) pair and save them.
+
+    Series are split into shards of 'forecast_shard_size' rows that are fitted on a
+    process pool of 'max_workers' processes (in this process if there is one shard
+    or one worker). Promotions already scheduled in the processed promotion file for
+    the forecast weeks are used by the promotion-aware methods.
+
+    Args:
+        horizon (int, optional): Weeks after the last week of sales to forecast.
+                                 Defaults to 'forecast_horizon' in config.json.
+        method (str, optional): One of FORECAST_METHODS. Defaults to 'forecast_method'.
+        output_path (str, optional): Parquet file to write. Defaults to 'forecast_path'.
+        max_workers (int, optional): Pool size. Defaults to 'max_workers', or the number of CPUs.
+
+    Returns:
+        str: Path of the forecast file, with item_code, supermarket_code, week,
+             promoted and forecast_units columns.
+    """
+    config = load_config()
+    horizon = horizon or config.get("forecast_horizon", 4)
+    method = method or config.get("forecast_method", "ses_promo")
+    alphas = list(config.get("forecast_alphas") or DEFAULT_ALPHAS)
+    shard_size = config.get("forecast_shard_size", 50000)
+    max_workers = max_workers or config.get("max_workers") or os.cpu_count()
+    output_path = output_path or get_forecast_path()
+
+    keys, first_week, values = build_series("units")
+    n_weeks = values.shape[1]
+    promo = build_promo_flags(keys, first_week, n_weeks + horizon)
+
+    shards = [(values[start:start + shard_size], promo[start:start + shard_size], horizon, method, alphas)
+              for start in range(0, len(values), shard_size)]
+    print(f"\nForecasting {len(values)} series ({n_weeks} weeks of history, {horizon} weeks ahead) "
+          f"in {len(shards)} shards with method '{method}'...")
+
+    if len(shards) == 1 or max_workers == 1:
+        forecasts = [forecast_shard(*shard) for shard in shards]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(call_with_metrics, forecast_shard, *shard) for shard in shards]
+            forecasts = []
+            for future in futures:
+                forecast, records = future.result()
+                STAGE_METRICS.extend(records)
+                forecasts.append(forecast)
+    forecast = np.concatenate(forecasts)
+
+    future_weeks = np.arange(first_week + n_weeks, first_week + n_weeks + horizon)
+    forecast_df = pd.DataFrame({
+        "item_code": np.repeat(keys["item_code"].to_numpy(), horizon),
+        "supermarket_code": np.repeat(keys["supermarket_code"].to_numpy(), horizon),
+        "week": np.tile(future_weeks, len(keys)),
+        "promoted": promo[:, n_weeks:].ravel().astype(bool),
+        "forecast_units": forecast.ravel(),
+    })
+    forecast_df.to_parquet(output_path, index=False)
+    print(f"Forecasts saved to: {output_path} ({len(forecast_df)} rows)")
+    return output_path
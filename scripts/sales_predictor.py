@@ -1,3 +1,6 @@
+import os
+import sys
+import joblib
 import pandas as pd
 import numpy as np
 from sklearn.model_selection import train_test_split
@@ -6,28 +9,107 @@ from sklearn.linear_model import LinearRegression
 from sklearn.metrics import mean_absolute_error, mean_squared_error
 from sklearn.impute import SimpleImputer
 
-from config_loader import load_config
-from file_reader import load_csv_to_df  # Import the function
+from config_loader import load_config, get_processed_file_name
+from file_reader import load_df  # Import the function
+from dimension_index import build_dimension_index, join_dimensions
+from customer_features import load_customer_table, join_customer_features, CUSTOMER_FEATURE_COLUMNS
+from metrics import track_stage
 
-def preprocess_and_train_sales_model():
-    
+# Version of the training code; bump it when the trained model would change
+# so cached models from the previous version are not reused
+TRAINER_VERSION = 2
+
+# Layout version of the saved model bundle; bump it when the bundle contents change
+BUNDLE_VERSION = 1
+
+# Label that unseen categories are encoded as
+UNKNOWN_CATEGORY = "UnknownCategory"
+
+# Item columns used by the model (item_desc and item_note are dropped after the merge)
+ITEM_COLUMNS = ["item_code", "item_type", "item_brand", "item_size", "item_uom"]
+
+# Dtypes of the columns that are label-encoded (repeated strings are read as categoricals)
+CATEGORICAL_DTYPES = ["object", "category"]
+
+# Numerical features scaled before training (EXCLUDING `transaction_amount`)
+NUMERICAL_COLS = ["quantity"]  # Add other relevant numerical features
+
+# 'province_y' is dropped when more than this share of merged rows has no value
+PROVINCE_Y_MISSING_THRESHOLD = 0.3  # 30% missing threshold
+
+def load_dimension_tables(folder):
+    """
+    Load the processed item, promotion and supermarket tables that sales rows are joined to.
+
+    The customer table is loaded too when 'use_customer_features' is set in config.json.
+
+    Args:
+        folder (str): Directory holding the processed files.
+
+    Returns:
+        tuple: (item_df, promotion_df, supermarkets_df, customer_df or None)
+    """
+    item_df = load_df(get_processed_file_name("item.csv"), folder, columns=ITEM_COLUMNS)
+    promotion_df = load_df(get_processed_file_name("promotion.csv"), folder)
+    supermarkets_df = load_df(get_processed_file_name("supermarkets.csv"), folder)
+    customer_df = load_customer_table() if load_config().get("use_customer_features", False) else None
+    return item_df, promotion_df, supermarkets_df, customer_df
+
+def merge_sales_data(sales_df, dimension_index):
+    """
+    Join sales rows to their item, promotion and supermarket attributes and drop redundant columns.
+
+    The result is the same as chained left merges on item_code, (item_code,
+    supermarket_code, week) and supermarket_code, but rows are joined by gathering
+    from the prebuilt dimension index, so the index can be reused for every chunk.
+    If the index holds a customer table, customer_id is replaced by the customer's
+    features, leaving each row's own sale out of its customer's totals.
+
+    Args:
+        sales_df (pd.DataFrame): Sales rows.
+        dimension_index (dict): Result of build_dimension_index on the dimension tables.
+
+    Returns:
+        pd.DataFrame: One row per sales row (per matching dimension row) with the joined columns.
+    """
+    # Redundant columns are left out of the join
+    with track_stage("merge") as metrics:
+        merged_df = join_dimensions(sales_df, dimension_index, drop_columns=["item_desc", "item_note", "supermarket_code"])
+        metrics["rows_in"], metrics["rows_out"] = len(sales_df), len(merged_df)
+    if dimension_index.get("customers") is not None:
+        merged_df = join_customer_features(merged_df, dimension_index["customers"], exclude_own=True)
+    return merged_df
+
+def add_time_features(df):
+    """Add approximate month and season columns derived from the week number."""
+    df["month"] = (df["week"] % 52) // 4 + 1  # Approximate month from week number
+    df["season"] = (df["month"] - 1) // 3 + 1  # 1=Winter, 2=Spring, etc.
+    return df
+
+def preprocess_and_train_sales_model(sales_filters=None):
+    """
+    Merge the processed datasets, train a Linear Regression model on transaction_amount and evaluate it.
+
+    Training uses a random sample of 'training_sample_size' rows from config.json
+    (100000 by default); see streaming_trainer for training on every row.
+
+    Args:
+        sales_filters (list, optional): (column, operator, value) tuples applied while reading
+                                        the sales file, e.g. [("week", ">=", 50)].
+
+    Returns:
+        tuple: (model, encoder_dict, scaler, feature_columns, numerical_cols)
+    """
     # Load configuration
     config = load_config()
     folder = config.get("processed_to", "data/clean")  # Default directory if not in config.json
 
-    # Load datasets using load_csv_to_df and the configured folder
-    item_df = load_csv_to_df("item_processed.csv", folder)
-    promotion_df = load_csv_to_df("promotion_processed.csv", folder)
-    sales_df = load_csv_to_df("sales_processed.csv", folder)
-    supermarkets_df = load_csv_to_df("supermarkets_processed.csv", folder)
+    # Load datasets in the configured storage format, reading only what the model needs
+    dimension_index = build_dimension_index(*load_dimension_tables(folder))
+    sales_df = load_df(get_processed_file_name("sales.csv"), folder, filters=sales_filters)
 
     # Merge datasets
-    merged_df = sales_df.merge(item_df, on="item_code", how="left") \
-                        .merge(promotion_df, on=["item_code", "supermarket_code", "week"], how="left") \
-                        .merge(supermarkets_df, on="supermarket_code", how="left")
-
-    # Drop redundant columns
-    merged_df.drop(columns=["item_desc", "item_note", "supermarket_code"], inplace=True, errors="ignore")
+    merged_df = merge_sales_data(sales_df, dimension_index)
 
    # Handle missing values
     if "item_size" in merged_df.columns:
@@ -36,19 +118,17 @@ def preprocess_and_train_sales_model():
 
     # Drop 'province_y' if too many missing values
     if "province_y" in merged_df.columns:
-        missing_threshold = 0.3  # 30% missing threshold
-        if merged_df["province_y"].isna().sum() / len(merged_df) > missing_threshold:
+        if merged_df["province_y"].isna().sum() / len(merged_df) > PROVINCE_Y_MISSING_THRESHOLD:
             merged_df.drop(columns=["province_y"], inplace=True)
 
     # Create time-based features
-    merged_df["month"] = (merged_df["week"] % 52) // 4 + 1  # Approximate month from week number
-    merged_df["season"] = (merged_df["month"] - 1) // 3 + 1  # 1=Winter, 2=Spring, etc.
+    merged_df = add_time_features(merged_df)
 
     # Define numerical columns (EXCLUDING `transaction_amount`)
-    numerical_cols = ["quantity"]  # Add other relevant numerical features
+    numerical_cols = list(NUMERICAL_COLS)
 
    # Reduce dataset size for processing
-    sample_size = min(100000, len(merged_df))  # Use the smaller value
+    sample_size = min(config.get("training_sample_size", 100000), len(merged_df))  # Use the smaller value
     sampled_df = merged_df.sample(n=sample_size, random_state=42)
 
     # Splitting data into train and test sets
@@ -56,38 +136,37 @@ def preprocess_and_train_sales_model():
     y = sampled_df["transaction_amount"]  # Target variable
 
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, shuffle=False)
-    
-    # Scale only numerical features (excluding `transaction_amount`)
-    scaler = MinMaxScaler()
-    X_train[numerical_cols] = scaler.fit_transform(X_train[numerical_cols])
-    X_test[numerical_cols] = scaler.transform(X_test[numerical_cols])
 
-    # Identify categorical columns in X_train
-    categorical_cols = X_train.select_dtypes(include=["object"]).columns
+    with track_stage("encode") as metrics:
+        metrics["rows_in"] = metrics["rows_out"] = len(X_train) + len(X_test)
+
+        # Scale only numerical features (excluding `transaction_amount`)
+        scaler = MinMaxScaler()
+        X_train[numerical_cols] = scaler.fit_transform(X_train[numerical_cols])
+        X_test[numerical_cols] = scaler.transform(X_test[numerical_cols])
+
+        # Identify categorical columns in X_train
+        categorical_cols = X_train.select_dtypes(include=CATEGORICAL_DTYPES).columns
 
-    if not categorical_cols.empty:
-        print("\nCategorical columns found:", categorical_cols)
         encoder_dict = {}  # Store encoders for each column
+        if not categorical_cols.empty:
+            print("\nCategorical columns found:", categorical_cols)
 
-        for col in categorical_cols:
-            encoder = LabelEncoder()
-            
-            # Fit on training data
-            X_train[col] = encoder.fit_transform(X_train[col].astype(str))
+            for col in categorical_cols:
+                encoder = LabelEncoder()
 
-            # Store encoder for later use
-            encoder_dict[col] = encoder
+                # Fit on training data
+                X_train[col] = encoder.fit_transform(X_train[col].astype(str))
 
-            # Handle unseen labels in test data
-            unseen_label = "UnknownCategory"
-            X_test[col] = X_test[col].astype(str).apply(lambda x: x if x in encoder.classes_ else unseen_label)
-            
-            # Refit encoder with 'UnknownCategory' added
-            updated_classes = np.array(list(encoder.classes_) + [unseen_label])
-            encoder.classes_ = updated_classes  # Ensuring NumPy array
+                # Store encoder for later use
+                encoder_dict[col] = encoder
 
-            # Transform test data safely
-            X_test[col] = encoder.transform(X_test[col])
+                # Reserve a code for labels not seen in training
+                if UNKNOWN_CATEGORY not in encoder.classes_:
+                    encoder.classes_ = np.array(list(encoder.classes_) + [UNKNOWN_CATEGORY])  # Ensuring NumPy array
+
+                # Transform test data safely, sending unseen labels to the reserved code
+                X_test[col] = encode_categories(X_test[col], build_category_index({col: encoder})[col])
 
     # Check for missing values before training
     print("\nChecking for missing values in X_train before training:")
@@ -112,7 +191,9 @@ def preprocess_and_train_sales_model():
 
     # Train a Linear Regression model
     model = LinearRegression()
-    model.fit(X_train, y_train)
+    with track_stage("fit") as metrics:
+        model.fit(X_train, y_train)
+        metrics["rows_in"] = len(X_train)
 
     # Predictions
     y_pred = model.predict(X_test)
@@ -127,20 +208,76 @@ def preprocess_and_train_sales_model():
     
     return model, encoder_dict, scaler, X_train.columns, numerical_cols # Return the trained model, encoders, and scaler
 
-def predict_sales(new_data: pd.DataFrame, model, encoder_dict, scaler, feature_columns, numerical_cols):
+def build_category_index(encoder_dict):
     """
-    Predict sales for new input data.
+    Precompute a hashed category -> code lookup for every encoder.
 
-    Parameters:
-    - new_data (pd.DataFrame): The new dataset containing feature values.
-    - model: The trained Linear Regression model.
-    - encoder_dict (dict): Dictionary of trained LabelEncoders for categorical features.
-    - scaler (MinMaxScaler): Trained scaler for numerical features.
-    - feature_columns (list): List of features used during training (X_train.columns).
+    Args:
+        encoder_dict (dict): Trained LabelEncoders keyed by column name.
 
     Returns:
-    - np.array: Predicted sales values.
+        dict: (pd.Index of the encoder classes, code reserved for unseen labels) keyed by column name.
+              The reserved code is None if the encoder has no 'UnknownCategory' class.
+    """
+    category_index = {}
+    for col, encoder in encoder_dict.items():
+        classes = pd.Index(encoder.classes_)
+        unknown_code = classes.get_loc(UNKNOWN_CATEGORY) if UNKNOWN_CATEGORY in classes else None
+        category_index[col] = (classes, unknown_code)
+    return category_index
+
+def encode_categories(values, column_index):
+    """
+    Encode a column with a trained encoder in one vectorized lookup.
+
+    Each distinct value is converted to text and looked up once; labels not seen in
+    training get the reserved 'UnknownCategory' code, matching LabelEncoder.transform.
+
+    Args:
+        values (pd.Series): Raw categorical values.
+        column_index (tuple): Entry of build_category_index for this column.
+
+    Returns:
+        np.ndarray: Integer codes, one per row.
+
+    Raises:
+        ValueError: If there are unseen labels and the encoder has no 'UnknownCategory' class.
+    """
+    classes, unknown_code = column_index
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)  # Missing values encode as 'nan', as astype(str) does
+    unique_codes = classes.get_indexer(pd.Index(uniques).astype(str))
+
+    unseen = unique_codes == -1
+    if unseen.any():
+        if unknown_code is None:
+            raise ValueError(f"y contains previously unseen labels: {list(uniques[unseen][:5])}")
+        unique_codes[unseen] = unknown_code
+
+    return unique_codes[codes]
+
+def prepare_features(new_data: pd.DataFrame, encoder_dict, scaler, feature_columns, numerical_cols,
+                     category_index=None, customer_table=None):
+    """
+    Turn new rows into the model's feature matrix, as the trainer prepared its training rows.
+
+    Customer features are joined by customer_id if the model uses them, missing feature
+    columns are filled with 0, categories are encoded (unseen labels get the
+    'UnknownCategory' code) and the numerical columns are scaled.
+
+    Args:
+        new_data (pd.DataFrame): Feature values; columns are added and replaced in place.
+        encoder_dict, scaler, feature_columns, numerical_cols: As returned by the trainer.
+        category_index (dict, optional): Lookup from build_category_index, to reuse across calls.
+        customer_table (pd.DataFrame, optional): Customer table joined on customer_id when the model
+            was trained with customer features. Defaults to the one at 'customer_features_path'.
+
+    Returns:
+        pd.DataFrame: The feature columns, in training order.
     """
+    # Look up the customer features by customer_id if the model uses them
+    if "customer_id" in new_data and any(col in CUSTOMER_FEATURE_COLUMNS for col in feature_columns):
+        new_data = join_customer_features(new_data, load_customer_table() if customer_table is None
+                                          else customer_table)
 
     # Ensure new_data has the same features as training data
     missing_cols = set(feature_columns) - set(new_data.columns)
@@ -148,23 +285,136 @@ def predict_sales(new_data: pd.DataFrame, model, encoder_dict, scaler, feature_c
         new_data[col] = 0  # Fill missing columns with default values
 
     # Encode categorical columns
+    if category_index is None:
+        category_index = build_category_index(encoder_dict)
     for col in encoder_dict:
         if col in new_data:
-            new_data[col] = new_data[col].astype(str).apply(lambda x: x if x in encoder_dict[col].classes_ else "UnknownCategory")
-            new_data[col] = encoder_dict[col].transform(new_data[col])
-    
+            new_data[col] = encode_categories(new_data[col], category_index[col])
+
     # Scale numerical features (only those used during training)
     if any(col in new_data.columns for col in numerical_cols):
         new_data[numerical_cols] = scaler.transform(new_data[numerical_cols])
 
-    # Ensure all features are numeric
-    new_data = new_data[feature_columns]  # Reorder columns to match training set
+    return new_data[feature_columns]  # Reorder columns to match training set
 
-    # Predict sales
-    predictions = model.predict(new_data)
+def predict_sales(new_data: pd.DataFrame, model, encoder_dict, scaler, feature_columns, numerical_cols,
+                  category_index=None, customer_table=None):
+    """
+    Predict sales for new input data.
+
+    Parameters:
+    - new_data (pd.DataFrame): The new dataset containing feature values.
+    - model: The trained Linear Regression model.
+    - encoder_dict (dict): Dictionary of trained LabelEncoders for categorical features.
+    - scaler (MinMaxScaler): Trained scaler for numerical features.
+    - feature_columns (list): List of features used during training (X_train.columns).
+    - category_index (dict, optional): Lookup from build_category_index, to reuse across calls.
+    - customer_table (pd.DataFrame, optional): Customer table joined on customer_id when the model
+      was trained with customer features. Defaults to the one at 'customer_features_path'.
+
+    Returns:
+    - np.array: Predicted sales values.
+    """
+
+    with track_stage("predict") as metrics:
+        metrics["rows_in"] = len(new_data)
+        features = prepare_features(new_data, encoder_dict, scaler, feature_columns, numerical_cols,
+                                    category_index, customer_table)
+
+        # Predict sales
+        predictions = model.predict(features)
+        metrics["rows_out"] = len(predictions)
 
     return predictions
 
+def save_model_bundle(bundle_path, model, encoder_dict, scaler, feature_columns, numerical_cols):
+    """
+    Save the trained components to one versioned bundle file.
+
+    The bundle is written uncompressed so its NumPy arrays (coefficients,
+    scaler ranges, encoder classes) can be memory-mapped on load.
+
+    Args:
+        bundle_path (str): File to write, e.g. 'models/sales_model.joblib'.
+        model, encoder_dict, scaler, feature_columns, numerical_cols: As returned by
+            preprocess_and_train_sales_model.
+
+    Returns:
+        str: The bundle path.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(bundle_path)), exist_ok=True)
+    bundle = {
+        "bundle_version": BUNDLE_VERSION,
+        "trainer_version": TRAINER_VERSION,
+        "model": model,
+        "encoder_dict": encoder_dict,
+        "scaler": scaler,
+        "feature_columns": list(feature_columns),
+        "numerical_cols": list(numerical_cols),
+    }
+    joblib.dump(bundle, bundle_path)
+    print(f"Model bundle saved to: {bundle_path}")
+    return bundle_path
+
+def load_model_bundle(bundle_path):
+    """
+    Load trained components saved by save_model_bundle, memory-mapping numeric arrays.
+
+    Args:
+        bundle_path (str): Bundle file to read.
+
+    Returns:
+        tuple: (model, encoder_dict, scaler, feature_columns, numerical_cols)
+
+    Raises:
+        FileNotFoundError: If the bundle does not exist.
+        ValueError: If the bundle was written with a different layout version.
+    """
+    if not os.path.exists(bundle_path):
+        raise FileNotFoundError(f"Model bundle not found: {bundle_path}")
+
+    bundle = joblib.load(bundle_path, mmap_mode="r")
+    if bundle.get("bundle_version") != BUNDLE_VERSION:
+        raise ValueError(f"Unsupported model bundle version {bundle.get('bundle_version')} in: {bundle_path}")
+
+    return (bundle["model"], bundle["encoder_dict"], bundle["scaler"],
+            bundle["feature_columns"], bundle["numerical_cols"])
+
+# Bundles already loaded by score_sales, keyed by path and modification time
+_loaded_bundles = {}
+
+def score_sales(new_data: pd.DataFrame, bundle_path=None):
+    """
+    Predict sales with a saved model bundle, without retraining.
+
+    The bundle is loaded on the first call and reused until the file changes.
+
+    Args:
+        new_data (pd.DataFrame): The new dataset containing feature values.
+        bundle_path (str, optional): Bundle file. Defaults to 'model_path' in config.json.
+
+    Returns:
+        np.array: Predicted sales values.
+    """
+    if bundle_path is None:
+        bundle_path = load_config().get("model_path", "models/sales_model.joblib")
+
+    cache_key = (os.path.abspath(bundle_path), os.stat(bundle_path).st_mtime_ns)
+    if cache_key not in _loaded_bundles:
+        _loaded_bundles.clear()
+        components = load_model_bundle(bundle_path)
+        _loaded_bundles[cache_key] = (components, build_category_index(components[1]))
+
+    components, category_index = _loaded_bundles[cache_key]
+    return predict_sales(new_data, *components, category_index=category_index)
+
 # Prevent execution on import
 if __name__ == "__main__":
-    run_sales_prediction()
\ No newline at end of file
+    # Score a CSV of new sales rows with the saved model: sales_predictor.py <input.csv> [bundle]
+    if len(sys.argv) < 2:
+        print("Usage: python scripts/sales_predictor.py <input.csv> [model_bundle]")
+        sys.exit(1)
+    new_sales_data = pd.read_csv(sys.argv[1])
+    predictions = score_sales(new_sales_data, sys.argv[2] if len(sys.argv) > 2 else None)
+    for prediction in predictions:
+        print(f"{prediction:.2f}")
\ No newline at end of file
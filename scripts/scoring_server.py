@@ -0,0 +1,357 @@
+import json
+import time
+import asyncio
+from collections import deque
+import numpy as np
+import pandas as pd
+
+from config_loader import load_config
+from sales_predictor import load_model_bundle, prepare_features, build_category_index
+from customer_features import load_customer_table, CUSTOMER_FEATURE_COLUMNS
+
+# Latencies kept for the percentile report; older requests drop out of the window
+LATENCY_WINDOW = 10000
+
+# Largest request body accepted, in bytes
+MAX_BODY_BYTES = 1024 * 1024
+
+HTTP_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+                500: "Internal Server Error"}
+
+class BatchScorer:
+    """
+    Scores lists of row dicts with the trained components.
+
+    Rows go through the same prepare_features transform as predict_sales, with the
+    category lookup and customer table loaded once, so server and batch predictions
+    agree on the same rows. Rows with the same fields are scored together in one
+    DataFrame: a field missing from a row is then filled like predict_sales fills a
+    missing column. Unlike predict_sales, a batch records no stage metrics, so a
+    long-running server does not accumulate them.
+    """
+
+    def __init__(self, model, encoder_dict, scaler, feature_columns, numerical_cols, customer_table=None):
+        self.model = model
+        self.encoder_dict = encoder_dict
+        self.scaler = scaler
+        self.feature_columns = list(feature_columns)
+        self.numerical_cols = list(numerical_cols)
+        self.category_index = build_category_index(encoder_dict)
+        self.customer_table = None
+        if any(col in CUSTOMER_FEATURE_COLUMNS for col in self.feature_columns):
+            self.customer_table = load_customer_table() if customer_table is None else customer_table
+
+    def score(self, rows):
+        """
+        Predict sales for a list of rows.
+
+        Args:
+            rows (list): Dicts of feature values, e.g. {"item_code": 3000005040, "quantity": 2, ...}.
+
+        Returns:
+            np.ndarray: Predicted sales values, one per row.
+
+        Raises:
+            ValueError: If a value is not numeric or a category is unseen and cannot be encoded.
+        """
+        groups = {}
+        for position, row in enumerate(rows):
+            groups.setdefault(frozenset(row), []).append(position)
+
+        predictions = np.empty(len(rows))
+        for positions in groups.values():
+            group = [rows[i] for i in positions]
+            try:
+                features = prepare_features(pd.DataFrame(group), self.encoder_dict, self.scaler,
+                                            self.feature_columns, self.numerical_cols, self.category_index,
+                                            self.customer_table)
+                predictions[positions] = self.model.predict(features.astype(np.float64))
+            except (TypeError, ValueError):
+                self.check_numbers(group)
+                raise
+        return predictions
+
+    def check_numbers(self, rows):
+        """Raise a ValueError naming the first non-categorical feature of rows that is not a number."""
+        for col in self.feature_columns:
+            if col in self.encoder_dict:
+                continue
+            for row in rows:
+                if not is_number(row.get(col, 0)):
+                    raise ValueError(f"'{col}' must be a number, got {row[col]!r}")
+
+def is_number(value):
+    """Whether float() accepts value, as NumPy does when building a float array."""
+    try:
+        float(value)
+    except (TypeError, ValueError):
+        return False
+    return True
+
+class MicroBatcher:
+    """
+    Collects rows submitted by concurrent requests and scores them together.
+
+    A batch is scored as soon as it holds max_batch_size rows, or max_wait seconds
+    after its first row arrived, whichever comes first. If a batch fails, its rows
+    are scored one by one so only the invalid rows fail.
+    """
+
+    def __init__(self, score_batch, max_batch_size=64, max_wait=0.0005):
+        self.score_batch = score_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.queue = asyncio.Queue()
+        self.batches = 0
+        self.batched_rows = 0
+
+    async def submit(self, row):
+        """Queue one row and wait for its prediction."""
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((row, future))
+        return await future
+
+    async def next_batch(self):
+        """Wait for a row, then gather more until the batch is full or the wait is over."""
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            if not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def run(self):
+        """Score batches until cancelled."""
+        while True:
+            batch = await self.next_batch()
+            self.batches += 1
+            self.batched_rows += len(batch)
+            try:
+                predictions = self.score_batch([row for row, _ in batch])
+                outcomes = [(prediction, None) for prediction in predictions]
+            except Exception:
+                outcomes = []
+                for row, _ in batch:
+                    try:
+                        outcomes.append((self.score_batch([row])[0], None))
+                    except Exception as e:
+                        outcomes.append((None, e))
+            for (_, future), (prediction, error) in zip(batch, outcomes):
+                if future.done():  # The client disconnected
+                    continue
+                if error is None:
+                    future.set_result(float(prediction))
+                else:
+                    future.set_exception(error)
+
+class LatencyTracker:
+    """Request counts and a sliding window of request latencies."""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.latencies = deque(maxlen=window)
+        self.requests = 0
+        self.errors = 0
+
+    def record(self, seconds, failed=False):
+        """Add one finished request."""
+        self.latencies.append(seconds)
+        self.requests += 1
+        self.errors += failed
+
+    def report(self):
+        """
+        Latency percentiles of the recent requests, in milliseconds.
+
+        Returns:
+            dict: {"requests", "errors", "window", "latency_ms": {"p50", "p90", "p99", "max"}}
+        """
+        latency_ms = {}
+        if self.latencies:
+            values = np.fromiter(self.latencies, dtype=np.float64, count=len(self.latencies)) * 1000
+            p50, p90, p99 = np.percentile(values, [50, 90, 99])
+            latency_ms = {"p50": round(p50, 3), "p90": round(p90, 3), "p99": round(p99, 3),
+                          "max": round(values.max(), 3)}
+        return {"requests": self.requests, "errors": self.errors, "window": len(self.latencies),
+                "latency_ms": latency_ms}
+
+def encode_response(status, payload, keep_alive=True):
+    """Bytes of an HTTP/1.1 response with a JSON body."""
+    body = json.dumps(payload).encode()
+    head = (f"HTTP/1.1 {status} {HTTP_REASONS[status]}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode() + body
+
+async def read_request(reader):
+    """
+    Read one HTTP request from the connection.
+
+    Returns:
+        tuple: (method, path, headers, body), or None when the client closed the connection.
+
+    Raises:
+        ValueError: If the request is malformed or its body is too large.
+    """
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError:
+        return None
+    except asyncio.LimitOverrunError:
+        raise ValueError("Request headers too large")
+
+    lines = head.decode("latin-1").split("\r\n")
+    try:
+        method, path, _ = lines[0].split(" ", 2)
+    except ValueError:
+        raise ValueError(f"Malformed request line: {lines[0]!r}")
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+
+    length = int(headers.get("content-length", 0))  # Raises ValueError if not a number
+    if length > MAX_BODY_BYTES:
+        raise ValueError(f"Request body larger than {MAX_BODY_BYTES} bytes")
+    body = await reader.readexactly(length) if length else b""
+    return method, path, headers, body
+
+class ScoringServer:
+    """
+    HTTP scoring service around the trained sales model.
+
+    Endpoints:
+        POST /predict  Body is one row object, answered with {"predicted_sales": x},
+                       or a list of rows, answered with {"predicted_sales": [x, ...]}.
+        GET /metrics   Request counts, latency percentiles and average batch size.
+        GET /health    {"status": "ok"}
+    """
+
+    def __init__(self, scorer, max_batch_size=64, max_wait=0.0005):
+        self.batcher = MicroBatcher(scorer.score, max_batch_size, max_wait)
+        self.latency = LatencyTracker()
+
+    async def predict(self, body):
+        """Status and payload of a /predict request."""
+        try:
+            payload = json.loads(body)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return 400, {"error": "Body must be JSON"}
+
+        rows = payload if isinstance(payload, list) else [payload]
+        if not rows or not all(isinstance(row, dict) for row in rows):
+            return 400, {"error": "Body must be a row object or a non-empty list of row objects"}
+        try:
+            predictions = await asyncio.gather(*(self.batcher.submit(row) for row in rows))
+        except ValueError as e:
+            return 400, {"error": str(e)}
+        return 200, {"predicted_sales": predictions if isinstance(payload, list) else predictions[0]}
+
+    def metrics(self):
+        """Payload of a /metrics request."""
+        report = self.latency.report()
+        report["batches"] = self.batcher.batches
+        report["mean_batch_size"] = (round(self.batcher.batched_rows / self.batcher.batches, 2)
+                                     if self.batcher.batches else None)
+        return report
+
+    async def dispatch(self, method, path, body):
+        """Status and payload for one request."""
+        if path == "/predict":
+            if method != "POST":
+                return 405, {"error": "Use POST"}
+            return await self.predict(body)
+        if path == "/metrics":
+            return 200, self.metrics()
+        if path == "/health":
+            return 200, {"status": "ok"}
+        return 404, {"error": f"Unknown path: {path}"}
+
+    async def handle_connection(self, reader, writer):
+        """Serve requests on one keep-alive connection until the client closes it."""
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except (ValueError, asyncio.IncompleteReadError) as e:
+                    writer.write(encode_response(400, {"error": str(e) or "Incomplete request"}, keep_alive=False))
+                    break
+                if request is None:
+                    break
+
+                started = time.perf_counter()
+                method, path, headers, body = request
+                try:
+                    status, payload = await self.dispatch(method, path, body)
+                except Exception as e:
+                    status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+                keep_alive = headers.get("connection", "").lower() != "close"
+                writer.write(encode_response(status, payload, keep_alive))
+                if path == "/predict":
+                    self.latency.record(time.perf_counter() - started, failed=status != 200)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host, port, ready=None):
+        """
+        Accept connections until cancelled, then print the latency report.
+
+        Args:
+            host (str): Interface to listen on.
+            port (int): Port to listen on; 0 picks a free one.
+            ready (asyncio.Future, optional): Resolved with the bound port once listening.
+        """
+        batch_task = asyncio.create_task(self.batcher.run())
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        bound_port = server.sockets[0].getsockname()[1]
+        print(f"Scoring server listening on http://{host}:{bound_port}")
+        if ready is not None:
+            ready.set_result(bound_port)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batch_task.cancel()
+            print(f"Scoring server stopped: {json.dumps(self.metrics())}")
+
+def serve(host=None, port=None, model_path=None, max_batch_size=None, max_wait_ms=None):
+    """
+    Load the model bundle once and serve predictions over HTTP until interrupted.
+
+    Args:
+        host (str, optional): Defaults to 'serve_host' in config.json.
+        port (int, optional): Defaults to 'serve_port' in config.json.
+        model_path (str, optional): Bundle file. Defaults to 'model_path' in config.json.
+        max_batch_size (int, optional): Rows per batch. Defaults to 'serve_max_batch_size' in config.json.
+        max_wait_ms (float, optional): Longest wait for a batch to fill. Defaults to 'serve_max_wait_ms'.
+    """
+    config = load_config()
+    host = host or config.get("serve_host", "127.0.0.1")
+    port = config.get("serve_port", 8080) if port is None else port
+    model_path = model_path or config.get("model_path", "models/sales_model.joblib")
+    max_batch_size = max_batch_size or config.get("serve_max_batch_size", 64)
+    max_wait_ms = config.get("serve_max_wait_ms", 0.5) if max_wait_ms is None else max_wait_ms
+
+    server = ScoringServer(BatchScorer(*load_model_bundle(model_path)), max_batch_size, max_wait_ms / 1000)
+    try:
+        asyncio.run(server.serve(host, port))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    serve()
@@ -0,0 +1,270 @@
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import MinMaxScaler, LabelEncoder
+from sklearn.linear_model import Ridge
+from sklearn.metrics import mean_absolute_error, mean_squared_error
+
+from config_loader import load_config, get_processed_file_name
+from file_reader import load_df
+from dimension_index import build_dimension_index
+from metrics import track_stage
+from sales_predictor import (load_dimension_tables, merge_sales_data, add_time_features, build_category_index,
+                             encode_categories, UNKNOWN_CATEGORY, CATEGORICAL_DTYPES, NUMERICAL_COLS,
+                             PROVINCE_Y_MISSING_THRESHOLD)
+
+# Numeric columns one-hot encoded by value instead of used as a magnitude
+VALUE_ONEHOT_COLUMNS = ["province_x", "province_y"]
+
+# High-cardinality identifiers hashed into 'sparse_hash_buckets' columns each
+HASHED_COLUMNS = ["item_code", "customer_id"]
+
+def hash_buckets(values, n_buckets):
+    """
+    Bucket of each integer id, stable across processes and platforms (splitmix64 finalizer).
+
+    Args:
+        values (np.ndarray): Integer ids (floats holding integers are accepted; NaN hashes as -1).
+        n_buckets (int): Number of buckets.
+
+    Returns:
+        np.ndarray: Bucket per value, in [0, n_buckets).
+    """
+    values = np.asarray(values)
+    if values.dtype.kind == "f":
+        values = np.where(np.isnan(values), -1, values)
+    z = values.astype(np.int64).view(np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    z = z ^ (z >> np.uint64(31))
+    return (z % np.uint64(n_buckets)).astype(np.int64)
+
+class SparseLinearModel:
+    """
+    Ridge regression on a sparse expansion of the encoded features.
+
+    It is a drop-in model for the (model, encoder_dict, scaler, feature_columns,
+    numerical_cols) bundle: predict takes the same encoded features as the dense
+    model (category codes from the label encoders, scaled numerical_cols, raw
+    numerics) and expands them into a CSR matrix with one stored value per feature:
+    - label-encoded categoricals and VALUE_ONEHOT_COLUMNS: one-hot, one column per
+      code or training value (plus one for unseen values);
+    - HASHED_COLUMNS: one-hot over hash_buckets hashed columns;
+    - other numerics: min-max scaled, missing values filled with the training median.
+    """
+
+    def __init__(self, feature_columns, category_sizes, hash_buckets_per_column=65536, alpha=1.0):
+        """
+        Args:
+            feature_columns (list): Encoded feature columns, in the order predict receives them.
+            category_sizes (dict): Number of codes of each label-encoded column, keyed by column.
+            hash_buckets_per_column (int): Hashed columns per HASHED_COLUMNS feature.
+            alpha (float): Ridge penalty; one-hot blocks are collinear with the intercept, so
+                           a small penalty keeps the fit well-posed.
+        """
+        self.feature_columns = list(feature_columns)
+        self.category_sizes = dict(category_sizes)
+        self.hash_buckets = hash_buckets_per_column
+        self.value_vocab = {}  # Sorted training values of the VALUE_ONEHOT_COLUMNS
+        self.numeric_stats = {}  # (median, min, scale) of the scaled numeric columns
+        self.regressor = Ridge(alpha=alpha, solver="lsqr")  # lsqr fits CSR input without densifying
+
+    def kind(self, col):
+        """How a feature column is expanded: 'code', 'value', 'hash' or 'numeric'."""
+        if col in self.category_sizes:
+            return "code"
+        if col in VALUE_ONEHOT_COLUMNS:
+            return "value"
+        if col in HASHED_COLUMNS:
+            return "hash"
+        return "numeric"
+
+    def layout(self):
+        """(column, kind, first matrix column, width) per feature column, plus the total width."""
+        blocks, offset = [], 0
+        for col in self.feature_columns:
+            kind = self.kind(col)
+            if kind == "code":
+                width = self.category_sizes[col]
+            elif kind == "value":
+                width = len(self.value_vocab[col]) + 1
+            elif kind == "hash":
+                width = self.hash_buckets
+            else:
+                width = 1
+            blocks.append((col, kind, offset, width))
+            offset += width
+        return blocks, offset
+
+    def fit_statistics(self, columns):
+        """Learn the value vocabularies and the numeric medians and ranges from the training columns."""
+        for col in self.feature_columns:
+            kind = self.kind(col)
+            if kind == "value":
+                values = columns[col]
+                self.value_vocab[col] = np.unique(values[~np.isnan(values)])
+            elif kind == "numeric":
+                values = columns[col]
+                known = values[~np.isnan(values)]
+                median = float(np.median(known)) if len(known) else 0.0
+                low, high = (float(known.min()), float(known.max())) if len(known) else (0.0, 0.0)
+                self.numeric_stats[col] = (median, low, 1.0 / (high - low) if high > low else 1.0)
+
+    def design_matrix(self, columns, n_rows):
+        """
+        Build the CSR design matrix in one pass over the feature columns.
+
+        Every row stores exactly one value per feature column, so the indices and data
+        arrays are filled column by column and indptr is a fixed stride.
+
+        Args:
+            columns (Mapping): 1-D NumPy array per feature column.
+            n_rows (int): Number of rows.
+
+        Returns:
+            scipy.sparse.csr_matrix: n_rows x total width.
+        """
+        blocks, width = self.layout()
+        indices = np.empty((n_rows, len(blocks)), dtype=np.int32)
+        data = np.ones((n_rows, len(blocks)))
+        for j, (col, kind, offset, size) in enumerate(blocks):
+            values = columns[col]
+            if kind == "code":
+                indices[:, j] = offset + np.asarray(values, dtype=np.int64)
+            elif kind == "value":
+                vocab = self.value_vocab[col]
+                position = np.searchsorted(vocab, values)
+                known = position < len(vocab)
+                known[known] = vocab[position[known]] == values[known]
+                indices[:, j] = offset + np.where(known, position, len(vocab))  # Last column: unseen or missing
+            elif kind == "hash":
+                indices[:, j] = offset + hash_buckets(values, size)
+            else:
+                median, low, scale = self.numeric_stats[col]
+                indices[:, j] = offset
+                data[:, j] = (np.where(np.isnan(values), median, values) - low) * scale
+        indptr = np.arange(0, n_rows * len(blocks) + 1, len(blocks), dtype=np.int64)
+        return sp.csr_matrix((data.ravel(), indices.ravel(), indptr), shape=(n_rows, width))
+
+    def feature_matrix(self, X):
+        """CSR design matrix of encoded features given as a DataFrame or a 2-D array in feature_columns order."""
+        if isinstance(X, pd.DataFrame):
+            columns = {col: X[col].to_numpy(dtype=np.float64) for col in self.feature_columns}
+        else:
+            X = np.asarray(X, dtype=np.float64)
+            columns = {col: X[:, j] for j, col in enumerate(self.feature_columns)}
+        return self.design_matrix(columns, len(X))
+
+    def fit(self, columns, y):
+        """Fit on a mapping of encoded training columns; returns self."""
+        self.fit_statistics(columns)
+        self.regressor.fit(self.design_matrix(columns, len(y)), y)
+        return self
+
+    def predict(self, X):
+        """Predict from encoded features, as LinearRegression.predict does for the dense model."""
+        return self.regressor.predict(self.feature_matrix(X))
+
+def fit_label_encoders(df):
+    """
+    Fit a LabelEncoder, with the reserved 'UnknownCategory' class, for every categorical column.
+
+    Only the distinct values are converted to text, so this costs one factorize per column.
+
+    Returns:
+        dict: Trained LabelEncoders keyed by column name.
+    """
+    encoder_dict = {}
+    for col in df.select_dtypes(include=CATEGORICAL_DTYPES).columns:
+        _, uniques = pd.factorize(df[col], use_na_sentinel=False)
+        encoder = LabelEncoder().fit(pd.Index(uniques).astype(str))
+        encoder.classes_ = np.array(list(encoder.classes_) + [UNKNOWN_CATEGORY])
+        encoder_dict[col] = encoder
+    return encoder_dict
+
+def encode_columns(df, feature_columns, encoder_dict, category_index, scaler, numerical_cols):
+    """
+    Encode merged rows column by column, without building a dense feature frame.
+
+    Returns:
+        dict: 1-D array per feature column: codes for encoded columns, floats otherwise.
+    """
+    columns = {}
+    for col in feature_columns:
+        if col in encoder_dict:
+            columns[col] = encode_categories(df[col], category_index[col])
+        elif col in df.columns:
+            columns[col] = df[col].to_numpy(dtype=np.float64, na_value=np.nan)
+        else:
+            columns[col] = np.zeros(len(df))
+    if numerical_cols:
+        scaled = scaler.transform(pd.DataFrame({col: columns[col] for col in numerical_cols}))
+        for i, col in enumerate(numerical_cols):
+            columns[col] = scaled[:, i]
+    return columns
+
+def preprocess_and_train_sales_model_sparse(sales_filters=None):
+    """
+    Train a ridge regression on a sparse one-hot / hashed design matrix.
+
+    Rows are merged, sampled and split as in preprocess_and_train_sales_model, but
+    categoricals are one-hot encoded and item_code and customer_id are hashed
+    instead of used as ordinal codes, and the regression is fitted on the CSR matrix
+    directly: no dense imputed copy of the features is made.
+
+    Args:
+        sales_filters (list, optional): (column, operator, value) tuples applied while reading
+                                        the sales file, e.g. [("week", ">=", 50)].
+
+    Returns:
+        tuple: (model, encoder_dict, scaler, feature_columns, numerical_cols), usable with
+               predict_sales and save_model_bundle like the dense model.
+    """
+    config = load_config()
+    folder = config.get("processed_to", "data/clean")
+    hash_buckets_per_column = config.get("sparse_hash_buckets", 65536)
+    alpha = config.get("sparse_alpha", 1.0)
+
+    dimension_index = build_dimension_index(*load_dimension_tables(folder))
+    sales_df = load_df(get_processed_file_name("sales.csv"), folder, filters=sales_filters)
+    merged_df = add_time_features(merge_sales_data(sales_df, dimension_index))
+
+    if "province_y" in merged_df.columns:
+        if merged_df["province_y"].isna().sum() / len(merged_df) > PROVINCE_Y_MISSING_THRESHOLD:
+            merged_df.drop(columns=["province_y"], inplace=True)
+
+    numerical_cols = list(NUMERICAL_COLS)
+    sample_size = min(config.get("training_sample_size", 100000), len(merged_df))
+    sampled_df = merged_df.sample(n=sample_size, random_state=42)
+    X = sampled_df.drop(columns=["transaction_amount"], errors="ignore")
+    y = sampled_df["transaction_amount"]
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, shuffle=False)
+    feature_columns = list(X_train.columns)
+
+    with track_stage("encode") as metrics:
+        metrics["rows_in"] = metrics["rows_out"] = len(X_train) + len(X_test)
+
+        scaler = MinMaxScaler().fit(X_train[numerical_cols])
+        encoder_dict = fit_label_encoders(X_train)
+        print("\nCategorical columns found:", list(encoder_dict))
+
+        category_index = build_category_index(encoder_dict)
+        train_columns = encode_columns(X_train, feature_columns, encoder_dict, category_index, scaler, numerical_cols)
+        test_columns = encode_columns(X_test, feature_columns, encoder_dict, category_index, scaler, numerical_cols)
+
+    model = SparseLinearModel(feature_columns, {col: len(encoder.classes_) for col, encoder in encoder_dict.items()},
+                              hash_buckets_per_column, alpha)
+    with track_stage("fit") as metrics:
+        model.fit(train_columns, y_train.to_numpy())
+        metrics["rows_in"] = len(X_train)
+    print(f"\nSparse design matrix: {model.layout()[1]} columns, {len(feature_columns)} values per row")
+
+    y_pred = model.regressor.predict(model.design_matrix(test_columns, len(X_test)))
+    mae = mean_absolute_error(y_test, y_pred)
+    rmse = mean_squared_error(y_test, y_pred) ** 0.5
+
+    print("Training complete.")
+    print(f"Model Evaluation:\nMAE: {mae:.4f}\nRMSE: {rmse:.4f}")
+
+    return model, encoder_dict, scaler, feature_columns, numerical_cols
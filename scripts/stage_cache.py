@@ -0,0 +1,181 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+from config_loader import load_config
+
+# Config keys that change the output of each stage (and therefore its cache key)
+STAGE_CONFIG_KEYS = {
+    "clean": ["file_suffix", "storage_format", "parquet_compression", "validation_enabled"],
+    "train": ["file_suffix", "storage_format", "training_mode", "training_sample_size",
+              "sparse_hash_buckets", "sparse_alpha", "search_candidates", "search_folds", "search_time_budget",
+              "use_customer_features"],
+}
+
+def get_cache_dir():
+    """Retrieve the cache directory from config.json, creating it if needed."""
+    config = load_config()
+    cache_dir = os.path.normpath(config.get("cache_dir", "data/cache"))
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+def load_manifest():
+    """
+    Load the cache manifest, which records every cached artifact and known file hashes.
+
+    Returns:
+        dict: {"entries": {key: entry}, "file_hashes": {path: {...}}}
+    """
+    manifest_path = os.path.join(get_cache_dir(), "manifest.json")
+    if not os.path.exists(manifest_path):
+        return {"entries": {}, "file_hashes": {}}
+    try:
+        with open(manifest_path, "r") as f:
+            return json.load(f)
+    except json.JSONDecodeError:
+        print(f"Cache manifest is corrupt, starting a new one: {manifest_path}")
+        return {"entries": {}, "file_hashes": {}}
+
+def save_manifest(manifest):
+    """Write the cache manifest atomically."""
+    manifest_path = os.path.join(get_cache_dir(), "manifest.json")
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+def hash_file(file_path, manifest=None):
+    """
+    Compute the SHA-256 of a file's content.
+
+    When a manifest is given, the hash is reused as long as the file's size and
+    modification time are unchanged, so unchanged multi-GB inputs are not re-read.
+
+    Args:
+        file_path (str): File to hash.
+        manifest (dict, optional): Cache manifest holding previously computed hashes.
+
+    Returns:
+        str: Hex digest of the file content.
+    """
+    stat = os.stat(file_path)
+    abs_path = os.path.abspath(file_path)
+    known = manifest["file_hashes"].get(abs_path) if manifest else None
+    if known and known["size"] == stat.st_size and known["mtime_ns"] == stat.st_mtime_ns:
+        return known["sha256"]
+
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+
+    if manifest is not None:
+        manifest["file_hashes"][abs_path] = {
+            "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest.hexdigest()
+        }
+    return digest.hexdigest()
+
+def make_stage_key(stage, input_paths, version, manifest=None):
+    """
+    Build the cache key of a stage run.
+
+    Args:
+        stage (str): Stage name, a key of STAGE_CONFIG_KEYS.
+        input_paths (list): Files the stage reads.
+        version: Version of the code that produces the output, e.g. CLEANING_FUNCTION_VERSIONS entry.
+        manifest (dict, optional): Cache manifest used to reuse file hashes.
+
+    Returns:
+        str: Hex digest identifying the stage inputs, code version and relevant config.
+    """
+    config = load_config()
+    key_data = {
+        "stage": stage,
+        "inputs": [hash_file(path, manifest) for path in input_paths],
+        "version": version,
+        "config": {key: config.get(key) for key in STAGE_CONFIG_KEYS.get(stage, [])},
+    }
+    return hashlib.sha256(json.dumps(key_data, sort_keys=True).encode()).hexdigest()
+
+def fetch_artifact(key, target_path, manifest):
+    """
+    Restore a cached artifact to target_path if the key is in the cache.
+
+    The copy is skipped when target_path still holds the output the artifact was stored from.
+
+    Args:
+        key (str): Stage key from make_stage_key.
+        target_path (str): Where the stage would have written its output.
+        manifest (dict): Cache manifest.
+
+    Returns:
+        bool: True on a cache hit, False otherwise.
+    """
+    entry = manifest["entries"].get(key)
+    if not entry:
+        return False
+
+    artifact_path = os.path.join(get_cache_dir(), entry["artifact"])
+    if not os.path.exists(artifact_path):
+        del manifest["entries"][key]
+        return False
+
+    target_unchanged = (os.path.exists(target_path)
+                        and os.path.getsize(target_path) == entry["size"]
+                        and os.stat(target_path).st_mtime_ns == entry.get("target_mtime_ns"))
+    if not target_unchanged:
+        os.makedirs(os.path.dirname(os.path.abspath(target_path)), exist_ok=True)
+        shutil.copyfile(artifact_path, target_path)
+        entry["target_mtime_ns"] = os.stat(target_path).st_mtime_ns
+
+    entry["last_used"] = time.time()
+    print(f"Cache hit for {entry['stage']} stage, reused: {target_path}")
+    return True
+
+def store_artifact(key, stage, source_path, manifest):
+    """
+    Copy a stage output into the cache under its key, then evict old artifacts if over budget.
+
+    Args:
+        key (str): Stage key from make_stage_key.
+        stage (str): Stage name.
+        source_path (str): Output file the stage wrote.
+        manifest (dict): Cache manifest.
+    """
+    _, ext = os.path.splitext(source_path)
+    artifact = f"{key}{ext}"
+    shutil.copyfile(source_path, os.path.join(get_cache_dir(), artifact))
+
+    manifest["entries"][key] = {
+        "stage": stage,
+        "artifact": artifact,
+        "source": os.path.abspath(source_path),
+        "size": os.path.getsize(source_path),
+        "target_mtime_ns": os.stat(source_path).st_mtime_ns,
+        "last_used": time.time(),
+    }
+    evict_artifacts(manifest)
+
+def evict_artifacts(manifest, max_bytes=None):
+    """
+    Delete least recently used artifacts until the cache fits in 'cache_max_bytes' from config.json.
+
+    Args:
+        manifest (dict): Cache manifest.
+        max_bytes (int, optional): Size budget. Defaults to 'cache_max_bytes' in config.json.
+    """
+    if max_bytes is None:
+        max_bytes = load_config().get("cache_max_bytes", 10 * 1024 ** 3)
+
+    entries = manifest["entries"]
+    total_bytes = sum(entry["size"] for entry in entries.values())
+    for key in sorted(entries, key=lambda k: entries[k]["last_used"]):
+        if total_bytes <= max_bytes:
+            break
+        entry = entries.pop(key)
+        artifact_path = os.path.join(get_cache_dir(), entry["artifact"])
+        if os.path.exists(artifact_path):
+            os.remove(artifact_path)
+        total_bytes -= entry["size"]
+        print(f"Evicted cached {entry['stage']} artifact: {entry['artifact']}")
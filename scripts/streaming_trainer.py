@@ -0,0 +1,245 @@
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import MinMaxScaler, LabelEncoder
+from sklearn.linear_model import LinearRegression
+
+from config_loader import load_config, get_processed_file_name
+from file_reader import iter_df_chunks
+from dimension_index import build_dimension_index
+from metrics import track_stage
+from sales_predictor import (load_dimension_tables, merge_sales_data, add_time_features, build_category_index,
+                             encode_categories, CATEGORICAL_DTYPES, NUMERICAL_COLS, PROVINCE_Y_MISSING_THRESHOLD,
+                             UNKNOWN_CATEGORY)
+
+# Every TEST_EVERY-th merged row is held out for evaluation (20% like the sampled split)
+TEST_EVERY = 5
+
+class StreamingLinearRegression:
+    """
+    Ordinary least squares fitted from sufficient statistics accumulated chunk by chunk.
+
+    Only the feature sums, X'X and X'y are kept, so memory depends on the number
+    of features, not rows. The statistics are standardized before solving, so
+    columns of very different scales (item codes around 1e9 next to quantities)
+    keep their coefficients. The result matches LinearRegression fitted on all
+    rows at once, including the minimum-norm solution for collinear features.
+    """
+
+    def __init__(self):
+        self.n_rows = 0
+        self.shift = None  # Centering offset taken from the first chunk, for numerical stability
+
+    def partial_fit(self, X, y):
+        """Add a chunk of rows (X: 2-D float array, y: 1-D array) to the statistics."""
+        X = np.asarray(X, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        if len(y) == 0:
+            return self
+
+        if self.shift is None:
+            self.shift = X.mean(axis=0)
+            self.y_shift = y.mean()
+            n_features = X.shape[1]
+            self.sum_x = np.zeros(n_features)
+            self.sum_y = 0.0
+            self.xtx = np.zeros((n_features, n_features))
+            self.xty = np.zeros(n_features)
+
+        Xs = X - self.shift
+        ys = y - self.y_shift
+        self.n_rows += len(ys)
+        self.sum_x += Xs.sum(axis=0)
+        self.sum_y += ys.sum()
+        self.xtx += Xs.T @ Xs
+        self.xty += Xs.T @ ys
+        return self
+
+    def to_model(self, feature_columns):
+        """
+        Solve the normal equations and return an equivalent fitted LinearRegression.
+
+        Args:
+            feature_columns (list): Feature names, in column order.
+
+        Returns:
+            LinearRegression: Model with coef_ and intercept_ set.
+        """
+        if self.n_rows == 0:
+            raise ValueError("No training rows were streamed")
+
+        mean_x = self.sum_x / self.n_rows
+        mean_y = self.sum_y / self.n_rows
+        centered_xtx = self.xtx - self.n_rows * np.outer(mean_x, mean_x)
+        centered_xty = self.xty - self.n_rows * mean_x * mean_y
+
+        # Solve on the correlation matrix: X'X itself squares the condition number of X, and
+        # its rank cut-off would drop every small-scale column next to an item_code-scale one
+        scale = np.sqrt(np.clip(np.diag(centered_xtx), 0, None))
+        scale[scale == 0] = 1.0  # Constant columns
+        eigvals, eigvecs = np.linalg.eigh(centered_xtx / np.outer(scale, scale))
+        keep = eigvals > eigvals.max() * len(eigvals) * np.finfo(np.float64).eps
+        coef = eigvecs[:, keep] @ ((eigvecs[:, keep].T @ (centered_xty / scale)) / eigvals[keep]) / scale
+
+        # Collinear columns leave a null space; remove it in the original units for the minimum-norm solution
+        null_space = eigvecs[:, ~keep] / scale[:, None]
+        if null_space.shape[1]:
+            coef -= null_space @ np.linalg.lstsq(null_space, coef, rcond=None)[0]
+
+        model = LinearRegression()
+        model.coef_ = coef
+        model.intercept_ = (self.y_shift + mean_y) - (self.shift + mean_x) @ coef
+        model.n_features_in_ = len(feature_columns)
+        model.feature_names_in_ = np.array(feature_columns, dtype=object)
+        return model
+
+def median_from_counts(counts):
+    """Median of the values described by a value -> count Series, as np.median would compute it."""
+    counts = counts.sort_index()
+    cumulative = counts.cumsum().to_numpy()
+    total = cumulative[-1]
+    values = counts.index.to_numpy(dtype=np.float64)
+    lower = values[np.searchsorted(cumulative, (total - 1) // 2 + 1)]
+    upper = values[np.searchsorted(cumulative, total // 2 + 1)]
+    return (lower + upper) / 2
+
+def preprocess_and_train_sales_model_streaming(sales_filters=None, chunk_size=None):
+    """
+    Train the sales model on every row of the processed sales file with bounded memory.
+
+    The sales file is streamed in chunks and each chunk is merged with the
+    (small) dimension tables. Preprocessing mirrors preprocess_and_train_sales_model:
+    a first pass gathers the item_size mode, the province_y missing rate, the
+    scaler range and the encoder classes; a second pass (only if needed) finds
+    the medians used to fill missing numeric values; a third pass accumulates
+    the regression statistics and a fourth evaluates on the held-out rows.
+    Every 5th merged row is held out for evaluation instead of a random sample.
+
+    Args:
+        sales_filters (list, optional): (column, operator, value) tuples applied while reading
+                                        the sales file, e.g. [("week", ">=", 50)].
+        chunk_size (int, optional): Rows per chunk. Defaults to 'training_chunk_size'
+                                    (or 'chunk_size') in config.json.
+
+    Returns:
+        tuple: (model, encoder_dict, scaler, feature_columns, numerical_cols)
+    """
+    config = load_config()
+    folder = config.get("processed_to", "data/clean")
+    chunk_size = chunk_size or config.get("training_chunk_size") or config.get("chunk_size", 1000000)
+
+    dimension_index = build_dimension_index(*load_dimension_tables(folder))  # Built once, reused for every chunk
+    sales_file = get_processed_file_name("sales.csv")
+    numerical_cols = list(NUMERICAL_COLS)
+
+    def iter_merged():
+        """Yield (merged chunk, test row mask) for every chunk of the sales file."""
+        row_start = 0
+        for chunk in iter_df_chunks(sales_file, folder, chunk_size, filters=sales_filters):
+            merged = add_time_features(merge_sales_data(chunk, dimension_index))
+            is_test = np.arange(row_start, row_start + len(merged)) % TEST_EVERY == TEST_EVERY - 1
+            row_start += len(merged)
+            yield merged.reset_index(drop=True), is_test
+
+    # Pass 1: statistics needed to preprocess a chunk
+    print("\nStreaming pass 1: fitting scaler and encoders...")
+    scaler = MinMaxScaler()
+    categories, size_counts, null_counts = {}, None, {}
+    merged_columns, n_rows, province_y_missing = None, 0, 0
+    for merged, is_test in iter_merged():
+        merged_columns = merged_columns or list(merged.columns)
+        n_rows += len(merged)
+        if "province_y" in merged.columns:
+            province_y_missing += int(merged["province_y"].isna().sum())
+        if "item_size" in merged.columns:
+            chunk_counts = merged["item_size"].value_counts()
+            size_counts = chunk_counts if size_counts is None else size_counts.add(chunk_counts, fill_value=0)
+
+        train = merged[~is_test]
+        if len(train):
+            scaler.partial_fit(train[numerical_cols])
+        for col in train.select_dtypes(include=CATEGORICAL_DTYPES).columns:
+            categories.setdefault(col, set()).update(train[col].astype(str).unique())
+        for col, count in train.isna().sum().items():
+            null_counts[col] = null_counts.get(col, 0) + int(count)
+
+    if not n_rows:
+        raise ValueError(f"No sales rows to train on in: {sales_file}")
+
+    # Same preprocessing decisions as the sampled trainer, made over all rows
+    dropped_cols = ["transaction_amount"]
+    if "province_y" in merged_columns and province_y_missing / n_rows > PROVINCE_Y_MISSING_THRESHOLD:
+        dropped_cols.append("province_y")
+    size_mode = None
+    if size_counts is not None and len(size_counts):
+        size_mode = size_counts[size_counts == size_counts.max()].index.min()  # Smallest of the most frequent
+
+    encoder_dict = {}
+    for col in sorted(categories, key=merged_columns.index):
+        encoder = LabelEncoder()
+        encoder.classes_ = np.array(sorted(categories[col]) + [UNKNOWN_CATEGORY])
+        encoder_dict[col] = encoder
+    category_index = build_category_index(encoder_dict)
+    print("\nCategorical columns found:", list(encoder_dict))
+
+    feature_columns = [col for col in merged_columns if col not in dropped_cols]
+
+    def transform(merged):
+        """Preprocess a merged chunk into (feature frame, target)."""
+        with track_stage("encode") as metrics:
+            if size_mode is not None:
+                merged["item_size"] = merged["item_size"].fillna(size_mode)
+            X = merged.reindex(columns=feature_columns)
+            X[numerical_cols] = scaler.transform(X[numerical_cols])
+            for col in encoder_dict:
+                X[col] = encode_categories(X[col], category_index[col])
+            metrics["rows_in"] = metrics["rows_out"] = len(X)
+            return X.astype(np.float64), merged["transaction_amount"].to_numpy()
+
+    # Pass 2: medians of the numeric columns that have missing values
+    null_cols = [col for col in feature_columns
+                 if null_counts.get(col) and col not in encoder_dict and col != "item_size"]
+    medians = {}
+    if null_cols:
+        print("\nStreaming pass 2: computing medians for", null_cols)
+        value_counts = {}
+        for merged, is_test in iter_merged():
+            X, _ = transform(merged)
+            for col in null_cols:
+                chunk_counts = X.loc[~is_test, col].value_counts()
+                value_counts[col] = chunk_counts if col not in value_counts else \
+                    value_counts[col].add(chunk_counts, fill_value=0)
+        for col in null_cols:
+            if col in value_counts and len(value_counts[col]):
+                medians[col] = median_from_counts(value_counts[col])
+            else:
+                feature_columns.remove(col)  # No observed values at all, like SimpleImputer drops it
+
+    # Pass 3: accumulate the regression statistics
+    print("\nStreaming pass 3: fitting the regression...")
+    regression = StreamingLinearRegression()
+    for merged, is_test in iter_merged():
+        X, y = transform(merged)
+        X = X[feature_columns].fillna(medians)
+        with track_stage("fit") as metrics:
+            regression.partial_fit(X.to_numpy()[~is_test], y[~is_test])
+            metrics["rows_in"] = int((~is_test).sum())
+    with track_stage("fit"):
+        model = regression.to_model(feature_columns)
+
+    # Pass 4: evaluate on the held-out rows
+    abs_error, squared_error, n_test = 0.0, 0.0, 0
+    for merged, is_test in iter_merged():
+        if not is_test.any():
+            continue
+        X, y = transform(merged)
+        X = X[feature_columns].fillna(medians)
+        errors = model.predict(X[is_test]) - y[is_test]
+        abs_error += np.abs(errors).sum()
+        squared_error += (errors ** 2).sum()
+        n_test += len(errors)
+
+    print(f"Training complete on {regression.n_rows} rows.")
+    if n_test:
+        print(f"Model Evaluation:\nMAE: {abs_error / n_test:.4f}\nRMSE: {(squared_error / n_test) ** 0.5:.4f}")
+
+    return model, encoder_dict, scaler, pd.Index(feature_columns), numerical_cols
@@ -0,0 +1,204 @@
+import os
+import json
+import argparse
+import numpy as np
+import pandas as pd
+
+# Version of the generator; bump it when the generated files change so
+# datasets generated by the previous version are regenerated
+GENERATOR_VERSION = 1
+
+# Cardinalities of the real extracts, which have about 1 million sales rows
+ITEM_COUNT = 927
+SUPERMARKET_COUNT = 387
+WEEK_COUNT = 104
+CUSTOMERS_PER_SALE = 0.24  # ~250000 customers per million rows
+SALES_PER_BASKET = 1.6
+PROMOTIONS_PER_SALE = 0.34  # ~350000 promotions per million rows
+
+# Item types and brands; some text carries the 'Type N' tags that clean_text removes
+ITEM_TYPES = {
+    "Type 1": ("PANCAKE MIX", ["Aunt Jemima", "Bisquick", "Hungry Jack", "Krusteaz", "Private Label"]),
+    "Type 2": ("SPAGHETTI", ["Barilla", "Barilla Type 2", "Ronzoni", "San Giorgio", "Private Label", "Type 2 Shoppe"]),
+    "Type 3": ("PASTA SAUCE", ["Ragu", "Prego", "Classico", "Newman's", "Private Label Premium"]),
+    "Type 4": ("SYRUP", ["Log Cabin", "Mrs Butterworth", "Karo", "Maple Grove", "Private Label"]),
+}
+DESCRIPTION_WORDS = ["ORIGINAL", "BUTTERMILK", "THIN", "WHL WHEAT", "GARDEN STYLE", "LITE", "Type 2", "Type 3",
+                     "COMPLETE", "  EXTRA  CHUNKY", "SUGAR FREE", "FMLY"]
+
+# Raw sizes (value, weight) covering every format clean_items_data has to handle
+SIZES = [
+    ("16 OZ", 225), ("26 OZ", 120), ("12 OZ", 104), ("24 OZ", 53), ("8 OZ", 38), ("1 LB", 30), ("2 LB", 10),
+    ("32    OZ", 8), ("6.75 OZ", 5), ("16OZ", 5), ("16Z", 5), ("8Z", 4), ("12 OUNCE", 4), ("6 1/2 OZ", 3),
+    ("N 1 LB", 3), ("P 16 OZ", 3), ("CR 14 OZ", 2), ("26 OZ.", 3), ("13OZ FMLY", 2), ("13 OZ FMLY", 2),
+    ("45 OZ PET", 2), ("6 LB 11 OZ", 2), ("12 FL OZ", 3), ("GAL", 1), ("11.6", 1), (".50 OZ", 1),
+    ("%KH# 9390", 3), ("KH# 29483", 2), ("CUST REQST", 2), ("NO TAG", 2), ("##########", 3), ("", 2),
+]
+NOTE_SIZE_PREFIXES = ("%KH", "KH", "CUST", "NO TAG")  # Their size is taken from the description
+
+# Promotion features and displays, weighted like the real extract
+FEATURES = [("Interior Page Feature", 193), ("Not on Feature", 79), ("Front Page Feature", 34),
+            ("Wrap Interior Feature", 22), ("Back Page Feature", 7), ("Interior Page Line Item", 6),
+            ("Wrap Back Feature", 5), ("Wrap Front Feature", 5)]
+DISPLAYS = [("Not on Display", 255), ("Rear End Cap", 25), ("In-Shelf", 21), ("Secondary Location Display", 14),
+            ("Front End Cap", 10), ("In-Aisle", 9), ("Promo/Seasonal Aisle", 5), ("Mid-Aisle End Cap", 5),
+            ("Store Rear", 4), ("Store Front", 2), ("Side-Aisle End Cap", 1)]
+
+def weighted_choice(rng, options, size):
+    """Draw values from (value, weight) pairs."""
+    values = np.array([value for value, _ in options], dtype=object)
+    weights = np.array([weight for _, weight in options], dtype=np.float64)
+    return values[rng.choice(len(values), size=size, p=weights / weights.sum())]
+
+def zipf_weights(n, exponent=1.1):
+    """Popularity weights of n ranked entities: a few are very common, most are rare."""
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    return weights / weights.sum()
+
+def hash_uniform(ids, salt):
+    """Uniform [0, 1) values derived from integer ids (splitmix64), the same in every chunk."""
+    with np.errstate(over="ignore"):
+        x = ids.astype(np.uint64) + np.uint64(salt) * np.uint64(0x9E3779B97F4A7C15)
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        x = x ^ (x >> np.uint64(31))
+    return (x >> np.uint64(11)).astype(np.float64) / 2.0 ** 53
+
+def generate_items(rng, n_items):
+    """Item table with real-looking codes, brands and messy sizes."""
+    codes = rng.permutation(np.unique(rng.integers(100000000, 9999999999, size=2 * n_items))[:n_items])
+    types = rng.choice(list(ITEM_TYPES), size=n_items)
+    brands = np.array([rng.choice(ITEM_TYPES[item_type][1]) for item_type in types], dtype=object)
+    sizes = weighted_choice(rng, SIZES, n_items)
+
+    descriptions = []
+    for item_type, brand, size in zip(types, brands, sizes):
+        words = " ".join(rng.choice(DESCRIPTION_WORDS, size=rng.integers(0, 3), replace=False))
+        description = f"{brand.upper()} {words} {ITEM_TYPES[item_type][0]}"
+        if size.startswith(NOTE_SIZE_PREFIXES):
+            description += f" {rng.choice(['16 OZ', '26 OZ', '7 OZ', '1 LB'])}"  # Size hidden in the description
+        descriptions.append(description)
+
+    return pd.DataFrame({"code": codes, "descrption": descriptions, "type": types, "brand": brands, "size": sizes})
+
+def generate_supermarkets(rng, n_supermarkets):
+    """Supermarket table; store numbers are shuffled like the real file."""
+    return pd.DataFrame({"supermarket_No": rng.permutation(np.arange(1, n_supermarkets + 1)),
+                         "postal-code": rng.choice(np.arange(30000, 39999), size=n_supermarkets)})
+
+def generate_promotions(rng, item_codes, supermarket_provinces, n_promotions):
+    """Promotions with unique (code, supermarkets, week) keys, as the training join expects."""
+    n_items, n_supermarkets = len(item_codes), len(supermarket_provinces)
+    n_keys = n_items * n_supermarkets * WEEK_COUNT
+    n_promotions = min(n_promotions, n_keys // 4)
+    keys = np.unique(rng.integers(0, n_keys, size=n_promotions))  # A few duplicate draws are dropped
+    item, rest = np.divmod(keys, n_supermarkets * WEEK_COUNT)
+    supermarket, week = np.divmod(rest, WEEK_COUNT)
+    promotions = pd.DataFrame({"code": item_codes[item], "supermarkets": supermarket + 1, "week": week + 1,
+                               "feature": weighted_choice(rng, FEATURES, len(keys)),
+                               "display": weighted_choice(rng, DISPLAYS, len(keys)),
+                               "province": supermarket_provinces[supermarket]})
+    return promotions.sort_values(["supermarkets", "week"], kind="stable")
+
+def generate_sales_chunk(rng, n_rows, first_row, item_codes, item_prices, supermarket_provinces, n_customers):
+    """
+    One chunk of sales rows.
+
+    Rows are grouped into baskets of about SALES_PER_BASKET lines that share a
+    customer, store, week, day and time; popular items and stores dominate, and a
+    few rows are returns with a negative amount. Basket attributes are derived
+    from the basket number, so baskets that span two chunks stay consistent.
+    """
+    basket = ((first_row + np.arange(n_rows)) / SALES_PER_BASKET).astype(np.int64) + 1
+    basket_ids, basket_rows = np.unique(basket, return_inverse=True)
+
+    n_supermarkets = len(supermarket_provinces)
+    store_cdf = np.cumsum(zipf_weights(n_supermarkets, 0.3))
+    store = np.minimum(np.searchsorted(store_cdf, hash_uniform(basket_ids, 1), side="right"), n_supermarkets - 1)
+    week = (hash_uniform(basket_ids, 2) * WEEK_COUNT).astype(np.int64) + 1
+    day = (week - 1) * 7 + (hash_uniform(basket_ids, 3) * 7).astype(np.int64) + 1
+    minute_of_day = (hash_uniform(basket_ids, 4) * 16 * 60).astype(np.int64) + 7 * 60  # Open 7:00 to 23:00
+    time = minute_of_day // 60 * 100 + minute_of_day % 60  # HHMM
+    customer = (hash_uniform(basket_ids, 5) * n_customers).astype(np.int64) + 1
+
+    item = rng.choice(len(item_codes), size=n_rows, p=zipf_weights(len(item_codes)))
+    units = np.minimum(rng.geometric(0.85, size=n_rows), 100)
+    amount = np.round(item_prices[item] * units, 2)
+    amount[rng.random(n_rows) < 0.0005] *= -1  # Returns
+
+    return pd.DataFrame({
+        "code": item_codes[item], "amount": amount, "units": units, "time": time[basket_rows],
+        "province": supermarket_provinces[store][basket_rows], "week": week[basket_rows],
+        "customerId": customer[basket_rows], "supermarket": store[basket_rows] + 1, "basket": basket,
+        "day": day[basket_rows], "voucher": (rng.random(n_rows) < 0.0236).astype(np.int64),
+    })
+
+def generate_dataset(output_dir, n_sales, seed=0, n_items=ITEM_COUNT, n_supermarkets=SUPERMARKET_COUNT,
+                     chunk_size=1000000):
+    """
+    Write synthetic item, promotion, sales and supermarkets CSVs in the raw extract format.
+
+    Column names, value formats and cardinalities follow the real extracts, including
+    the messy item sizes; the same seed (and chunk size) always produces the same
+    files. Sales rows are generated and appended chunk by chunk, so memory stays
+    bounded at any scale.
+
+    Args:
+        output_dir (str): Directory to write the files to.
+        n_sales (int): Number of sales rows, e.g. 10000 to 100000000.
+        seed (int): Random seed.
+        n_items (int): Number of items.
+        n_supermarkets (int): Number of supermarkets.
+        chunk_size (int): Sales rows generated per chunk.
+
+    Returns:
+        dict: Path of each generated file, keyed by file name.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    paths = {file_name: os.path.join(output_dir, file_name)
+             for file_name in ["item.csv", "promotion.csv", "sales.csv", "supermarkets.csv"]}
+
+    items = generate_items(rng, n_items)
+    items.to_csv(paths["item.csv"], index=False)
+    supermarkets = generate_supermarkets(rng, n_supermarkets)
+    supermarkets.to_csv(paths["supermarkets.csv"], index=False)
+
+    item_codes = items["code"].to_numpy()
+    item_prices = np.round(rng.lognormal(0.4, 0.5, size=n_items), 2) + 0.09
+    supermarket_provinces = rng.integers(1, 3, size=n_supermarkets)
+    generate_promotions(rng, item_codes, supermarket_provinces, int(n_sales * PROMOTIONS_PER_SALE)) \
+        .to_csv(paths["promotion.csv"], index=False)
+
+    n_customers = max(1, int(n_sales * CUSTOMERS_PER_SALE))
+    for chunk_index, first_row in enumerate(range(0, max(n_sales, 1), chunk_size)):
+        chunk_rng = np.random.default_rng([seed, chunk_index])
+        chunk = generate_sales_chunk(chunk_rng, min(chunk_size, n_sales - first_row), first_row,
+                                     item_codes, item_prices, supermarket_provinces, n_customers)
+        chunk.to_csv(paths["sales.csv"], index=False, mode="w" if chunk_index == 0 else "a", header=chunk_index == 0)
+
+    with open(os.path.join(output_dir, "dataset.json"), "w") as f:
+        json.dump({"generator_version": GENERATOR_VERSION, "n_sales": n_sales, "seed": seed,
+                   "n_items": n_items, "n_supermarkets": n_supermarkets, "chunk_size": chunk_size}, f, indent=2)
+
+    print(f"Generated {n_sales} synthetic sales rows in: {output_dir}")
+    return paths
+
+def ensure_dataset(output_dir, n_sales, seed=0):
+    """Generate the dataset unless output_dir already holds one made with the same parameters."""
+    meta_path = os.path.join(output_dir, "dataset.json")
+    if os.path.exists(meta_path):
+        with open(meta_path, "r") as f:
+            meta = json.load(f)
+        if (meta.get("generator_version"), meta.get("n_sales"), meta.get("seed")) == (GENERATOR_VERSION, n_sales, seed):
+            return {file_name: os.path.join(output_dir, file_name)
+                    for file_name in ["item.csv", "promotion.csv", "sales.csv", "supermarkets.csv"]}
+    return generate_dataset(output_dir, n_sales, seed)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic retail extracts.")
+    parser.add_argument("output_dir", help="Directory to write item.csv, promotion.csv, sales.csv and supermarkets.csv to")
+    parser.add_argument("n_sales", type=float, help="Number of sales rows, e.g. 1e6")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    args = parser.parse_args()
+    generate_dataset(args.output_dir, int(args.n_sales), args.seed)
@@ -0,0 +1,50 @@
+import sys
+import os
+import json
+
+# Add the project root and scripts/ to sys.path so the pipeline modules can be found
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "scripts")))
+
+import pytest
+from config_loader import load_config, CONFIG_PATH_ENV
+from synthetic_data import generate_dataset
+from pipeline_runner import run_cleaning_stage
+
+RAW_FILES = ["item.csv", "promotion.csv", "sales.csv", "supermarkets.csv"]
+
+@pytest.fixture
+def pipeline_workspace(tmp_path, monkeypatch):
+    """
+    Factory setting up a pipeline run in tmp_path.
+
+    Calling it generates synthetic raw files into tmp_path/raw, writes a copy of
+    config.json pointing the raw, clean and metrics paths into tmp_path (with caching
+    and parallel cleaning off, then the given settings) and cleans the given files.
+
+    Args of the factory:
+        n_sales (int or None): Synthetic sales rows to generate; None keeps the raw files
+                               of an earlier call, e.g. to change settings only.
+        seed (int): Seed of the synthetic data.
+        files (list): Raw files to clean; empty to clean none.
+        **settings: Config entries to set.
+
+    Returns:
+        pathlib.Path: tmp_path.
+    """
+    def make(n_sales, seed=0, files=RAW_FILES, **settings):
+        raw = tmp_path / "raw"
+        if n_sales is not None:
+            generate_dataset(str(raw), n_sales, seed=seed)
+        config = load_config().to_dict()
+        config.update({"extracted_to": str(raw), "processed_to": str(tmp_path / "clean"),
+                       "metrics_dir": str(tmp_path / "metrics"), "cache_enabled": False, "parallel": False})
+        config.update(settings)
+        with open(tmp_path / "config.json", "w") as f:
+            json.dump(config, f)
+        monkeypatch.setenv(CONFIG_PATH_ENV, str(tmp_path / "config.json"))
+        if files:
+            run_cleaning_stage(list(files), str(raw))
+        return tmp_path
+
+    return make
@@ -0,0 +1,47 @@
+import sys
+import os
+
+# Add the project root and scripts/ to sys.path so the pipeline modules can be found
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "scripts")))
+
+import numpy as np
+import pandas as pd
+from config_loader import get_processed_file_name
+from file_reader import load_df
+from basket_analysis import analyze_baskets
+
+def test_partitioned_counts_match_a_pandas_self_join(pipeline_workspace, tmp_path):
+    """Item, pair and rule figures merged from parallel partitions equal a brute-force count over all baskets."""
+    pipeline_workspace(4000, seed=4, files=["sales.csv"], chunk_size=1500)
+
+    paths = analyze_baskets(min_support=0.002, top_k=2, n_partitions=3, max_workers=2,
+                            output_dir=str(tmp_path / "baskets"))
+    items, pairs, rules = (pd.read_parquet(paths[name]) for name in ("items", "pairs", "rules"))
+
+    # Brute force: one row per (basket, item), pairs from a self-join
+    sales = load_df(get_processed_file_name("sales.csv"), str(tmp_path / "clean"))
+    lines = sales[["basket", "item_code"]].drop_duplicates()
+    n_baskets = lines["basket"].nunique()
+    min_count = np.ceil(0.002 * n_baskets)
+    item_counts = lines["item_code"].value_counts()
+    expected_items = item_counts[item_counts >= min_count]
+    assert dict(zip(items["item_code"], items["baskets"])) == expected_items.to_dict()
+
+    frequent = lines[lines["item_code"].isin(expected_items.index)]
+    joined = frequent.merge(frequent, on="basket")
+    joined = joined[joined["item_code_x"] < joined["item_code_y"]]
+    pair_counts = joined.groupby(["item_code_x", "item_code_y"]).size()
+    pair_counts = pair_counts[pair_counts >= min_count]
+    assert len(pair_counts) > 0
+    assert {(a, b): n for a, b, n in pairs[["item_code", "other_item_code", "baskets"]].itertuples(index=False)} == \
+        pair_counts.to_dict()
+
+    # Rules in both directions, at most top_k per item, ranked by lift
+    assert rules.groupby("item_code").size().max() <= 2
+    for row in rules.itertuples(index=False):
+        key = tuple(sorted((row.item_code, row.associated_item_code)))
+        assert row.baskets == pair_counts[key]
+        assert np.isclose(row.confidence, row.baskets / item_counts[row.item_code])
+        assert np.isclose(row.lift, row.confidence * n_baskets / item_counts[row.associated_item_code])
+    assert (rules.groupby("item_code")["lift"].diff().dropna() <= 0).all()
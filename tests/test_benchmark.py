@@ -0,0 +1,55 @@
+import sys
+import os
+
+# Add the project root and scripts/ to sys.path so the pipeline modules can be found
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "scripts")))
+
+import pandas as pd
+from synthetic_data import generate_dataset
+from data_schema import RAW_SCHEMAS
+from data_processor import clean_items_data
+from benchmark import run_benchmarks, load_results, find_baseline, compare_results
+
+def test_generated_files_match_the_raw_extracts(tmp_path):
+    """Synthetic files have the raw columns, joinable keys and messy sizes, reproducibly."""
+    paths = generate_dataset(str(tmp_path / "a"), 3000, seed=1, chunk_size=1000)
+    frames = {file_name: pd.read_csv(path) for file_name, path in paths.items()}
+
+    for file_name, df in frames.items():
+        assert list(df.columns) == RAW_SCHEMAS[file_name]["usecols"]
+    sales, promotions = frames["sales.csv"], frames["promotion.csv"]
+    assert len(sales) == 3000
+    assert sales["code"].isin(frames["item.csv"]["code"]).all()
+    assert sales["supermarket"].isin(frames["supermarkets.csv"]["supermarket_No"]).all()
+    assert not promotions.duplicated(["code", "supermarkets", "week"]).any()
+    assert (sales.groupby("basket")[["customerId", "supermarket", "week", "time"]].nunique() == 1).all().all()
+    assert ((sales["time"] % 100) < 60).all()
+
+    items = clean_items_data(frames["item.csv"])
+    assert items["item_note"].notna().any() and items["item_size"].isna().any()
+
+    # Same seed, same files
+    other_paths = generate_dataset(str(tmp_path / "b"), 3000, seed=1, chunk_size=1000)
+    with open(paths["sales.csv"], "rb") as f, open(other_paths["sales.csv"], "rb") as g:
+        assert f.read() == g.read()
+
+def test_benchmarks_store_comparable_results(tmp_path):
+    """Results are appended per run and compared with the previous run of the same dataset."""
+    results_dir = str(tmp_path / "results")
+    for _ in range(2):
+        run_benchmarks(2000, ["clean_items_data", "merge"], repeat=1, data_dir=str(tmp_path / "data"),
+                       results_dir=results_dir)
+
+    results = load_results(results_dir)
+    assert len(results) == 2
+    latest = results[-1]
+    assert latest["benchmarks"]["merge"]["rows"] == 2000
+    assert latest["benchmarks"]["merge"]["stages"]["merge"] > 0
+    assert latest["benchmarks"]["clean_items_data"]["rows_per_second"] > 0
+    assert find_baseline(latest, results) is results[0]
+
+    slower = {"benchmarks": {"merge": dict(latest["benchmarks"]["merge"],
+                                           rows_per_second=latest["benchmarks"]["merge"]["rows_per_second"] / 2)}}
+    assert compare_results(slower, latest)["merge"] == {"change": -0.5, "regression": True}
+    assert compare_results(latest, None)["merge"] == {"change": None, "regression": False}
@@ -0,0 +1,73 @@
+import sys
+import os
+
+# Add the project root and scripts/ to sys.path so the pipeline modules can be found
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "scripts")))
+
+from unittest.mock import patch
+import pandas as pd
+from data_processor import CLEANING_FUNCTIONS, CHUNKABLE_FILES
+from file_reader import iter_csv_chunks
+from file_writer import write_df_to_csv, write_chunks_to_csv
+
+def make_sales_csv(folder, rows=25):
+    """Write a small sales.csv mimicking the raw extract."""
+    sales = pd.DataFrame({
+        "code": [3000005040 + i for i in range(rows)],
+        "amount": [round(0.99 + i * 0.5, 2) for i in range(rows)],
+        "units": [1 + i % 3 for i in range(rows)],
+        "time": [1100 + i for i in range(rows)],
+        "province": [1 + i % 2 for i in range(rows)],
+        "week": [1 + i % 4 for i in range(rows)],
+        "customerId": [125434 + i for i in range(rows)],
+        "supermarket": [244 + i % 5 for i in range(rows)],
+        "basket": [1 + i // 3 for i in range(rows)],
+        "day": [1 + i % 7 for i in range(rows)],
+        "voucher": [i % 2 for i in range(rows)],
+    })
+    sales.to_csv(os.path.join(folder, "sales.csv"), index=False)
+
+def test_chunked_cleaning_matches_full_load(tmp_path):
+    """Cleaning sales.csv chunk by chunk must produce the same file as a full load."""
+    raw, clean = tmp_path / "raw", tmp_path / "clean"
+    raw.mkdir()
+    make_sales_csv(raw)
+
+    config = {"extracted_to": str(raw), "processed_to": str(clean), "file_suffix": "_processed"}
+    cleaning_function = CLEANING_FUNCTIONS["sales.csv"]
+    assert "sales.csv" in CHUNKABLE_FILES
+
+    with patch("config_loader.load_config", return_value=config), \
+         patch("file_reader.load_config", return_value=config), \
+         patch("file_writer.load_config", return_value=config):
+        full_path = write_df_to_csv(cleaning_function(pd.read_csv(raw / "sales.csv")), "full.csv")
+        chunks = iter_csv_chunks("sales.csv", chunk_size=7)
+        chunked_path = write_chunks_to_csv((cleaning_function(chunk) for chunk in chunks), "sales.csv")
+
+    with open(full_path) as full, open(chunked_path) as chunked:
+        assert full.read() == chunked.read()
+
+def test_parallel_row_ranges_match_full_load(tmp_path):
+    """Splitting sales.csv into row ranges on a process pool must produce the same file as a full load."""
+    from pipeline_runner import process_files_parallel
+
+    raw, clean = tmp_path / "raw", tmp_path / "clean"
+    raw.mkdir()
+    make_sales_csv(raw, rows=101)
+    (raw / "notes.csv").write_text("note\n")
+
+    config = {"extracted_to": str(raw), "processed_to": str(clean), "file_suffix": "_processed",
+              "split_min_bytes": 0, "max_workers": 3}
+    with patch("config_loader.load_config", return_value=config), \
+         patch("file_reader.load_config", return_value=config), \
+         patch("file_writer.load_config", return_value=config), \
+         patch("pipeline_runner.load_config", return_value=config):
+        expected_path = write_df_to_csv(CLEANING_FUNCTIONS["sales.csv"](pd.read_csv(raw / "sales.csv")), "full.csv")
+        results = process_files_parallel(["sales.csv", "notes.csv"], str(raw))
+
+    assert results["sales.csv"]["status"] == "success"
+    assert results["notes.csv"]["status"] == "skipped"
+    with open(expected_path) as expected, open(results["sales.csv"]["path"]) as merged:
+        assert expected.read() == merged.read()
+    assert sorted(os.listdir(clean)) == ["full_processed.csv", "sales_processed.csv"]
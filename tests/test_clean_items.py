@@ -36,6 +36,30 @@ def test_clean_items_data():
     print("✅ Test Passed! Cleaned Data:")
     print(cleaned_data)
 
+def test_clean_items_size_parsing():
+    """Test size, unit and note parsing on the messy size values found in item.csv."""
+    sample_data = pd.DataFrame({
+        "code": [1, 2, 3, 4, 5, 6, 7, 8],
+        "descrption": ["AUNT JEM PANCAKE MIX", "DECECCO SPAGHETTI 16OZ", "CREAMETTE ELBOW", "WHT LILY PNCK MIX",
+                       "SAUCE", "KARO SYRUP", "CLASSICO SAUCE 13 OZ FMLY", "ANNARINO SAUCE"],
+        "type": ["Type 1"] * 8,
+        "brand": ["Aunt Jemima"] * 8,
+        "size": ["32    OZ", "%KH# 9390", "N 1 LB", "6 1/2 OZ", "6 LB 11 OZ", "GAL", "NO TAG", "26 OZ."]
+    })
+
+    cleaned_data = clean_items_data(sample_data)
+
+    assert cleaned_data["item_size"].tolist()[:5] == [32.0, 16.0, 1.0, 6.5, 107.0], "Size parsing failed"
+    assert pd.isna(cleaned_data.iloc[5]["item_size"]), "Size without a number should be NaN"
+    assert cleaned_data.iloc[6]["item_size"] == 13.0, "Size from description failed"
+    assert cleaned_data["item_uom"].tolist()[:5] == ["OZ", "OZ", "LB", "OZ", "OZ"], "UOM extraction failed"
+    assert cleaned_data.iloc[7]["item_uom"] == "OZ", "UOM normalization failed"
+    assert cleaned_data["item_note"].tolist() == [None, "KH# 9390", "N", None, None, "GAL", "FMLY", None], \
+        "Item note extraction failed"
+    assert cleaned_data.iloc[1]["item_desc"] == "DECECCO SPAGHETTI", "Size was not removed from description"
+    assert cleaned_data.iloc[6]["item_desc"] == "CLASSICO SAUCE", "Size was not removed from description"
+
 # Run the test
 if __name__ == "__main__":
     test_clean_items_data()
+    test_clean_items_size_parsing()
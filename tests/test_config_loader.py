@@ -0,0 +1,61 @@
+import sys
+import os
+import json
+
+# Add the project root and scripts/ to sys.path so the pipeline modules can be found
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "scripts")))
+
+import pytest
+from config_loader import load_config, clear_config_cache
+
+def write_config(path, values, mtime_ns):
+    """Write a config file with a fixed modification time, so rewrites within one tick are still seen."""
+    with open(path, "w") as f:
+        json.dump(values, f)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+def test_config_is_cached_until_the_file_changes(tmp_path):
+    """Unchanged files are not parsed again; a new modification time reloads them."""
+    path = str(tmp_path / "config.json")
+    write_config(path, {"chunk_size": 10, "files_to_process": ["item.csv"]}, 1_000_000_000)
+
+    config = load_config(path)
+    assert load_config(path) is config
+    assert config["chunk_size"] == 10 and config.get("parallel", False) is False
+    assert config["files_to_process"] == ("item.csv",)
+    with pytest.raises(TypeError):
+        config["chunk_size"] = 20
+
+    copy = config.to_dict()
+    copy["files_to_process"].append("sales.csv")
+    assert copy == {"chunk_size": 10, "files_to_process": ["item.csv", "sales.csv"]}
+    assert config["files_to_process"] == ("item.csv",)
+
+    write_config(path, {"chunk_size": 20}, 2_000_000_000)
+    assert load_config(path)["chunk_size"] == 20
+
+def test_environment_overrides_and_validation(tmp_path, monkeypatch):
+    """PIPELINE_<SETTING> variables override the file, and invalid values are rejected with every problem."""
+    path = str(tmp_path / "config.json")
+    write_config(path, {"chunk_size": 10, "storage_format": "csv"}, 1_000_000_000)
+
+    monkeypatch.setenv("PIPELINE_CHUNK_SIZE", "500")
+    monkeypatch.setenv("PIPELINE_STORAGE_FORMAT", "parquet")
+    clear_config_cache()
+    config = load_config(path)
+    assert (config["chunk_size"], config["storage_format"]) == (500, "parquet")
+
+    # Overrides are read when the file is parsed, not on every call
+    monkeypatch.delenv("PIPELINE_CHUNK_SIZE")
+    assert load_config(path) is config
+    clear_config_cache()
+    assert load_config(path)["chunk_size"] == 10
+
+    monkeypatch.setenv("PIPELINE_PARALLEL", "yes")
+    monkeypatch.setenv("PIPELINE_MAX_WORKERS", "0")
+    clear_config_cache()
+    with pytest.raises(ValueError) as excinfo:
+        load_config(path)
+    assert "'parallel' must be of type bool" in str(excinfo.value)
+    assert "'max_workers' must be at least 1" in str(excinfo.value)
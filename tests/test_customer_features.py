@@ -0,0 +1,79 @@
+import sys
+import os
+
+# Add the project root and scripts/ to sys.path so the pipeline modules can be found
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "scripts")))
+
+import numpy as np
+import pandas as pd
+import pytest
+import customer_features
+from config_loader import get_processed_file_name
+from file_reader import load_df
+from dimension_index import build_dimension_index
+from sales_predictor import preprocess_and_train_sales_model, predict_sales, load_dimension_tables, merge_sales_data
+from scoring_server import BatchScorer
+from customer_features import build_customer_features, load_customer_table, CUSTOMER_FEATURE_COLUMNS
+
+@pytest.fixture
+def workspace(pipeline_workspace, tmp_path):
+    """Cleaned synthetic data with the customer table path in tmp_path."""
+    return pipeline_workspace(4000, seed=8, customer_features_path=str(tmp_path / "customers.parquet"),
+                              use_customer_features=True, training_sample_size=3000)
+
+def test_streamed_table_matches_a_groupby_over_all_sales(workspace, monkeypatch):
+    """Merging small chunks' partial aggregates gives the same table as one pandas groupby over the history."""
+    monkeypatch.setattr(customer_features, "COMPACT_ROWS", 500)
+    table = pd.read_parquet(build_customer_features(chunk_size=300))
+    pd.testing.assert_frame_equal(table, pd.read_parquet(build_customer_features(chunk_size=10 ** 6)))
+
+    sales = load_df(get_processed_file_name("sales.csv"), str(workspace / "clean"))
+    items = load_df(get_processed_file_name("item.csv"), str(workspace / "clean"))
+    sales = sales.merge(items[["item_code", "item_brand"]], on="item_code", how="left")
+    grouped = sales.groupby("customer_id")
+    expected = pd.DataFrame({
+        "customer_recency_days": sales["day"].max() - grouped["day"].max(),
+        "customer_tenure_days": grouped["day"].max() - grouped["day"].min(),
+        "customer_active_weeks": grouped["week"].nunique(),
+        "transactions": grouped.size(),
+        "units": grouped["quantity"].sum(),
+        "amount": grouped["transaction_amount"].sum(),
+    }).reset_index()
+    for col in expected.columns:
+        np.testing.assert_allclose(table[col], expected[col], err_msg=col)
+
+    # Preferred store / brand: most transactions, smallest code (brand name) on ties
+    for name, col in [("store", "supermarket_code"), ("brand", "item_brand")]:
+        counts = sales.groupby(["customer_id", col], observed=True).size().rename("n").reset_index()
+        counts = counts.sort_values(["customer_id", "n", col], ascending=[True, False, True])
+        best = counts.drop_duplicates("customer_id").set_index("customer_id").reindex(table["customer_id"])
+        assert list(table[f"customer_preferred_{name}"].astype(object)) == list(best[col].astype(object))
+        np.testing.assert_allclose(table[f"customer_{name}_share"], best["n"] / table["transactions"].to_numpy(),
+                                   rtol=1e-6)
+
+def test_trainer_and_scorers_join_the_features_by_customer(workspace):
+    """Training replaces customer_id by the features without the row's own sale; scoring looks them up."""
+    build_customer_features()
+    table = load_customer_table()
+    folder = str(workspace / "clean")
+    sales = load_df(get_processed_file_name("sales.csv"), folder).head(50)
+    merged = merge_sales_data(sales, build_dimension_index(*load_dimension_tables(folder)))
+    assert "customer_id" not in merged
+    history = table.set_index("customer_id").loc[sales["customer_id"]]
+    others = history["transactions"].to_numpy() - 1
+    expected = np.where(others > 0, (history["amount"].to_numpy() - sales["transaction_amount"]) /
+                        np.maximum(others, 1), 0.0)
+    np.testing.assert_allclose(merged["customer_avg_amount"], expected)
+
+    components = preprocess_and_train_sales_model()
+    feature_columns = list(components[3])
+    assert "customer_id" not in feature_columns
+    assert set(CUSTOMER_FEATURE_COLUMNS) <= set(feature_columns)
+
+    rows = sales.drop(columns=["transaction_amount"]).head(5).to_dict("records")
+    rows[0]["customer_id"] = -7  # Unknown customer
+    expected = np.concatenate([predict_sales(pd.DataFrame([row]), *components) for row in rows])
+    np.testing.assert_allclose(BatchScorer(*components).score(rows), expected)
+    np.testing.assert_allclose(predict_sales(pd.DataFrame(rows), *components), expected)
+    assert len(np.unique(expected)) > 1
@@ -0,0 +1,59 @@
+import sys
+import os
+
+# Add the project root and scripts/ to sys.path so the pipeline modules can be found
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "scripts")))
+
+from unittest.mock import patch
+import pandas as pd
+from file_reader import load_csv_to_df, iter_csv_chunks, load_df
+from file_writer import write_chunks
+from data_processor import clean_promotions_data
+
+PROMOTIONS_CSV = """code,supermarkets,week,feature,display,province
+2700042240,285,91,Not on Feature,Mid-Aisle End Cap,1
+2700042292,285,92,Interior Page Feature,Not on Display,2
+2700042274,150,92,Interior Page Feature,Not on Display,1
+2700042240,150,93,Wrap Back Feature,Rear End Cap,2
+"""
+
+def test_raw_file_is_read_with_compact_dtypes(tmp_path):
+    """Schema dtypes are applied at read time without changing any value."""
+    (tmp_path / "promotion.csv").write_text(PROMOTIONS_CSV)
+    config = {"chunk_size": 3}
+    with patch("file_reader.load_config", return_value=config):
+        df = load_csv_to_df("promotion.csv", str(tmp_path))
+        chunks = list(iter_csv_chunks("promotion.csv", str(tmp_path)))
+
+    expected = pd.read_csv(tmp_path / "promotion.csv")
+    assert df["code"].dtype == "int64"
+    assert df["supermarkets"].dtype == "int16" and df["province"].dtype == "int8"
+    assert df["feature"].dtype == "category" and df["display"].dtype == "category"
+    assert df.astype(object).equals(expected.astype(object))
+    assert all(chunk["week"].dtype == "int16" for chunk in chunks)
+
+def test_integers_that_do_not_fit_keep_their_parsed_dtype(tmp_path):
+    """Out-of-range or missing values are never wrapped or lost by narrowing."""
+    (tmp_path / "supermarkets.csv").write_text("supermarket_No,postal-code\n1,30309\n40000,\n")
+    with patch("file_reader.load_config", return_value={"chunk_size": 10}):
+        df = load_csv_to_df("supermarkets.csv", str(tmp_path))
+    assert df["supermarket_No"].tolist() == [1, 40000]
+    assert df["postal-code"].dtype == "float64"
+
+def test_processed_parquet_keeps_dtypes(tmp_path):
+    """Categoricals and narrow integers survive a chunked Parquet write and read."""
+    (tmp_path / "promotion.csv").write_text(PROMOTIONS_CSV)
+    config = {"processed_to": str(tmp_path / "clean"), "file_suffix": "_processed",
+              "storage_format": "parquet", "chunk_size": 2}
+    with patch("config_loader.load_config", return_value=config), \
+         patch("file_reader.load_config", return_value=config), \
+         patch("file_writer.load_config", return_value=config):
+        # Each chunk has its own categories
+        chunks = (clean_promotions_data(chunk) for chunk in iter_csv_chunks("promotion.csv", str(tmp_path)))
+        path = write_chunks(chunks, "promotion.csv")
+        df = load_df(os.path.basename(path), config["processed_to"])
+
+    assert df["feature"].dtype == "category" and df["supermarket_code"].dtype == "int16"
+    assert df["feature"].tolist() == ["Not on Feature", "Interior Page Feature",
+                                      "Interior Page Feature", "Wrap Back Feature"]
@@ -0,0 +1,125 @@
+import sys
+import os
+import json
+
+# Add the project root and scripts/ to sys.path so the pipeline modules can be found
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "scripts")))
+
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+from config_loader import get_processed_file_name
+from file_reader import load_df
+from pipeline_runner import run_cleaning_stage
+from data_schema import PROCESSED_SCHEMAS
+
+FILES = ["item.csv", "promotion.csv", "sales.csv", "supermarkets.csv"]
+
+@pytest.fixture
+def workspace(pipeline_workspace, tmp_path):
+    """Synthetic raw data and a function (re)writing a config that puts the quarantine in tmp_path."""
+    def configure(**settings):
+        settings = {"quarantine_dir": None, "validation_enabled": True, "validation_max_quarantine_rate": 0.05,
+                    **settings}
+        pipeline_workspace(None, files=[], **settings)
+
+    pipeline_workspace(3000, seed=11, files=[])
+    configure()
+    return tmp_path, configure
+
+@pytest.mark.parametrize("parallel", [False, True])
+def test_failing_rows_are_quarantined_and_counted(workspace, parallel):
+    """Rows breaking a rule leave the cleaned file for the quarantine CSV, whichever way the file is cleaned."""
+    tmp_path, configure = workspace
+    configure(chunk_size=200, split_min_bytes=0, max_workers=2)
+    raw = tmp_path / "raw"
+    items = pd.read_csv(raw / "item.csv")
+    pd.concat([items, items.iloc[[3]]]).to_csv(raw / "item.csv", index=False)  # Duplicate item code
+    stores = pd.read_csv(raw / "supermarkets.csv")
+    pd.concat([stores, stores.iloc[[0]]]).to_csv(raw / "supermarkets.csv", index=False)  # In another chunk
+    sales = pd.read_csv(raw / "sales.csv")
+    bad = sales.iloc[[0, 1, 2]].copy()
+    bad["supermarket"] = [9999, bad["supermarket"].iloc[1], bad["supermarket"].iloc[2]]  # Unknown store
+    bad["units"] = [bad["units"].iloc[0], 0, bad["units"].iloc[2]]
+    bad["time"] = [bad["time"].iloc[0], bad["time"].iloc[1], 2500]
+    pd.concat([sales.iloc[:1500], bad, sales.iloc[1500:]]).to_csv(raw / "sales.csv", index=False)
+
+    results = run_cleaning_stage(FILES, str(raw), parallel=parallel)
+    assert all(result["status"] == "success" for result in results.values())
+
+    cleaned = load_df(get_processed_file_name("sales.csv"), str(tmp_path / "clean"))
+    assert len(cleaned) == len(sales)
+    quarantined = pd.read_csv(tmp_path / "quarantine" / "sales_quarantine.csv")
+    assert list(quarantined["failed_checks"]) == ["reference:supermarket_code", "range:quantity", "range:time"]
+    assert list(quarantined["basket"]) == list(bad["basket"])
+
+    cleaned_items = load_df(get_processed_file_name("item.csv"), str(tmp_path / "clean"))
+    assert cleaned_items["item_code"].is_unique and len(cleaned_items) == len(items)
+    item_quarantine = pd.read_csv(tmp_path / "quarantine" / "item_quarantine.csv")
+    assert list(item_quarantine["failed_checks"]) == ["unique:item_code"]
+    store_quarantine = pd.read_csv(tmp_path / "quarantine" / "supermarkets_quarantine.csv")
+    assert list(store_quarantine["supermarket_code"]) == [stores["supermarket_No"].iloc[0]]
+
+    with open(tmp_path / "quarantine" / "validation_summary.json") as f:
+        summary = json.load(f)
+    assert set(summary) == set(FILES)
+    assert summary["sales.csv"]["rows_checked"] == len(sales) + 3
+    assert summary["sales.csv"]["failures"] == {"reference:supermarket_code": 1, "range:quantity": 1,
+                                                "range:time": 1}
+    assert summary["promotion.csv"]["rows_quarantined"] == 0
+    assert all(entry["status"] == "passed" for entry in summary.values())
+
+def test_threshold_breach_warns_by_default_and_fails_on_request(workspace, capsys):
+    """Too many missing brands are reported for item.csv; the file only fails with validation_fail_on_breach."""
+    tmp_path, configure = workspace
+    raw = tmp_path / "raw"
+    items = pd.read_csv(raw / "item.csv")
+    items.loc[items.index[::5], "brand"] = None
+    items.to_csv(raw / "item.csv", index=False)
+
+    results = run_cleaning_stage(["item.csv"], str(raw))  # Default config
+    assert results["item.csv"]["status"] == "success"
+    assert results["item.csv"]["validation"]["status"] == "failed"
+    assert "Warning: item.csv breached validation thresholds: item_brand null rate" in capsys.readouterr().out
+    with open(tmp_path / "quarantine" / "validation_summary.json") as f:
+        assert json.load(f)["item.csv"]["null_rates"]["item_brand"] == pytest.approx(0.2, abs=0.01)
+
+    configure(validation_fail_on_breach=True)
+    results = run_cleaning_stage(["item.csv"], str(raw))
+    assert results["item.csv"]["status"] == "failed"
+    assert "item_brand null rate" in results["item.csv"]["error"]
+
+def test_sales_are_cleaned_again_when_a_referenced_file_changes(workspace):
+    """The cached cleaned sales file is not reused once item.csv, whose codes sales are checked against, changes."""
+    tmp_path, configure = workspace
+    configure(cache_enabled=True, cache_dir=str(tmp_path / "cache"), validation_max_quarantine_rate=1.0)
+    raw = tmp_path / "raw"
+    items = pd.read_csv(raw / "item.csv")
+    items.iloc[::2].to_csv(raw / "item.csv", index=False)
+
+    assert run_cleaning_stage(["sales.csv"], str(raw))["sales.csv"]["status"] == "success"
+    partial = len(load_df(get_processed_file_name("sales.csv"), str(tmp_path / "clean")))
+    assert partial < 3000
+    assert run_cleaning_stage(["sales.csv"], str(raw))["sales.csv"]["status"] == "cached"
+
+    items.to_csv(raw / "item.csv", index=False)
+    assert run_cleaning_stage(["sales.csv"], str(raw))["sales.csv"]["status"] == "success"
+    assert len(load_df(get_processed_file_name("sales.csv"), str(tmp_path / "clean"))) == 3000
+
+def test_quarantined_nulls_leave_the_schema_dtype(workspace):
+    """Once rows with a missing id are quarantined, the id column gets its schema dtype back, as in other chunks."""
+    tmp_path, configure = workspace
+    configure(storage_format="parquet", chunk_size=500)
+    raw = tmp_path / "raw"
+    sales = pd.read_csv(raw / "sales.csv")
+    sales["customerId"] = sales["customerId"].astype("float64")
+    sales.loc[10, "customerId"] = None  # In the first chunk, which sets the Parquet schema
+    sales.to_csv(raw / "sales.csv", index=False)
+
+    results = run_cleaning_stage(["item.csv", "supermarkets.csv", "sales.csv"], str(raw))
+    assert results["sales.csv"]["validation"]["rows_quarantined"] == 1
+    schema = pq.read_schema(results["sales.csv"]["path"])
+    assert str(schema.field("customer_id").type) == PROCESSED_SCHEMAS["sales.csv"]["dtype"]["customer_id"]
+    cleaned = load_df(get_processed_file_name("sales.csv"), str(tmp_path / "clean"))
+    assert len(cleaned) == len(sales) - 1
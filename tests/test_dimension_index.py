@@ -0,0 +1,65 @@
+import sys
+import os
+
+# Add the project root and scripts/ to sys.path so the pipeline modules can be found
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "scripts")))
+
+import numpy as np
+import pandas as pd
+from dimension_index import build_dimension_index, join_dimensions
+
+def make_tables():
+    """Sales rows with matched and unmatched keys, and overlapping province columns."""
+    sales_df = pd.DataFrame({
+        "item_code": [1, 2, 3, 9, 1, 2],
+        "transaction_amount": [1.0, 2.0, 3.0, 4.0, 5.0, 6.0],
+        "province": [1, 2, 1, 2, 1, 2],
+        "week": [1, 1, 2, 2, 3, 1],
+        "supermarket_code": [10, 20, 10, 30, 20, 20],
+    }, index=range(100, 106))  # Chunks read from a file do not start at 0
+    item_df = pd.DataFrame({
+        "item_code": [3, 1, 2],
+        "item_type": ["pasta", "sauce", np.nan],
+        "item_size": [16.0, 24.0, np.nan],
+    })
+    promotion_df = pd.DataFrame({
+        "item_code": [1, 2, 1],
+        "supermarket_code": [10, 20, 20],
+        "week": [1, 1, 3],
+        "feature_desc": ["Wrap", "Front Page", "Wrap"],
+        "province": [1, 2, 1],
+    })
+    supermarkets_df = pd.DataFrame({"supermarket_code": [10, 20], "postal_code": [30309, 30075]})
+    return sales_df, item_df, promotion_df, supermarkets_df
+
+def merge_chain(sales_df, item_df, promotion_df, supermarkets_df):
+    """The chained pandas merges the dimension index replaces."""
+    return sales_df.merge(item_df, on="item_code", how="left") \
+                   .merge(promotion_df, on=["item_code", "supermarket_code", "week"], how="left") \
+                   .merge(supermarkets_df, on="supermarket_code", how="left")
+
+def test_join_matches_merge():
+    """Gathered join has the same rows, columns, suffixes and dtypes as the merges."""
+    sales_df, item_df, promotion_df, supermarkets_df = make_tables()
+    dimension_index = build_dimension_index(item_df, promotion_df, supermarkets_df)
+
+    expected = merge_chain(sales_df, item_df, promotion_df, supermarkets_df)
+    pd.testing.assert_frame_equal(join_dimensions(sales_df, dimension_index), expected)
+    assert {"province_x", "province_y"} <= set(expected.columns)
+
+    # Every row matched: integer columns keep their dtype, like merge
+    matched = sales_df[sales_df["supermarket_code"] != 30]
+    pd.testing.assert_frame_equal(join_dimensions(matched, dimension_index),
+                                  merge_chain(matched, item_df, promotion_df, supermarkets_df))
+
+def test_join_with_duplicate_keys_falls_back_to_merge():
+    """Duplicate dimension keys multiply rows exactly as merge does."""
+    sales_df, item_df, promotion_df, supermarkets_df = make_tables()
+    promotion_df = pd.concat([promotion_df, promotion_df.iloc[[0]]], ignore_index=True)
+    dimension_index = build_dimension_index(item_df, promotion_df, supermarkets_df)
+
+    joined = join_dimensions(sales_df, dimension_index, drop_columns=["supermarket_code"])
+    expected = merge_chain(sales_df, item_df, promotion_df, supermarkets_df).drop(columns=["supermarket_code"])
+    pd.testing.assert_frame_equal(joined, expected)
+    assert len(joined) == len(sales_df) + 1
@@ -1,56 +1,156 @@
+import io
 import unittest
-from unittest.mock import patch, mock_open, MagicMock
+from unittest.mock import patch
 import zipfile
-from scripts.file_extractor import download_zip, extract_zip, extract_files
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 
 import sys
 import os
 
-# Add the project root directory to sys.path so scripts/ can be found
+# Add the project root and scripts/ to sys.path so the pipeline modules can be found
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "scripts")))
+
+from file_extractor import download_zip, extract_zip, extract_files, ensure_zip
+from file_reader import iter_csv_chunks
+
+PAYLOAD = bytes(range(256)) * 400  # 102400 bytes
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """Serves payload with byte range support and records the ranges requested."""
+    payload = PAYLOAD
+    etag = '"v1"'
+    failing_ranges = set()
+    requested_ranges = []
+
+    def log_message(self, *args):
+        pass
+
+    def send_payload_headers(self, status, length):
+        self.send_response(status)
+        self.send_header("Content-Length", str(length))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", self.etag)
+        self.end_headers()
+
+    def do_HEAD(self):
+        self.send_payload_headers(200, len(self.payload))
+
+    def do_GET(self):
+        byte_range = self.headers.get("Range")
+        if not byte_range:
+            self.send_payload_headers(200, len(self.payload))
+            self.wfile.write(self.payload)
+            return
+
+        start, end = (int(value) for value in byte_range.replace("bytes=", "").split("-"))
+        self.requested_ranges.append(start)
+        if start in self.failing_ranges:
+            self.send_error(404)
+            return
+        self.send_payload_headers(206, end - start + 1)
+        self.wfile.write(self.payload[start:end + 1])
 
 class TestZipFunctions(unittest.TestCase):
-    
-    @patch("requests.get")
-    @patch("builtins.open", new_callable=mock_open)
-    def test_download_zip(self, mock_file, mock_requests_get):
-        """Test downloading a ZIP file successfully."""
-        mock_response = MagicMock()
-        mock_response.iter_content = lambda chunk_size: [b"test_data"]
-        mock_response.raise_for_status = MagicMock()
-        mock_requests_get.return_value = mock_response
-
-        download_zip("http://example.com/test.zip", "test.zip")
-        mock_file.assert_called_with("test.zip", "wb")
-        mock_requests_get.assert_called_with("http://example.com/test.zip", stream=True)
-    
-    @patch("zipfile.ZipFile")
-    @patch("os.makedirs")
-    def test_extract_zip(self, mock_makedirs, mock_zipfile):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), RangeHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/data.zip"
+        RangeHandler.payload = PAYLOAD
+        RangeHandler.etag = '"v1"'
+        RangeHandler.failing_ranges = set()
+        RangeHandler.requested_ranges = []
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp_dir.cleanup()
+
+    def test_download_zip(self):
+        """Test downloading a ZIP file in parallel byte ranges."""
+        save_path = os.path.join(self.tmp_dir.name, "test.zip")
+        download_zip(self.url, save_path, max_workers=4, part_size=10000)
+
+        with open(save_path, "rb") as f:
+            self.assertEqual(f.read(), PAYLOAD)
+        self.assertEqual(sorted(RangeHandler.requested_ranges), list(range(0, len(PAYLOAD), 10000)))
+        self.assertFalse(os.path.exists(f"{save_path}.part.json"))
+
+    def test_download_zip_resumes(self):
+        """Test that an interrupted download only fetches the missing parts when rerun."""
+        save_path = os.path.join(self.tmp_dir.name, "test.zip")
+        RangeHandler.failing_ranges = {30000}
+        with self.assertRaises(SystemExit):
+            download_zip(self.url, save_path, max_workers=1, part_size=10000)
+        self.assertFalse(os.path.exists(save_path))
+
+        RangeHandler.failing_ranges = set()
+        RangeHandler.requested_ranges = []
+        download_zip(self.url, save_path, max_workers=2, part_size=10000)
+
+        with open(save_path, "rb") as f:
+            self.assertEqual(f.read(), PAYLOAD)
+        self.assertNotIn(0, RangeHandler.requested_ranges)
+        self.assertIn(30000, RangeHandler.requested_ranges)
+
+    def test_extract_zip(self):
         """Test extracting a ZIP file while skipping intermediary folders."""
-        mock_zip = MagicMock()
-        mock_zip.namelist.return_value = ["folder/file1.txt", "folder/file2.txt"]
-        mock_zipfile.return_value.__enter__.return_value = mock_zip
-        
-        extracted_files = extract_zip("test.zip", "data/raw")
-        
-        self.assertEqual(len(extracted_files), 2)
-        self.assertIn("data/raw/file1.txt", extracted_files)
-        self.assertIn("data/raw/file2.txt", extracted_files)
-        mock_makedirs.assert_called()
-    
-    @patch("your_module.download_zip")
-    @patch("your_module.extract_zip", return_value=["data/raw/file1.txt"])
-    @patch("your_module.load_config", return_value={"zip_url": "http://example.com/test.zip", "zip_path": "test.zip", "extracted_to": "data/raw"})
+        zip_path = os.path.join(self.tmp_dir.name, "test.zip")
+        with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_DEFLATED) as zip_ref:
+            zip_ref.writestr("folder/", "")
+            zip_ref.writestr("folder/file1.txt", "first")
+            zip_ref.writestr("folder/file2.txt", PAYLOAD)
+
+        extracted_to = os.path.join(self.tmp_dir.name, "raw")
+        extracted_files = extract_zip(zip_path, extracted_to, max_workers=2)
+
+        self.assertEqual(extracted_files, [os.path.join(extracted_to, "file1.txt"),
+                                           os.path.join(extracted_to, "file2.txt")])
+        with open(extracted_files[1], "rb") as f:
+            self.assertEqual(f.read(), PAYLOAD)
+
+    def test_read_from_cached_zip(self):
+        """Test that a missing file is streamed from the cached archive, downloaded only once."""
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, "w", compression=zipfile.ZIP_DEFLATED) as zip_ref:
+            zip_ref.writestr("data/sales.csv", "code,amount\n1,0.99\n2,1.99\n3,2.99\n")
+            zip_ref.writestr("data/supermarkets.csv", "supermarket_No,postal-code\n1,30309\n")
+        RangeHandler.payload = archive.getvalue()
+
+        config = {"zip_url": self.url, "zip_path": os.path.join(self.tmp_dir.name, "data.zip"),
+                  "extract_mode": "zip", "extracted_to": os.path.join(self.tmp_dir.name, "raw")}
+        with patch("file_extractor.load_config", return_value=config), \
+                patch("file_reader.load_config", return_value=config):
+            ensure_zip()
+            chunks = list(iter_csv_chunks("sales.csv", chunk_size=2))
+            self.assertEqual([len(chunk) for chunk in chunks], [2, 1])
+            self.assertEqual(chunks[1]["amount"].tolist(), [2.99])
+            self.assertFalse(os.path.exists(config["extracted_to"]))
+
+            RangeHandler.requested_ranges = []
+            ensure_zip()  # Same ETag and checksum: nothing is downloaded
+            self.assertEqual(RangeHandler.requested_ranges, [])
+
+            RangeHandler.etag = '"v2"'
+            ensure_zip()
+            self.assertEqual(RangeHandler.requested_ranges, [0])
+
+    @patch("file_extractor.download_zip")
+    @patch("file_extractor.extract_zip", return_value=["data/raw/file1.txt"])
+    @patch("file_extractor.load_config", return_value={"zip_url": "http://example.com/test.zip", "zip_path": "test.zip", "extracted_to": "data/raw"})
     @patch("os.remove")
     def test_extract_files(self, mock_remove, mock_load_config, mock_extract_zip, mock_download_zip):
         """Test extract_files function end-to-end with mocked dependencies."""
         extracted_files = extract_files()
-        
+
         mock_download_zip.assert_called_with("http://example.com/test.zip", "test.zip")
         mock_extract_zip.assert_called_with("test.zip", "data/raw")
         mock_remove.assert_called_with("test.zip")
         self.assertEqual(extracted_files, ["file1.txt"])
 
 if __name__ == "__main__":
-    unittest.main()
\ No newline at end of file
+    unittest.main()
@@ -0,0 +1,80 @@
+import sys
+import os
+import json
+
+# Add the project root and scripts/ to sys.path so the pipeline modules can be found
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "scripts")))
+
+from unittest.mock import patch
+import pandas as pd
+import pytest
+import metrics
+from metrics import track_stage, track_chunks, call_with_metrics, export_metrics, STAGE_METRICS
+
+@pytest.fixture(autouse=True)
+def clear_metrics():
+    """Start every test with no recorded stages or profilers."""
+    STAGE_METRICS.clear()
+    metrics._profilers.clear()
+    yield
+    STAGE_METRICS.clear()
+    metrics._profilers.clear()
+
+def test_stages_are_recorded_with_labels_and_counts():
+    """Nested stages finish first; the block fills in rows and bytes, even when it fails."""
+    with patch("metrics.load_config", return_value={}):
+        with track_stage("clean", file="sales.csv") as record:
+            with track_stage("read", file="sales.csv") as inner:
+                inner["rows_out"] = 3
+            record["rows_in"], record["rows_out"] = 3, 2
+        with pytest.raises(ValueError):
+            with track_stage("fit"):
+                raise ValueError("singular")
+
+    assert [(r["stage"], r["labels"]) for r in STAGE_METRICS] == \
+        [("read", {"file": "sales.csv"}), ("clean", {"file": "sales.csv"}), ("fit", {})]
+    read, clean, fit = STAGE_METRICS
+    assert read["rows_out"] == 3 and (clean["rows_in"], clean["rows_out"]) == (3, 2)
+    assert clean["wall_seconds"] >= read["wall_seconds"] >= 0
+    assert clean["peak_rss_bytes"] >= read["peak_rss_bytes"] > 0
+    assert fit["error"] == "ValueError"
+
+def test_chunk_stage_counts_rows_and_can_be_disabled():
+    """Streaming reads record their rows once the iterator is done; nothing is kept when disabled."""
+    chunks = [pd.DataFrame({"a": range(3)}), pd.DataFrame({"a": range(2)})]
+    with patch("metrics.load_config", return_value={}):
+        assert sum(len(chunk) for chunk in track_chunks("read", chunks, bytes_read=10, file="x.csv")) == 5
+        result, records = call_with_metrics(lambda: list(track_chunks("read", chunks[:1])))
+    assert len(result) == 1 and records[0]["rows_out"] == 3
+    assert STAGE_METRICS[0]["rows_out"] == 5 and STAGE_METRICS[0]["bytes_read"] == 10
+
+    with patch("metrics.load_config", return_value={"metrics_enabled": False}):
+        with track_stage("merge"):
+            pass
+    assert len(STAGE_METRICS) == 2
+
+def test_export_writes_json_prometheus_and_profiles(tmp_path):
+    """Runs of a stage are summed in the exports, and a profiled stage leaves a cProfile dump."""
+    config = {"profile_stages": ["encode"], "profile_memory": True, "profile_dir": str(tmp_path / "profiles")}
+    with patch("metrics.load_config", return_value=config):
+        for _ in range(2):
+            with track_stage("encode") as record:
+                record["rows_in"] = 5
+        with track_stage("read", file='odd "name".csv'):
+            pass
+        json_path, prom_path = export_metrics(str(tmp_path / "metrics"))
+
+    with open(json_path) as f:
+        exported = json.load(f)
+    assert len(exported["stages"]) == 3
+    encode = next(entry for entry in exported["summary"] if entry["stage"] == "encode")
+    assert encode["runs"] == 2 and encode["rows_in"] == 10 and encode["traced_peak_bytes"] > 0
+
+    with open(prom_path) as f:
+        prom = f.read()
+    assert "# TYPE pipeline_stage_wall_seconds gauge" in prom
+    assert 'pipeline_stage_rows_in{stage="encode"} 10.0' in prom
+    assert 'pipeline_stage_runs{stage="read",file="odd \\"name\\".csv"} 1.0' in prom
+    assert os.path.exists(tmp_path / "profiles" / "encode.prof")
+    assert os.path.exists(tmp_path / "profiles" / "encode.tracemalloc.txt")
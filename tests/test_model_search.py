@@ -0,0 +1,67 @@
+import sys
+import os
+import json
+
+# Add the project root and scripts/ to sys.path so the pipeline modules can be found
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "scripts")))
+
+import numpy as np
+import pandas as pd
+import pytest
+from config_loader import clear_config_cache
+from sales_predictor import predict_sales
+from scoring_server import BatchScorer
+from model_search import week_folds, search_and_train_sales_model, SegmentedLinearModel
+
+def test_week_folds_train_on_earlier_weeks_only():
+    """Folds are expanding windows over distinct weeks, and shrink when there are too few weeks."""
+    weeks = np.array([1, 1, 2, 3, 3, 3, 4, 5, 6, 6])
+    assert week_folds(weeks, 3) == [(3, 7), (7, 8), (8, 10)]  # Week groups {1, 2}, {3, 4}, {5}, {6}
+    assert week_folds(np.array([7, 7, 8]), 3) == [(2, 3)]
+    assert week_folds(np.array([7, 7]), 3) == []
+
+def test_segmented_model_falls_back_to_the_global_fit():
+    """Large segments get their own fit; small and unseen segments use the model of all rows."""
+    rng = np.random.default_rng(0)
+    X = np.column_stack([np.repeat([0, 1, 2], [200, 200, 5]), rng.normal(size=405)])
+    y = np.where(X[:, 0] == 0, 2.0, -2.0) * X[:, 1]
+    model = SegmentedLinearModel(0, min_rows=100).fit(X, y)
+
+    assert sorted(model.models) == [0.0, 1.0]
+    rows = np.array([[0, 1.0], [1, 1.0], [9, 1.0]])
+    np.testing.assert_allclose(model.predict(rows)[:2], [2.0, -2.0], atol=1e-9)
+    assert model.predict(rows)[2] == pytest.approx(model.global_model.predict(rows[2:])[0])
+
+@pytest.fixture
+def search_workspace(pipeline_workspace, tmp_path):
+    """Cleaned generated data and a config selecting a small search."""
+    return pipeline_workspace(3000, seed=5, search_candidates=["ridge_1", "segment_item_type", "gbm_100"],
+                              search_folds=2, search_report_path=str(tmp_path / "search.json"), max_workers=2)
+
+def test_search_selects_the_best_candidate_and_reports_it(search_workspace):
+    """Every candidate plus the baseline is scored on each fold; the winner scores like any trained model."""
+    components = search_and_train_sales_model()
+    with open(search_workspace / "search.json") as f:
+        report = json.load(f)
+
+    assert report["finished"]
+    assert len(report["fold_results"]) == 4 * 2
+    assert [row["candidate"] for row in report["candidates"]][0] == report["selected"]
+    assert sorted(row["candidate"] for row in report["candidates"]) == \
+        ["gbm_100", "linear", "ridge_1", "segment_item_type"]
+
+    _, encoder_dict, _, feature_columns, _ = components
+    row = {col: 1 for col in feature_columns}
+    row["item_type"] = encoder_dict["item_type"].classes_[0]
+    np.testing.assert_allclose(BatchScorer(*components).score([row]), predict_sales(pd.DataFrame([row]), *components))
+
+def test_search_over_budget_keeps_the_baseline(search_workspace, monkeypatch):
+    """If the search cannot finish within its time budget, the linear baseline is trained."""
+    monkeypatch.setenv("PIPELINE_SEARCH_TIME_BUDGET", "0")
+    clear_config_cache()  # Overrides are read when the file is parsed
+    search_and_train_sales_model()
+    with open(search_workspace / "search.json") as f:
+        report = json.load(f)
+    assert not report["finished"]
+    assert report["selected"] == "linear"
@@ -0,0 +1,64 @@
+import sys
+import os
+import json
+
+# Add the project root and scripts/ to sys.path so the pipeline modules can be found
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "scripts")))
+
+from unittest.mock import patch
+import pandas as pd
+import pytest
+import pipeline_runner
+from pipeline_runner import run_pipeline, main, sample_sales_data
+from config_loader import load_config
+
+@pytest.fixture
+def workspace(pipeline_workspace, tmp_path):
+    """A config pointing every path into tmp_path, with small generated raw files."""
+    return pipeline_workspace(2000, seed=0, files=[], model_path=str(tmp_path / "model.joblib"),
+                              checkpoint_path=str(tmp_path / "run.json"))
+
+def fake_training():
+    """Stand-in for run_training_stage that only writes the model file."""
+    with open(load_config()["model_path"], "w") as f:
+        f.write("model")
+
+def test_failed_run_resumes_from_the_last_completed_file_and_stage(workspace):
+    """A retry cleans only the file that failed, and skips stages that had finished."""
+    def broken_cleaner(df):
+        raise ValueError("bad row")
+
+    cleaners = dict(pipeline_runner.CLEANING_FUNCTIONS, **{"sales.csv": broken_cleaner})
+    with patch.dict(pipeline_runner.CLEANING_FUNCTIONS, cleaners), pytest.raises(RuntimeError, match="sales.csv"):
+        run_pipeline(["clean", "train"])
+    with open(workspace / "run.json") as f:
+        assert sorted(json.load(f)["cleaned_files"]) == ["item.csv", "promotion.csv", "supermarkets.csv"]
+
+    cleaning = patch("pipeline_runner.run_cleaning_stage", wraps=pipeline_runner.run_cleaning_stage)
+    with cleaning as run_cleaning_stage, \
+         patch("pipeline_runner.run_training_stage", side_effect=MemoryError) as run_training_stage:
+        with pytest.raises(MemoryError):
+            run_pipeline(["clean", "train"])
+        assert [call.args[0] for call in run_cleaning_stage.call_args_list] == [["sales.csv"]]
+
+        run_cleaning_stage.reset_mock()
+        run_training_stage.side_effect = fake_training
+        outputs = run_pipeline(["train", "clean"])
+    run_cleaning_stage.assert_not_called()
+    assert list(outputs["train"]) == [str(workspace / "model.joblib")]
+    assert not os.path.exists(workspace / "run.json")
+
+def test_commands_run_single_stages(workspace):
+    """clean cleans only the selected files, and predict scores a CSV with the model train saved."""
+    assert main(["clean", "--files", "item.csv"]) == 0
+    assert sorted(os.listdir(workspace / "clean")) == ["item_processed.csv"]
+
+    assert main(["clean"]) == 0
+    assert main(["train"]) == 0
+    pd.concat([sample_sales_data()] * 3).to_csv(workspace / "new.csv", index=False)
+    assert main(["predict", "--input", str(workspace / "new.csv"), "--output", str(workspace / "out.csv")]) == 0
+
+    predictions = pd.read_csv(workspace / "out.csv")
+    assert list(predictions.columns) == ["predicted_sales"] and len(predictions) == 3
+    assert os.path.exists(workspace / "metrics" / "metrics.json")
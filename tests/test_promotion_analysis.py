@@ -0,0 +1,53 @@
+import sys
+import os
+
+# Add the project root and scripts/ to sys.path so the pipeline modules can be found
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "scripts")))
+
+from unittest.mock import patch
+import numpy as np
+import pandas as pd
+from config_loader import get_processed_file_name
+from sales_cube import query_sales_cube
+from promotion_analysis import compute_uplift, refresh_promotion_uplift
+
+def test_baseline_skips_promoted_weeks_and_counts_weeks_without_sales():
+    """Baselines average the unpromoted weeks of the window, with missing weeks as 0 sales."""
+    sales = pd.DataFrame({"item_code": 1, "supermarket_code": 1, "week": [1, 2, 3, 5, 6],
+                          "units": [2, 4, 10, 6, 12], "amount": [2.0, 4.0, 10.0, 6.0, 12.0]})
+    promotions = pd.DataFrame({"item_code": [1, 1, 2], "supermarket_code": 1, "week": [3, 6, 2],
+                               "feature": "Front", "display": ["Aisle", "Aisle", "Rear"]})
+
+    uplift = compute_uplift(promotions, promotions, sales, baseline_weeks=4, first_week=1)
+
+    np.testing.assert_allclose(uplift["units"], [10, 12, 0])
+    np.testing.assert_allclose(uplift["baseline_units"], [3.0, 10 / 3, 0.0])  # Weeks 1-2; weeks 2, 4, 5
+    np.testing.assert_array_equal(uplift["baseline_weeks"], [2, 3, 1])
+    np.testing.assert_allclose(uplift["lift_units"], [10 / 3, 3.6, np.nan])
+
+def test_new_promotion_weeks_recompute_only_affected_weeks(pipeline_workspace, tmp_path):
+    """Adding weeks of promotions recomputes those weeks and gives the same tables as a rebuild."""
+    pipeline_workspace(4000, seed=6, cube_dir=str(tmp_path / "cube"), promotion_dir=str(tmp_path / "promotions"),
+                       promo_baseline_weeks=4)
+
+    promotion_path = tmp_path / "clean" / get_processed_file_name("promotion.csv")
+    all_promotions = pd.read_csv(promotion_path)
+    all_promotions[all_promotions["week"] <= 90].to_csv(promotion_path, index=False)
+    refresh_promotion_uplift()
+
+    all_promotions.to_csv(promotion_path, index=False)
+    with patch("promotion_analysis.compute_uplift", wraps=compute_uplift) as computed:
+        incremental = refresh_promotion_uplift()
+    last_week = query_sales_cube("item_store_week")["week"].max()
+    new_weeks = all_promotions["week"][(all_promotions["week"] > 90) & (all_promotions["week"] <= last_week)]
+    assert set(computed.call_args.args[0]["week"]) == set(new_weeks)
+    incremental_rows = pd.read_parquet(tmp_path / "promotions" / "uplift.parquet")
+
+    rebuilt = refresh_promotion_uplift(rebuild=True)
+    pd.testing.assert_frame_equal(incremental_rows, pd.read_parquet(tmp_path / "promotions" / "uplift.parquet"))
+    pd.testing.assert_frame_equal(incremental, rebuilt)
+
+    with patch("promotion_analysis.compute_uplift") as computed:
+        refresh_promotion_uplift()
+    computed.assert_not_called()
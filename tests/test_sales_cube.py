@@ -0,0 +1,90 @@
+import sys
+import os
+import json
+
+# Add the project root and scripts/ to sys.path so the pipeline modules can be found
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "scripts")))
+
+from unittest.mock import patch
+import pandas as pd
+import pytest
+import sales_cube
+from sales_cube import refresh_sales_cube, query_sales_cube, aggregate_sales, get_sales_path, CUBE_LEVELS
+from file_reader import load_df
+
+def make_workspace(pipeline_workspace, tmp_path, storage_format, **settings):
+    """Clean generated sales rows into tmp_path with the given storage format."""
+    pipeline_workspace(3000, seed=2, files=["sales.csv"], cube_dir=str(tmp_path / "cube"),
+                       storage_format=storage_format, metrics_enabled=False, **settings)
+
+def assert_cube_matches_sales():
+    """Every level equals aggregating the whole processed sales file from scratch."""
+    sales_path = get_sales_path()
+    expected = aggregate_sales(load_df(os.path.basename(sales_path), os.path.dirname(sales_path)))
+    for level in CUBE_LEVELS:
+        pd.testing.assert_frame_equal(query_sales_cube(level), expected[level], check_dtype=False)
+
+@pytest.mark.parametrize("storage_format", ["csv", "parquet"])
+def test_delta_refresh_recomputes_only_its_weeks(pipeline_workspace, tmp_path, storage_format):
+    """A raw delta is appended to the sales file and only the weeks it touches are re-aggregated."""
+    make_workspace(pipeline_workspace, tmp_path, storage_format)
+    index = refresh_sales_cube()
+    assert_cube_matches_sales()
+
+    delta = pd.read_csv(tmp_path / "raw" / "sales.csv").head(50)
+    delta["week"] = delta["week"].where(delta.index % 2 == 0, 200)  # Half of the rows start a new week
+    with patch("sales_cube.load_week_rows", wraps=sales_cube.load_week_rows) as load_week_rows:
+        refreshed = refresh_sales_cube(delta)
+    load_week_rows.assert_called_once_with(sorted(set(delta["week"])))
+    assert refreshed["weeks"] == sorted(set(index["weeks"]) | {200})
+    assert_cube_matches_sales()
+
+def test_queries_read_selected_weeks_and_changed_files_are_detected(pipeline_workspace, tmp_path):
+    """Queries filter by week and keys; weeks changed outside the cube are found by their checksums."""
+    make_workspace(pipeline_workspace, tmp_path, "csv")
+    index = refresh_sales_cube()
+    first_week, last_week = index["weeks"][0], index["weeks"][-1]
+
+    stores = query_sales_cube("store_week", weeks=[first_week], supermarket_codes=[1, 2])
+    assert set(stores["week"]) == {first_week} and set(stores["supermarket_code"]) <= {1, 2}
+    with pytest.raises(ValueError, match="not keyed by item_code"):
+        query_sales_cube("store_week", item_codes=[1])
+
+    with patch("sales_cube.recompute_weeks") as recompute:
+        assert refresh_sales_cube() is not None
+    recompute.assert_not_called()  # Sales file unchanged since the build
+
+    sales = pd.read_csv(get_sales_path())
+    sales = sales[sales["week"] != last_week]
+    sales.loc[sales["week"] == first_week, "quantity"] += 1
+    sales.to_csv(get_sales_path(), index=False)
+    with patch("sales_cube.load_week_rows", wraps=sales_cube.load_week_rows) as load_week_rows:
+        refreshed = refresh_sales_cube()
+    load_week_rows.assert_called_once_with([first_week])
+    assert last_week not in refreshed["weeks"]
+    assert_cube_matches_sales()
+
+def test_invalid_delta_rows_are_quarantined(pipeline_workspace, tmp_path):
+    """Delta rows failing the sales validation rules go to the quarantine CSV instead of the sales file."""
+    make_workspace(pipeline_workspace, tmp_path, "csv", validation_fail_on_breach=True)
+    refresh_sales_cube()
+    rows = len(pd.read_csv(get_sales_path()))
+
+    delta = pd.read_csv(tmp_path / "raw" / "sales.csv").head(200)
+    delta["customerId"] = delta["customerId"].astype("float64")
+    delta.loc[1, "customerId"] = None
+    with pytest.raises(ValueError, match="rows quarantined"):
+        refresh_sales_cube(delta.head(5))  # One bad row in five breaches validation_max_quarantine_rate
+    assert len(pd.read_csv(get_sales_path())) == rows
+
+    refresh_sales_cube(delta)
+    sales = pd.read_csv(get_sales_path())
+    assert len(sales) == rows + 199 and pd.api.types.is_integer_dtype(sales["customer_id"])
+    assert_cube_matches_sales()
+
+    quarantined = pd.read_csv(tmp_path / "quarantine" / "sales_quarantine.csv")
+    assert list(quarantined["basket"]) == [delta.loc[1, "basket"]] * 2  # From both refreshes
+    assert set(quarantined["failed_checks"]) == {"not_null:customer_id"}
+    with open(tmp_path / "quarantine" / "validation_summary.json") as f:
+        assert json.load(f)["sales.csv delta"]["rows_quarantined"] == 1
@@ -0,0 +1,74 @@
+import sys
+import os
+
+# Add the project root and scripts/ to sys.path so the pipeline modules can be found
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "scripts")))
+
+import numpy as np
+import pandas as pd
+from sales_cube import query_sales_cube
+from sales_forecast import exponential_smoothing, fit_promo_lift, forecast_shard, forecast_sales, first_sale_weeks
+
+def smooth_one(series, alpha):
+    """Reference exponential smoothing of one series from its first sale: (final level, sum of squared errors)."""
+    series = series[np.flatnonzero(series)[0]:]
+    level, sse = series[0], 0.0
+    for value in series[1:]:
+        sse += (value - level) ** 2
+        level += alpha * (value - level)
+    return level, sse
+
+def test_vectorized_models_match_per_series_fits():
+    """Smoothing picks each series' best alpha as a per-series loop would; the promo lift is recovered exactly."""
+    rng = np.random.default_rng(1)
+    values = np.vstack([rng.poisson(5, 30), np.repeat([0, 10], 15), rng.poisson(1, 30)]).astype(float)
+    alphas = [0.1, 0.5, 0.9]
+
+    level, alpha = exponential_smoothing(values, alphas)
+    for i, series in enumerate(values):
+        fits = [smooth_one(series, a) for a in alphas]
+        best = int(np.argmin([sse for _, sse in fits]))
+        assert alpha[i] == alphas[best]
+        assert level[i] == fits[best][0]
+
+    promo = np.zeros_like(values)
+    promo[:, ::3] = 1
+    intercept, lift = fit_promo_lift(2.0 + 3.0 * promo, promo)
+    np.testing.assert_allclose(intercept, 2.0)
+    np.testing.assert_allclose(lift, 3.0)
+
+    future = np.hstack([promo, np.array([[1, 0]] * 3)])
+    forecast = forecast_shard(2.0 + 3.0 * promo, future, 2, "ses_promo")
+    np.testing.assert_allclose(forecast, [[5.0, 2.0]] * 3)
+
+def test_late_starting_series_are_fitted_from_their_first_sale():
+    """Weeks before a pair's first sale are not zero sales: the forecasts equal those of the series cut there."""
+    late = np.array([[0.0] * 20 + [7.0] * 10])
+    promo = np.zeros((1, 32))
+    promo[0, [1, 5, 22, 26, 31]] = 1  # Promotions before the first sale have no sales to lift
+    late[0, [22, 26]] += 4
+    cut, cut_promo = late[:, 20:], promo[:, 20:]
+
+    assert list(first_sale_weeks(np.vstack([late, np.ones((1, 30))]))) == [20, 0]
+    for method in ["ses", "promo_regression", "ses_promo"]:
+        np.testing.assert_allclose(forecast_shard(late, promo, 2, method), forecast_shard(cut, cut_promo, 2, method))
+    np.testing.assert_allclose(fit_promo_lift(late, promo[:, :30])[1], 4.0)
+    level, _ = exponential_smoothing(late, [0.1])
+    assert level[0] > 7.0  # Not dragged towards the 20 leading zeros
+
+def test_forecast_file_covers_every_series_and_matches_across_workers(pipeline_workspace, tmp_path):
+    """Sharded parallel forecasts equal the single-process ones, one row per series and forecast week."""
+    pipeline_workspace(3000, seed=2, cube_dir=str(tmp_path / "cube"), forecast_horizon=3, forecast_shard_size=500)
+
+    parallel = pd.read_parquet(forecast_sales(output_path=str(tmp_path / "parallel.parquet"), max_workers=2))
+    single = pd.read_parquet(forecast_sales(output_path=str(tmp_path / "single.parquet"), max_workers=1))
+    pd.testing.assert_frame_equal(parallel, single)
+
+    cube = query_sales_cube("item_store_week")
+    pairs = cube[["item_code", "supermarket_code"]].drop_duplicates()
+    assert len(parallel) == len(pairs) * 3
+    last_week = cube["week"].max()
+    assert sorted(parallel["week"].unique()) == [last_week + 1, last_week + 2, last_week + 3]
+    assert (parallel["forecast_units"] >= 0).all()
+    assert len(parallel.merge(pairs, on=["item_code", "supermarket_code"])) == len(parallel)
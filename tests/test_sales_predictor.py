@@ -0,0 +1,64 @@
+import sys
+import os
+
+# Add the project root and scripts/ to sys.path so the pipeline modules can be found
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "scripts")))
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LinearRegression
+from sklearn.preprocessing import LabelEncoder, MinMaxScaler
+from sales_predictor import predict_sales, save_model_bundle, load_model_bundle, score_sales
+from sales_predictor import build_category_index, encode_categories
+
+def make_components():
+    """Fit a tiny model the same way preprocess_and_train_sales_model does."""
+    train = pd.DataFrame({
+        "quantity": [1, 2, 3, 1, 2, 4],
+        "item_brand": ["Barilla", "Ragu", "Prego", "Ragu", "Barilla", "Prego"],
+        "week": [1, 2, 3, 4, 5, 6],
+    })
+    y = [0.99, 3.98, 5.97, 1.99, 1.98, 7.96]
+
+    scaler = MinMaxScaler()
+    train[["quantity"]] = scaler.fit_transform(train[["quantity"]])
+    encoder = LabelEncoder()
+    train["item_brand"] = encoder.fit_transform(train["item_brand"])
+    encoder.classes_ = np.array(list(encoder.classes_) + ["UnknownCategory"])
+
+    model = LinearRegression().fit(train, y)
+    return model, {"item_brand": encoder}, scaler, train.columns, ["quantity"]
+
+def new_rows():
+    """Rows to score, including a brand the model has never seen."""
+    return pd.DataFrame({"quantity": [2, 5], "item_brand": ["Ragu", "Newbrand"], "week": [7, 8]})
+
+def test_encode_categories_matches_label_encoder():
+    """Vectorized encoding matches LabelEncoder.transform, with unseen labels on the reserved code."""
+    _, encoder_dict, _, _, _ = make_components()
+    encoder = encoder_dict["item_brand"]
+    values = pd.Series(["Prego", "Newbrand", np.nan, "Barilla", "Prego"])
+
+    expected = encoder.transform(values.astype(str).map(lambda x: x if x in encoder.classes_ else "UnknownCategory"))
+    codes = encode_categories(values, build_category_index(encoder_dict)["item_brand"])
+    assert codes.tolist() == expected.tolist()
+    assert codes[1] == codes[2] == len(encoder.classes_) - 1
+
+def test_model_bundle_round_trip(tmp_path):
+    """A saved bundle scores exactly like the in-memory components."""
+    components = make_components()
+    bundle_path = save_model_bundle(str(tmp_path / "sales_model.joblib"), *components)
+
+    expected = predict_sales(new_rows(), *components)
+    np.testing.assert_allclose(predict_sales(new_rows(), *load_model_bundle(bundle_path)), expected)
+    np.testing.assert_allclose(score_sales(new_rows(), bundle_path), expected)
+
+def test_model_bundle_version_mismatch(tmp_path):
+    """Bundles with another layout version are rejected."""
+    bundle_path = str(tmp_path / "old_model.joblib")
+    joblib.dump({"bundle_version": 0}, bundle_path)
+    with pytest.raises(ValueError):
+        load_model_bundle(bundle_path)
@@ -0,0 +1,104 @@
+import sys
+import os
+import json
+import asyncio
+
+# Add the project root and scripts/ to sys.path so the pipeline modules can be found
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "scripts")))
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.preprocessing import MinMaxScaler, LabelEncoder
+from sklearn.linear_model import LinearRegression
+from sales_predictor import predict_sales
+from scoring_server import BatchScorer, ScoringServer
+from metrics import STAGE_METRICS
+
+@pytest.fixture
+def components():
+    """A small trained model with one encoded category and one scaled column."""
+    rng = np.random.default_rng(0)
+    encoder = LabelEncoder().fit(["A", "B", "UnknownCategory", "nan"])
+    train = pd.DataFrame({"item_type": rng.integers(0, 4, 50), "quantity": rng.integers(1, 9, 50),
+                          "week": rng.integers(1, 104, 50)})
+    scaler = MinMaxScaler().fit(train[["quantity"]])
+    train["quantity"] = scaler.transform(train[["quantity"]])
+    model = LinearRegression().fit(train, rng.normal(size=50))
+    return model, {"item_type": encoder}, scaler, list(train.columns), ["quantity"]
+
+def test_batch_scorer_matches_predict_sales(components):
+    """Known, unseen and missing categories, missing columns and numeric strings score as in predict_sales."""
+    rows = [{"item_type": "A", "quantity": 3, "week": 10}, {"item_type": "Z", "quantity": 8, "week": 52},
+            {"item_type": None, "quantity": 1, "week": "7"}, {"quantity": 5, "week": 1}]
+    expected = np.concatenate([predict_sales(pd.DataFrame([row]), *components) for row in rows])
+    np.testing.assert_allclose(BatchScorer(*components).score(rows), expected)
+
+    with pytest.raises(ValueError, match="'quantity' must be a number"):
+        BatchScorer(*components).score([{"item_type": "A", "quantity": "many", "week": 1}])
+
+async def post(port, path, payload=None):
+    """Send one request on its own connection and return (status, JSON body)."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    body = json.dumps(payload).encode() if payload is not None else b""
+    method = "POST" if payload is not None else "GET"
+    writer.write(f"{method} {path} HTTP/1.1\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(body)
+
+def test_server_batches_concurrent_requests_and_reports_latency(components):
+    """Concurrent single-row requests are scored together; bad rows fail alone with 400."""
+    scorer = BatchScorer(*components)
+    row = {"item_type": "B", "quantity": 2, "week": 3}
+
+    async def scenario():
+        server = ScoringServer(scorer, max_batch_size=8, max_wait=0.05)
+        ready = asyncio.get_running_loop().create_future()
+        serving = asyncio.create_task(server.serve("127.0.0.1", 0, ready))
+        port = await ready
+        try:
+            responses = await asyncio.gather(*(post(port, "/predict", row) for _ in range(8)),
+                                             post(port, "/predict", {"quantity": "x"}))
+            many = await post(port, "/predict", [row, row])
+            missing = await post(port, "/unknown")
+            metrics = await post(port, "/metrics")
+        finally:
+            serving.cancel()
+        return responses, many, missing, metrics
+
+    responses, many, missing, (_, metrics) = asyncio.run(scenario())
+    expected = scorer.score([row])[0]
+    assert all(status == 200 and body["predicted_sales"] == pytest.approx(expected) for status, body in responses[:8])
+    assert responses[8][0] == 400 and "must be a number" in responses[8][1]["error"]
+    assert many == (200, {"predicted_sales": [pytest.approx(expected)] * 2})
+    assert missing[0] == 404
+    assert metrics["requests"] == 10 and metrics["errors"] == 1
+    assert metrics["mean_batch_size"] > 1
+    assert set(metrics["latency_ms"]) == {"p50", "p90", "p99", "max"}
+
+def test_server_predictions_equal_predict_sales(components):
+    """Rows with different fields, scored in one micro-batch by the server, get predict_sales' predictions."""
+    rows = [{"item_type": "A", "quantity": 3, "week": 10}, {"quantity": 5, "week": 1},
+            {"item_type": "Z", "quantity": 8, "week": 52}, {"item_type": None, "quantity": 1}]
+    same_fields = [rows[0], rows[2]]
+
+    async def scenario():
+        server = ScoringServer(BatchScorer(*components), max_batch_size=8, max_wait=0.05)
+        ready = asyncio.get_running_loop().create_future()
+        serving = asyncio.create_task(server.serve("127.0.0.1", 0, ready))
+        port = await ready
+        try:
+            return await asyncio.gather(*(post(port, "/predict", row) for row in rows))
+        finally:
+            serving.cancel()
+
+    metrics_before = len(STAGE_METRICS)
+    responses = asyncio.run(scenario())
+    assert len(STAGE_METRICS) == metrics_before  # Scoring records no stage metrics
+    expected = [predict_sales(pd.DataFrame([row]), *components)[0] for row in rows]
+    assert [body["predicted_sales"] for _, body in responses] == pytest.approx(expected)
+    np.testing.assert_allclose(BatchScorer(*components).score(same_fields),
+                               predict_sales(pd.DataFrame(same_fields), *components))
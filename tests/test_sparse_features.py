@@ -0,0 +1,51 @@
+import sys
+import os
+
+# Add the project root and scripts/ to sys.path so the pipeline modules can be found
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "scripts")))
+
+import numpy as np
+import pandas as pd
+from sales_predictor import predict_sales, save_model_bundle, score_sales
+from scoring_server import BatchScorer
+from sparse_features import SparseLinearModel, hash_buckets, preprocess_and_train_sales_model_sparse
+
+def test_design_matrix_has_one_value_per_feature():
+    """Codes and province values are one-hot, ids hashed and numerics scaled, with unseen values in their own column."""
+    model = SparseLinearModel(["item_type", "province_x", "customer_id", "quantity"], {"item_type": 3},
+                              hash_buckets_per_column=8)
+    columns = {"item_type": np.array([0, 2, 1]), "province_x": np.array([1.0, 2.0, 1.0]),
+               "customer_id": np.array([101.0, 7.0, 101.0]), "quantity": np.array([1.0, np.nan, 5.0])}
+    model.fit_statistics(columns)
+
+    new = {"item_type": np.array([1, 0]), "province_x": np.array([2.0, 9.0]),
+           "customer_id": np.array([7.0, np.nan]), "quantity": np.array([3.0, np.nan])}
+    matrix = model.design_matrix(new, 2)
+
+    assert matrix.shape == (2, 3 + 3 + 8 + 1)
+    assert matrix.nnz == 8
+    bucket_7, bucket_missing = hash_buckets(np.array([7, -1]), 8)
+    expected = np.zeros((2, 15))
+    expected[0, [1, 3 + 1, 6 + bucket_7]] = 1
+    expected[1, [0, 3 + 2, 6 + bucket_missing]] = 1  # Unseen province 9 goes to the extra column
+    expected[:, 14] = [0.5, 0.5]  # (3 - 1) / 4, and the median 3 for the missing value
+    np.testing.assert_allclose(matrix.toarray(), expected)
+    np.testing.assert_array_equal(hash_buckets(np.array([7, 101]), 8), hash_buckets(np.array([7.0, 101.0]), 8))
+
+def test_sparse_model_scores_like_the_dense_bundle(pipeline_workspace, tmp_path):
+    """The sparse trainer's components work with predict_sales, saved bundles and the scoring server."""
+    pipeline_workspace(3000, seed=3, training_mode="sparse", sparse_hash_buckets=1024)
+
+    components = preprocess_and_train_sales_model_sparse()
+    model, encoder_dict, _, feature_columns, _ = components
+    assert isinstance(model, SparseLinearModel) and "item_brand" in encoder_dict
+
+    rows = [{col: 0 for col in feature_columns}, {"item_code": 5, "item_brand": "Unseen", "quantity": 2, "week": 9}]
+    rows[0].update({"item_brand": encoder_dict["item_brand"].classes_[0], "quantity": 3, "province_x": 1})
+    expected = np.concatenate([predict_sales(pd.DataFrame([row]), *components) for row in rows])
+    np.testing.assert_allclose(BatchScorer(*components).score(rows), expected)
+
+    save_model_bundle(str(tmp_path / "model.joblib"), *components)
+    scored = [score_sales(pd.DataFrame([row]), str(tmp_path / "model.joblib")) for row in rows]
+    np.testing.assert_allclose(np.concatenate(scored), expected)
@@ -0,0 +1,50 @@
+import sys
+import os
+
+# Add the project root and scripts/ to sys.path so the pipeline modules can be found
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "scripts")))
+
+from unittest.mock import patch
+from stage_cache import load_manifest, save_manifest, make_stage_key, fetch_artifact, store_artifact
+
+def test_stage_cache_round_trip(tmp_path):
+    """A stored artifact is restored for the same key, and the key changes with input, version or config."""
+    config = {"cache_dir": str(tmp_path / "cache"), "cache_max_bytes": 1024, "storage_format": "csv"}
+    raw = tmp_path / "sales.csv"
+    raw.write_text("code,amount\n1,0.99\n")
+    output = tmp_path / "sales_processed.csv"
+    output.write_text("item_code,transaction_amount\n1,0.99\n")
+
+    with patch("stage_cache.load_config", return_value=config):
+        manifest = load_manifest()
+        key = make_stage_key("clean", [str(raw)], 1, manifest)
+        assert not fetch_artifact(key, str(output), manifest)
+
+        store_artifact(key, "clean", str(output), manifest)
+        save_manifest(manifest)
+        output.unlink()
+
+        manifest = load_manifest()
+        assert fetch_artifact(key, str(output), manifest)
+        assert output.read_text() == "item_code,transaction_amount\n1,0.99\n"
+
+        assert make_stage_key("clean", [str(raw)], 2, manifest) != key
+        config["storage_format"] = "parquet"
+        assert make_stage_key("clean", [str(raw)], 1, manifest) != key
+        config["storage_format"] = "csv"
+        raw.write_text("code,amount\n1,1.99\n")
+        assert make_stage_key("clean", [str(raw)], 1, manifest) != key
+
+def test_stage_cache_evicts_least_recently_used(tmp_path):
+    """Artifacts beyond cache_max_bytes are evicted oldest first."""
+    config = {"cache_dir": str(tmp_path / "cache"), "cache_max_bytes": 25}
+    with patch("stage_cache.load_config", return_value=config):
+        manifest = load_manifest()
+        for name in ["first", "second", "third"]:
+            output = tmp_path / f"{name}.csv"
+            output.write_text("0123456789")
+            store_artifact(name, "clean", str(output), manifest)
+
+    assert sorted(manifest["entries"]) == ["second", "third"]
+    assert sorted(os.listdir(tmp_path / "cache")) == ["second.csv", "third.csv"]
@@ -0,0 +1,77 @@
+import sys
+import os
+
+# Add the project root and scripts/ to sys.path so the pipeline modules can be found
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "scripts")))
+
+from unittest.mock import patch
+import pandas as pd
+from file_reader import load_df
+from file_writer import write_df, write_chunks
+from pipeline_runner import process_file
+
+PROMOTIONS = pd.DataFrame({
+    "item_code": [2700042240, 2700042292, 2700042274, 2700042240],
+    "supermarket_code": [285, 285, 150, 150],
+    "week": [91, 92, 92, 93],
+    "feature": ["Not on Feature", "Interior Page Feature", "Interior Page Feature", "Not on Feature"],
+    "display": ["Mid-Aisle End Cap", "Not on Display", "Not on Display", "Mid-Aisle End Cap"],
+})
+
+def run_round_trip(tmp_path, storage_format, chunked=False):
+    """Write PROMOTIONS in the given format, then read back a filtered column subset."""
+    config = {"processed_to": str(tmp_path), "file_suffix": "_processed", "storage_format": storage_format}
+    with patch("config_loader.load_config", return_value=config), \
+         patch("file_reader.load_config", return_value=config), \
+         patch("file_writer.load_config", return_value=config):
+        if chunked:
+            path = write_chunks([PROMOTIONS.iloc[:2], PROMOTIONS.iloc[2:]], "promotion.csv")
+        else:
+            path = write_df(PROMOTIONS, "promotion.csv")
+        df = load_df(os.path.basename(path), str(tmp_path), columns=["week", "item_code"],
+                     filters=[("week", ">=", 92), ("supermarket_code", "in", [150])])
+    return path, df
+
+def test_parquet_round_trip(tmp_path):
+    """Parquet output only returns the requested columns and matching rows."""
+    path, df = run_round_trip(tmp_path, "parquet")
+    assert path.endswith("promotion_processed.parquet")
+    assert list(df.columns) == ["week", "item_code"]
+    assert df["week"].tolist() == [92, 93]
+    assert df["item_code"].tolist() == [2700042274, 2700042240]
+
+def test_formats_agree(tmp_path):
+    """CSV, Parquet and chunked Parquet writes read back identically."""
+    _, csv_df = run_round_trip(tmp_path, "csv")
+    _, parquet_df = run_round_trip(tmp_path, "parquet")
+    _, chunked_df = run_round_trip(tmp_path, "parquet", chunked=True)
+    pd.testing.assert_frame_equal(csv_df.reset_index(drop=True), parquet_df.reset_index(drop=True))
+    pd.testing.assert_frame_equal(parquet_df.reset_index(drop=True), chunked_df.reset_index(drop=True))
+
+def test_no_chunks_still_write_the_processed_schema(tmp_path):
+    """A source without rows leaves an empty file with the processed columns and dtypes, in either format."""
+    config = {"processed_to": str(tmp_path), "file_suffix": "_processed"}
+    for storage_format in ["parquet", "csv"]:
+        config["storage_format"] = storage_format
+        with patch("config_loader.load_config", return_value=config), \
+             patch("file_reader.load_config", return_value=config), \
+             patch("file_writer.load_config", return_value=config):
+            path = write_chunks(iter([]), "promotion.csv")
+            df = load_df(os.path.basename(path), str(tmp_path))
+        assert os.path.getsize(path) > 0
+        assert len(df) == 0
+        assert list(df.columns) == ["item_code", "supermarket_code", "week", "feature", "display", "province"]
+
+def test_header_only_input_is_cleaned_to_parquet(pipeline_workspace, tmp_path):
+    """A raw file with only its header is cleaned to an empty Parquet file that can be read back."""
+    pipeline_workspace(200, files=[], storage_format="parquet")
+    with open(tmp_path / "raw" / "promotion.csv") as f:
+        header = f.readline()
+    with open(tmp_path / "raw" / "promotion.csv", "w") as f:
+        f.write(header)
+
+    result = process_file("promotion.csv", str(tmp_path / "raw"))
+    assert result["status"] == "success" and result["path"].endswith(".parquet")
+    df = load_df(os.path.basename(result["path"]), str(tmp_path / "clean"))
+    assert len(df) == 0 and "item_code" in df.columns
@@ -0,0 +1,54 @@
+import sys
+import os
+
+# Add the project root and scripts/ to sys.path so the pipeline modules can be found
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "scripts")))
+
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LinearRegression
+from streaming_trainer import StreamingLinearRegression, median_from_counts
+
+def test_streaming_regression_matches_full_fit():
+    """Fitting chunk by chunk gives the same model as LinearRegression on all rows, even with collinear features."""
+    rng = np.random.default_rng(42)
+    X = np.column_stack([rng.integers(1, 5, 1000), rng.normal(125000, 50000, 1000), rng.integers(1, 29, 1000)])
+    X = np.column_stack([X, X[:, 2] // 4 + 1, X[:, 2] * 2.0])  # Derived and exactly collinear columns
+    y = 1.5 * X[:, 0] + 0.00001 * X[:, 1] + rng.normal(0, 0.1, 1000)
+    columns = ["quantity", "customer_id", "week", "month", "week_twice"]
+
+    regression = StreamingLinearRegression()
+    for start in range(0, len(y), 128):
+        regression.partial_fit(X[start:start + 128], y[start:start + 128])
+    streamed = regression.to_model(columns)
+    expected = LinearRegression().fit(pd.DataFrame(X, columns=columns), y)
+
+    np.testing.assert_allclose(streamed.coef_, expected.coef_, rtol=1e-6, atol=1e-9)
+    np.testing.assert_allclose(streamed.intercept_, expected.intercept_, rtol=1e-6)
+    np.testing.assert_allclose(streamed.predict(pd.DataFrame(X, columns=columns)),
+                               expected.predict(pd.DataFrame(X, columns=columns)), rtol=1e-6)
+
+def test_median_from_counts():
+    """Medians from value counts match np.median for odd and even row counts."""
+    for values in ([3, 1, 2], [4, 1, 2, 3], [30319, 30319, 30134, 31093], [2.0]):
+        counts = pd.Series(values).value_counts()
+        assert median_from_counts(counts) == np.median(values)
+
+def test_streaming_regression_keeps_small_coefficients_next_to_item_codes():
+    """A column of item_code magnitude (~1e9-1e10) does not push the other coefficients to zero."""
+    rng = np.random.default_rng(7)
+    X = np.column_stack([rng.integers(10 ** 9, 10 ** 10, 2000).astype(np.float64), rng.integers(1, 6, 2000),
+                         rng.integers(1, 100, 2000), rng.random(2000)])
+    y = 8.0 * X[:, 1] + 0.5 * X[:, 3] + rng.normal(0, 0.5, 2000)
+    columns = ["item_code", "quantity", "week", "item_size"]
+
+    regression = StreamingLinearRegression()
+    for start in range(0, len(y), 300):
+        regression.partial_fit(X[start:start + 300], y[start:start + 300])
+    streamed = regression.to_model(columns)
+    expected = LinearRegression().fit(pd.DataFrame(X, columns=columns), y)
+
+    np.testing.assert_allclose(streamed.coef_, expected.coef_, rtol=1e-6, atol=1e-12)
+    np.testing.assert_allclose(streamed.intercept_, expected.intercept_, rtol=1e-6)
+    assert abs(streamed.coef_[1] - 8.0) < 0.1